@@ -1,65 +1,318 @@
+import time
+from contextlib import contextmanager
 from flask import Flask
 from .config import Config
-from .data_processing import load_and_prepare_data
-import openai
-import chromadb
-from sentence_transformers import SentenceTransformer
+from . import metrics
+from .reload import DataGeneration, Reloader
+
+# Subsystems started for each APP_ROLE
+ROLE_SUBSYSTEMS = {
+    "all": {"recommend", "chat"},
+    "recommend-only": {"recommend"},
+    "chat-only": {"chat"},
+}
+
+
+class OccumendFlask(Flask):
+    """
+    Flask app whose data-dependent attributes (DataGeneration.FIELDS, e.g.
+    app.recommender or app.retriever) read and write app.generation, so a
+    reload replaces all of them with one assignment.
+    """
+
+
+def _generation_attribute(field):
+    def get(app):
+        return getattr(app.generation, field)
+
+    def set(app, value):
+        app.generation = app.generation.replace(**{field: value})
+
+    return property(get, set, doc=f"The {field} of the current data generation.")
+
+
+for _field in DataGeneration.FIELDS:
+    setattr(OccumendFlask, _field, _generation_attribute(_field))
+
+
+@contextmanager
+def _timed(timings, phase):
+    """Adds the wall time of the block to timings[phase]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
 
 
 def create_app(config_class=Config):
     """Application Factory: Creates and configures the Flask application."""
-    app = Flask(__name__)
+    app = OccumendFlask(__name__)
     app.config.from_object(config_class)
 
+    role = app.config["APP_ROLE"]
+    if role not in ROLE_SUBSYSTEMS:
+        raise ValueError(f"Unknown APP_ROLE '{role}', expected one of: {', '.join(ROLE_SUBSYSTEMS)}.")
+    app.subsystems = ROLE_SUBSYSTEMS[role]
+    app.startup_timings = {}
+
+    # Every subsystem attribute exists on the app, even when its role is not served
+    app.generation = DataGeneration()
+    app.recommend_cache = None
+    app.chart_renderer = None
+    app.llm_client = None
+    app.embedding_model = None
+    app.embedding_cache = None
+    app.chat_sessions = None
+
     with app.app_context():
-        # Load initial data
-        (
-            app.df_clustered_jobs,
-            app.knowledge_map,
-            app.skills_map,
-            app.abilities_map,
-        ) = load_and_prepare_data(app.config)
-
-        if app.df_clustered_jobs is None:
-            print("Critical Error: Data could not be loaded, server cannot start.")
-
-        # Initialize service clients
-        # Initialize LLM client
+        if "recommend" in app.subsystems:
+            _init_recommend(app, app.startup_timings)
+        if "chat" in app.subsystems:
+            _init_chat(app, app.startup_timings)
+
+    app.reloader = Reloader(
+        app,
+        lambda timings: _reload_handles(app, timings),
+        watch_paths=(app.config["DATA_PATH"], app.config["VECTOR_DB_PATH"]),
+        poll_interval=app.config["RELOAD_POLL_SECONDS"],
+    )
+
+    # Register routes
+    with _timed(app.startup_timings, "imports"):
+        from . import routes
+
+    app.register_blueprint(routes.bp)
+    metrics.init_app(app)
+    app.before_request(app.reloader.ensure_watching)
+
+    report = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in app.startup_timings.items())
+    print(f"Startup ({role}): {report}, total {sum(app.startup_timings.values()):.2f}s")
+    return app
+
+
+def _init_recommend(app, timings):
+    """Loads the job data, recommendation engine, response cache and chart renderer."""
+    with _timed(timings, "imports"):
+        from .cache import LRUCache
+        from .visualizations import ChartRenderer
+
+    handles = _load_job_data(app.config, timings)
+    if handles["df_clustered_jobs"] is None:
+        print("Critical Error: Data could not be loaded, server cannot start.")
+    app.generation = app.generation.replace(**handles)
+
+    app.recommend_cache = LRUCache(maxsize=app.config["RECOMMEND_CACHE_SIZE"])
+    app.chart_renderer = ChartRenderer(
+        max_workers=app.config["CHART_RENDER_WORKERS"],
+        cache_size=app.config["CHART_CACHE_SIZE"],
+        timeout=app.config["CHART_RENDER_TIMEOUT"],
+    )
+    app.chart_renderer.warm_up()
+
+
+def _load_job_data(config, timings):
+    """
+    Loads the job data and builds the recommendation engine.
+
+    Returns:
+        dict: The recommend handles of a DataGeneration; all None when the
+        data could not be loaded.
+    """
+    with _timed(timings, "imports"):
+        from .data_processing import load_and_prepare_data
+        from .snapshot import compute_input_hash, load_snapshot
+        from .recommender import RecommendationEngine
+
+    with _timed(timings, "data_load"):
+        # The input files are hashed once, for the snapshot check and the data version
         try:
-            if not app.config["OPEN_ROUTER_API_KEY"]:
-                app.llm_client = None
-                print("Warning: OPEN_ROUTER_API_KEY is not set.")
-            else:
-                print(f"DEBUG: Attempting to initialize LLM client with key length: {len(app.config['OPEN_ROUTER_API_KEY'])}")
-                app.llm_client = openai.OpenAI(
-                    base_url="https://openrouter.ai/api/v1",
-                    api_key=app.config["OPEN_ROUTER_API_KEY"],
-                )
-                print("DEBUG: LLM Client initialized successfully.")
-        except Exception as e:
+            input_hash = compute_input_hash(config)
+        except OSError as e:
+            print(f"Warning: Input files could not be hashed ({e}).")
+            input_hash = None
+        # Load initial data, preferring the prebuilt snapshot over re-clustering
+        df_clustered_jobs, knowledge_index, skills_index, abilities_index = (
+            (input_hash and load_snapshot(config, input_hash)) or load_and_prepare_data(config)
+        )
+        handles = {
+            "df_clustered_jobs": df_clustered_jobs,
+            "knowledge_index": knowledge_index,
+            "skills_index": skills_index,
+            "abilities_index": abilities_index,
+            "recommender": None,
+            "data_version": None,
+        }
+        if df_clustered_jobs is not None:
+            handles["recommender"] = RecommendationEngine.from_frame(
+                df_clustered_jobs,
+                knowledge_index,
+                skills_index,
+                abilities_index,
+                search_clusters=config["SEARCH_CLUSTERS"],
+                search_probes=config["SEARCH_PROBES"],
+            )
+            # Identifies the data behind cached /recommend responses and their ETags
+            handles["data_version"] = input_hash[:16] if input_hash else None
+    return handles
+
+
+def _init_chat(app, timings):
+    """Initializes the LLM client and the RAG components used by /chat."""
+    from .cache import LRUCache
+
+    app.embedding_cache = LRUCache(
+        maxsize=app.config["EMBEDDING_CACHE_SIZE"],
+        ttl=app.config["EMBEDDING_CACHE_TTL"],
+    )
+    if app.config["CHAT_SESSION_TTL"] > 0:
+        from .sessions import SessionStore
+
+        app.chat_sessions = SessionStore(
+            maxsize=app.config["CHAT_SESSION_MAX"],
+            ttl=app.config["CHAT_SESSION_TTL"],
+            max_turns=app.config["CHAT_SESSION_MAX_TURNS"],
+        )
+
+    # Initialize LLM client
+    try:
+        if not app.config["OPEN_ROUTER_API_KEY"]:
             app.llm_client = None
-            print(f"CRITICAL LLM ERROR: Failed to initialize OpenAI client: {e}")
+            print("Warning: OPEN_ROUTER_API_KEY is not set.")
+        else:
+            with _timed(timings, "imports"):
+                import openai
+
+            print(f"DEBUG: Attempting to initialize LLM client with key length: {len(app.config['OPEN_ROUTER_API_KEY'])}")
+            app.llm_client = openai.OpenAI(
+                base_url=app.config["LLM_BASE_URL"],
+                api_key=app.config["OPEN_ROUTER_API_KEY"],
+            )
+            print("DEBUG: LLM Client initialized successfully.")
+    except Exception as e:
+        app.llm_client = None
+        print(f"CRITICAL LLM ERROR: Failed to initialize OpenAI client: {e}")
+
+    # Initialize RAG components
+    try:
+        with _timed(timings, "imports"):
+            from .embeddings import load_embedding_model
+
+        with _timed(timings, "model_load"):
+            app.embedding_model = _connect_embedding_server(app, load_embedding_model)
+            if app.embedding_model is None:
+                app.embedding_model = load_embedding_model(
+                    app.config["EMBEDDING_MODEL_NAME"], app.config["EMBEDDING_BACKEND"]
+                )
+                print(
+                    f"DEBUG: Embedding model '{app.config['EMBEDDING_MODEL_NAME']}' loaded "
+                    f"({app.config['EMBEDDING_BACKEND']} backend)."
+                )
+
+        app.generation = app.generation.replace(**_open_retrieval(app.config, timings))
+
+    except Exception as e:
+        print(f"CRITICAL RAG INIT ERROR: RAG components could not be fully initialized. ERROR: {e}")
+        app.generation = app.generation.replace(retriever=None, onet_collection=None, chroma_client=None)
+
 
-        # Initialize RAG components
+def _open_retrieval(config, timings):
+    """
+    Opens the vector store and the optional BM25 index used by /chat.
+
+    Returns:
+        dict: The chat handles of a DataGeneration.
+
+    Raises:
+        ValueError: If RETRIEVER_BACKEND is unknown.
+    """
+    with _timed(timings, "imports"):
+        from .services import ChromaRetriever, NumpyRetriever, open_collection
+
+    handles = {"chroma_client": None, "onet_collection": None, "retriever": None, "lexical_index": None}
+
+    # Lexical index for hybrid retrieval; optional, chat works without it
+    lexical_path = config["LEXICAL_INDEX_PATH"]
+    if lexical_path.exists():
         try:
-            chroma_path = app.config["VECTOR_DB_PATH"]
-            app.chroma_client = chromadb.PersistentClient(path=str(chroma_path))
+            with _timed(timings, "vector_db_open"):
+                from .lexical import BM25Index
+
+                handles["lexical_index"] = BM25Index(lexical_path)
+                print(f"DEBUG: BM25 index loaded ({len(handles['lexical_index'])} chunks).")
+        except Exception as e:
+            print(f"Warning: BM25 index could not be loaded, using vector search only. ERROR: {e}")
+    else:
+        print(f"No BM25 index at '{lexical_path}', using vector search only.")
+
+    backend = config["RETRIEVER_BACKEND"]
+    if backend == "numpy":
+        with _timed(timings, "vector_db_open"):
+            handles["retriever"] = NumpyRetriever(config["NUMPY_INDEX_PATH"])
+            print(f"DEBUG: NumPy vector index loaded ({len(handles['retriever'])} chunks).")
+    elif backend == "chroma":
+        with _timed(timings, "imports"):
+            import chromadb
+
+        with _timed(timings, "vector_db_open"):
+            chroma_path = config["VECTOR_DB_PATH"]
+            handles["chroma_client"] = chromadb.PersistentClient(path=str(chroma_path))
             print("DEBUG: ChromaDB connection established.")
+            client, collection_name = handles["chroma_client"], config["ONET_COLLECTION_NAME"]
+            handles["onet_collection"] = open_collection(client, chroma_path, collection_name)
+            handles["retriever"] = ChromaRetriever(
+                handles["onet_collection"],
+                reopen=lambda: open_collection(client, chroma_path, collection_name),
+            )
+            print(f"DEBUG: Collection '{handles['onet_collection'].name}' loaded successfully.")
+    else:
+        raise ValueError(f"Unknown RETRIEVER_BACKEND '{backend}', expected 'chroma' or 'numpy'.")
+    return handles
 
-            app.embedding_model = SentenceTransformer(app.config["EMBEDDING_MODEL_NAME"])
-            print(f"DEBUG: Embedding model '{app.config['EMBEDDING_MODEL_NAME']}' loaded.")
 
-            app.onet_collection = app.chroma_client.get_collection(app.config["ONET_COLLECTION_NAME"])
-            print(f"DEBUG: Collection '{app.config['ONET_COLLECTION_NAME']}' loaded successfully.")
+def _reload_handles(app, timings):
+    """
+    Builds the handles of a new DataGeneration for app.reloader.
 
-        except Exception as e:
-            print(f"CRITICAL RAG INIT ERROR: RAG components could not be fully initialized. ERROR: {e}")
-            app.onet_collection = None
-            app.chroma_client = None
+    The embedding model, LLM client, caches and chart renderer are kept;
+    only the data files and indexes are read again.
 
-    # Register routes
-    from . import routes
+    Raises:
+        ValueError: If the job data could not be loaded.
+    """
+    handles = {}
+    if "recommend" in app.subsystems:
+        handles.update(_load_job_data(app.config, timings))
+        if handles["df_clustered_jobs"] is None:
+            raise ValueError("Job data could not be loaded.")
+    if "chat" in app.subsystems and app.embedding_model is not None:
+        handles.update(_open_retrieval(app.config, timings))
+    return handles
 
-    app.register_blueprint(routes.bp)
 
-    return app
+def _connect_embedding_server(app, load_embedding_model):
+    """
+    Returns an EmbeddingClient for the configured embedding server, or None
+    when no server is configured or it does not answer, so the caller loads
+    the model in-process instead.
+    """
+    socket_path = app.config["EMBEDDING_SERVER_SOCKET"]
+    if not socket_path:
+        return None
+
+    from .embedding_server import EmbeddingClient
+
+    client = EmbeddingClient(
+        socket_path,
+        timeout=app.config["EMBEDDING_SERVER_TIMEOUT"],
+        fallback=lambda: load_embedding_model(
+            app.config["EMBEDDING_MODEL_NAME"], app.config["EMBEDDING_BACKEND"]
+        ),
+    )
+    try:
+        client.stats()
+    except OSError as e:
+        print(f"Warning: Embedding server at '{socket_path}' is unreachable ({e}), loading the model in-process.")
+        return None
+    print(f"DEBUG: Using the embedding server at '{socket_path}'.")
+    return client
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+from . import metrics
+from .services import (
+    build_messages,
+    format_sse,
+    normalize_question,
+    parse_soc_codes,
+    retrieve_context,
+)
+from .sessions import parse_session_id, session_turn_context
+
+
+class AsyncChatService:
+    """
+    Answers chat questions on an event loop instead of a blocking worker thread.
+
+    All requests share one AsyncOpenAI client backed by a pooled HTTP client,
+    so many chats can wait on the LLM at once. Identical questions that are
+    already in flight (same normalized question and profile summary) are
+    coalesced onto a single upstream call.
+    """
+
+    def __init__(self, flask_app):
+        import httpx
+        import openai
+
+        self.flask_app = flask_app
+        config = flask_app.config
+        self.client = openai.AsyncOpenAI(
+            base_url=config["LLM_BASE_URL"],
+            api_key=config["OPEN_ROUTER_API_KEY"],
+            max_retries=config["LLM_MAX_RETRIES"],
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=config["LLM_MAX_CONNECTIONS"],
+                    max_keepalive_connections=config["LLM_MAX_KEEPALIVE_CONNECTIONS"],
+                ),
+                timeout=httpx.Timeout(
+                    config["LLM_TIMEOUT"], connect=config["LLM_CONNECT_TIMEOUT"]
+                ),
+            ),
+        )
+        self._in_flight = {}
+        self.coalesced = 0
+
+    async def retrieve(self, user_question, soc_codes=None, session=None):
+        """
+        Runs the (CPU-bound) embedding and vector search off the event loop.
+
+        Returns:
+            tuple: (retrieved_docs, sources, conversation_summary); the
+            summary is None outside a chat session.
+        """
+        app = self.flask_app
+        generation = app.generation
+        if session is not None:
+            return await asyncio.to_thread(
+                session_turn_context, app, generation, session, user_question
+            )
+        retrieved_docs, sources = await asyncio.to_thread(
+            retrieve_context,
+            generation.retriever,
+            user_question,
+            app.embedding_model,
+            app.embedding_cache,
+            app.config["EMBEDDING_MODEL_NAME"],
+            n_results=app.config["CONTEXT_MAX_CHUNKS"],
+            lexical_index=generation.lexical_index,
+            soc_codes=soc_codes,
+            token_budget=app.config["CONTEXT_TOKEN_BUDGET"],
+        )
+        return retrieved_docs, sources, None
+
+    async def answer(self, user_question, profile_summary, soc_codes=None, session=None):
+        """
+        Returns the LLM answer, sharing the upstream call with identical in-flight requests.
+
+        Raises:
+            ValueError: If retrieval or the LLM call fails.
+        """
+        key = (
+            normalize_question(user_question),
+            " ".join(profile_summary.split()),
+            tuple(sorted(set(soc_codes))) if soc_codes else (),
+            # Requests of different sessions differ in their summary, so only same-session ones share
+            session,
+        )
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._answer(user_question, profile_summary, soc_codes, session))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: a client that disconnects must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _answer(self, user_question, profile_summary, soc_codes, session=None):
+        retrieved_docs, _, conversation_summary = await self.retrieve(user_question, soc_codes, session)
+        try:
+            with metrics.timed("llm"):
+                response = await self.client.chat.completions.create(
+                    model=self.flask_app.config["LLM_CHAT_MODEL"],
+                    messages=build_messages(
+                        user_question, profile_summary, retrieved_docs, conversation_summary
+                    ),
+                    temperature=0.7,
+                    max_tokens=2000,
+                )
+            answer = response.choices[0].message.content
+        except Exception as e:
+            print(f"LLM API call error: {e}")
+            raise ValueError("An error occurred while communicating with the AI model.")
+        if session is not None:
+            session.add_turn(user_question, answer)
+        return answer
+
+    async def stream(
+        self,
+        user_question,
+        profile_summary,
+        sources,
+        retrieved_docs,
+        started_at,
+        conversation_summary=None,
+        session=None,
+    ):
+        """
+        Async counterpart of services.stream_ai_response; yields encoded SSE
+        messages, and records the answer in session when one is given.
+        """
+        yield format_sse("sources", {"sources": list(sources)})
+        first_token_at = None
+        answer_parts = []
+        llm_started_at = time.perf_counter()
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.flask_app.config["LLM_CHAT_MODEL"],
+                messages=build_messages(
+                    user_question, profile_summary, retrieved_docs, conversation_summary
+                ),
+                temperature=0.7,
+                max_tokens=2000,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.observe_stage("llm_first_token", first_token_at - llm_started_at)
+                answer_parts.append(chunk.choices[0].delta.content)
+                yield format_sse("token", {"text": chunk.choices[0].delta.content})
+        except Exception as e:
+            print(f"LLM API streaming error: {e}")
+            yield format_sse("error", {"error": "An error occurred while communicating with the AI model."})
+            return
+
+        metrics.observe_stage("llm", time.perf_counter() - llm_started_at)
+        if session is not None:
+            session.add_turn(user_question, "".join(answer_parts))
+
+        total = time.perf_counter() - started_at
+        ttft = first_token_at - started_at if first_token_at is not None else None
+        ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+        print(f"Chat stream finished: time to first token {ttft_text}, total {total:.2f}s")
+        yield format_sse("done", {"ttft": ttft, "total": total})
+
+    async def close(self):
+        await self.client.close()
+
+
+def create_asgi_app(flask_app):
+    """
+    Wraps the Flask app in an ASGI application with a native async POST /chat.
+
+    Every other request, and /chat whenever the async path cannot serve it
+    (chat not configured or not in this worker's role), is handed to the
+    Flask app through asgiref's WSGI adapter, so behaviour and error messages
+    stay identical. Serve with e.g. `uvicorn asgi:application`.
+    """
+    from asgiref.wsgi import WsgiToAsgi
+
+    wsgi_app = WsgiToAsgi(flask_app)
+    chat_service = None
+    if (
+        "chat" in flask_app.subsystems
+        and flask_app.config["OPEN_ROUTER_API_KEY"]
+        and flask_app.retriever is not None
+    ):
+        chat_service = AsyncChatService(flask_app)
+
+    async def application(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send, chat_service)
+            return
+        if (
+            chat_service is not None
+            and scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] == "/chat"
+        ):
+            body = await _read_body(receive)
+            await _handle_chat(chat_service, scope, body, send)
+            return
+        await wsgi_app(scope, receive, send)
+
+    application.chat_service = chat_service
+    return application
+
+
+async def _handle_chat(chat_service, scope, body, send):
+    started_at = time.perf_counter()
+    # Stage timings recorded while answering (including in to_thread) land in this request's list
+    token = metrics.start_request()
+    try:
+        await _answer_chat(chat_service, scope, body, send, started_at)
+    finally:
+        metrics.finish_request(token)
+
+
+async def _answer_chat(chat_service, scope, body, send, started_at):
+    try:
+        data = json.loads(body or b"{}")
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        await _send_json(send, 400, {"error": "Request body must be a JSON object."}, started_at)
+        return
+
+    user_question = data.get("question")
+    profile_summary = data.get("profile_summary")
+    if not user_question or not profile_summary:
+        await _send_json(send, 400, {"error": "Question and profile summary are required."}, started_at)
+        return
+    try:
+        soc_codes = parse_soc_codes(data.get("soc_codes"))
+        session_id = parse_session_id(data.get("session_id"))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)}, started_at)
+        return
+    flask_app = chat_service.flask_app
+    session = None
+    if session_id and flask_app.chat_sessions is not None:
+        session = flask_app.chat_sessions.session(session_id, soc_codes, flask_app.generation.number)
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    stream = query.get("stream", [None])[0] or data.get("stream")
+    stream = str(stream).lower() in ("1", "true", "yes")
+    try:
+        if not stream:
+            answer = await chat_service.answer(user_question, profile_summary, soc_codes, session)
+            await _send_json(send, 200, {"answer": answer}, started_at)
+            return
+        retrieved_docs, sources, conversation_summary = await chat_service.retrieve(
+            user_question, soc_codes, session
+        )
+    except ValueError as e:
+        await _send_json(send, 500, {"error": str(e)}, started_at)
+        return
+    except Exception as e:
+        print(f"Unexpected error occurred in async /chat: {e}")
+        await _send_json(send, 500, {"error": "An unexpected server error occurred."}, started_at)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            *_timing_headers(started_at),
+        ],
+    })
+    async for message in chat_service.stream(
+        user_question, profile_summary, sources, retrieved_docs, started_at, conversation_summary, session
+    ):
+        await send({"type": "http.response.body", "body": message.encode(), "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _timing_headers(started_at):
+    """Records the request duration and returns its Server-Timing header, like metrics.init_app."""
+    total = time.perf_counter() - started_at
+    metrics.REQUEST_SECONDS.observe("/chat", total)
+    return [(b"server-timing", metrics.server_timing(metrics.current_timings(), total).encode())]
+
+
+async def _send_json(send, status, payload, started_at=None):
+    with metrics.timed("json_serialize"):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if started_at is not None:
+        headers += _timing_headers(started_at)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send, chat_service):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if chat_service is not None:
+                await chat_service.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
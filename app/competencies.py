@@ -0,0 +1,71 @@
+import sys
+import numpy as np
+
+
+class CompetencyIndex:
+    """
+    Per-occupation knowledge, skill or ability elements in CSR form.
+
+    Element names are stored once in an interned name table. Row r (the same
+    row order as the recommendation engine) owns element_ids and importance
+    in [offsets[r], offsets[r + 1]), sorted by descending importance, so the
+    top N names of an occupation are a slice and N can be chosen per query.
+    The arrays may be read-only memory maps shared between workers.
+    """
+
+    def __init__(self, names, offsets, element_ids, importance):
+        self.names = [sys.intern(str(name)) for name in names]
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.element_ids = np.asarray(element_ids, dtype=np.int32)
+        self.importance = np.asarray(importance, dtype=np.float32)
+
+    @classmethod
+    def empty(cls, n_rows):
+        """An index with no elements for any of n_rows occupations."""
+        return cls([], np.zeros(n_rows + 1, dtype=np.int32), [], [])
+
+    @classmethod
+    def from_ratings(cls, soc_codes, rating_codes, element_names, values):
+        """
+        Builds the index from parallel arrays of O*NET rating rows.
+
+        Args:
+            soc_codes (array-like): Occupation codes in engine row order.
+            rating_codes, element_names, values (array-like): One entry per
+                rating; ratings for codes not in soc_codes are ignored.
+        """
+        soc_codes = np.asarray(soc_codes).astype(str)
+        rating_codes = np.asarray(rating_codes).astype(str)
+        element_names = np.asarray(element_names).astype(str)
+        values = np.asarray(values, dtype=np.float32)
+
+        row_of = {code: row for row, code in enumerate(soc_codes.tolist())}
+        rows = np.array([row_of.get(code, -1) for code in rating_codes.tolist()], dtype=np.int64)
+        keep = rows >= 0
+        rows, element_names, values = rows[keep], element_names[keep], values[keep]
+
+        names, element_ids = np.unique(element_names, return_inverse=True)
+        # Group by row, most important first; ties keep their input order
+        order = np.lexsort((np.arange(len(rows)), -values, rows))
+        offsets = np.zeros(len(soc_codes) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=len(soc_codes)), out=offsets[1:])
+        return cls(names, offsets, element_ids[order], values[order])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def top(self, row, n=5):
+        """Returns the names of the n most important elements of an occupation row."""
+        start = int(self.offsets[row])
+        stop = min(int(self.offsets[row + 1]), start + n)
+        names = self.names
+        return [names[element_id] for element_id in self.element_ids[start:stop].tolist()]
+
+    def nbytes(self):
+        """Approximate resident size: CSR arrays plus the name table."""
+        return (
+            self.offsets.nbytes
+            + self.element_ids.nbytes
+            + self.importance.nbytes
+            + sum(sys.getsizeof(name) for name in self.names)
+        )
@@ -15,22 +15,114 @@ class Config:
     OPEN_ROUTER_API_KEY = os.getenv("OPEN_ROUTER_API_KEY")
     #OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+    # Subsystems this worker serves: "all", "recommend-only" or "chat-only"
+    APP_ROLE = os.getenv("APP_ROLE", "all")
+
     # Model Settings
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
     LLM_CHAT_MODEL = "openai/gpt-oss-20b:free"
     #LLM_CHAT_MODEL = "gpt-4o"
 
+    # HTTP connection pool and timeouts (seconds) for the async chat path
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
     # Embedding model for vector db
     EMBEDDING_MODEL_NAME = "models/all-MiniLM-L6-v2"
 
+    # How the embedding model runs: "torch" (sentence-transformers), "onnx" or
+    # "onnx-int8" (ONNX Runtime, graphs from scripts/export_onnx_model.py)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+    # Unix socket of a shared embedding server (scripts/run_embedding_server.py).
+    # When set, workers send questions there instead of loading their own model,
+    # and fall back to an in-process model while the server is unreachable.
+    EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+    EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "10"))
+
+    # Micro-batching on the embedding server: max texts per forward pass, and
+    # the longest a request waits for others to join its batch
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+    EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+    # Query-embedding cache: max entries and optional TTL in seconds
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+    EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "0")) or None
+
     # Data and chromadb directories 
     DATA_PATH = BASE_DIR / "data"
     VECTOR_DB_PATH = BASE_DIR / "data" / "chroma_db"
 
     ONET_COLLECTION_NAME = "onet_data"
 
+    # Chat retrieval backend: "chroma" or "numpy" (in-process exact search over
+    # the index written by scripts/export_numpy_index.py)
+    RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")
+    NUMPY_INDEX_PATH = DATA_PATH / "vector_index"
+
+    # BM25 index built by scripts/vectorize_knowledge_base.py; when present,
+    # chat retrieval is hybrid (lexical + vector) with a lexical fast path
+    LEXICAL_INDEX_PATH = DATA_PATH / "bm25_index"
+
+    # Chat prompt context: chunks retrieved per question, and the token budget
+    # they are packed into after merging overlapping chunks (0 = no limit)
+    CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "8"))
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200")) or None
+
+    # Chat sessions for requests that send a "session_id": kept CHAT_SESSION_TTL
+    # seconds after their last turn (0 = sessions off). A follow-up whose question
+    # embeds within CHAT_SESSION_REUSE_SIMILARITY of an earlier one reuses the
+    # session's chunks without a search; otherwise new hits are merged in, up to
+    # CHAT_SESSION_MAX_CHUNKS. Earlier turns go in a summary of at most
+    # CHAT_SUMMARY_TOKEN_BUDGET tokens; only the last CHAT_SESSION_MAX_TURNS
+    # questions and turns are kept per session.
+    CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+    CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+    CHAT_SESSION_REUSE_SIMILARITY = float(os.getenv("CHAT_SESSION_REUSE_SIMILARITY", "0.85"))
+    CHAT_SESSION_MAX_CHUNKS = int(os.getenv("CHAT_SESSION_MAX_CHUNKS", "16"))
+    CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300")) or None
+    CHAT_SESSION_MAX_TURNS = int(os.getenv("CHAT_SESSION_MAX_TURNS", "20"))
+
     # File Paths
     ABILITIES_FILE_PATH = DATA_PATH / "abilities.parquet"
     INTERESTS_FILE_PATH = DATA_PATH / "interests.parquet"
     KNOWLEDGE_FILE_PATH = DATA_PATH / "knowledge.parquet"
     OCCUPATIONS_FILE_PATH = DATA_PATH / "occupations.parquet"
-    SKILLS_FILE_PATH = DATA_PATH / "skills.parquet"
\ No newline at end of file
+    SKILLS_FILE_PATH = DATA_PATH / "skills.parquet"
+
+    # Prepared data snapshot written by scripts/build_snapshot.py
+    SNAPSHOT_PATH = DATA_PATH / "snapshot"
+
+    # Hot reload of the job data and indexes without a restart: each worker polls
+    # DATA_PATH and VECTOR_DB_PATH every RELOAD_POLL_SECONDS (0 = no watch), and
+    # POST /admin/reload triggers a reload when ADMIN_TOKEN is set
+    RELOAD_POLL_SECONDS = float(os.getenv("RELOAD_POLL_SECONDS", "0"))
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+    # Data preparation settings (part of the snapshot hash)
+    N_CLUSTERS = 8
+
+    # Default number of knowledge/skill/ability names listed per occupation;
+    # requests may override it with "competency_top_n"
+    COMPETENCY_TOP_N = int(os.getenv("COMPETENCY_TOP_N", "5"))
+
+    # /recommend responses cached per profile, options and data version
+    # (0 disables the cache; ETags are sent either way)
+    RECOMMEND_CACHE_SIZE = int(os.getenv("RECOMMEND_CACHE_SIZE", "256"))
+
+    # Two-stage search: occupations are split into SEARCH_CLUSTERS k-means
+    # partitions and only the SEARCH_PROBES nearest are ranked (0 = exact search).
+    # See scripts/benchmark_cluster_search.py for the recall/latency trade-off.
+    SEARCH_CLUSTERS = int(os.getenv("SEARCH_CLUSTERS", "0"))
+    SEARCH_PROBES = int(os.getenv("SEARCH_PROBES", "2"))
+
+    # Number of answer sets scored per matrix product by /recommend/batch
+    BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "1024"))
+
+    # Chart rendering: worker processes (0 renders inline) and cached images
+    CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+    CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "512"))
+    CHART_RENDER_TIMEOUT = 30
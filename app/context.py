@@ -0,0 +1,145 @@
+import math
+import re
+
+# Chunks from chunk_text() overlap by at most this many words
+MAX_OVERLAP_WORDS = 100
+
+# A trailing segment is only truncated into the budget if at least this much room is left
+MIN_SEGMENT_TOKENS = 40
+
+SEGMENT_SEPARATOR = "\n\n---\n\n"
+
+_CHUNK_TITLE_RE = re.compile(r"\s*\(Chunk \d+\)$")
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Counts prompt tokens with tiktoken when it is installed, otherwise
+    estimates them at four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def _chunk_position(doc_id):
+    """Splits a "CODE#n" chunk id into (CODE, n); ids without a number get n = None."""
+    code, _, number = doc_id.partition("#")
+    return code, int(number) if number.isdigit() else None
+
+
+def _merge_overlap(first, second):
+    """Appends second to first, dropping the longest suffix of first that second starts with."""
+    first_words, second_words = first.split(), second.split()
+    for size in range(min(len(first_words), len(second_words), MAX_OVERLAP_WORDS), 0, -1):
+        if first_words[-size:] == second_words[:size]:
+            return " ".join(first_words + second_words[size:])
+    return " ".join(first_words + second_words)
+
+
+def _segments(hits):
+    """
+    Groups hits into segments of consecutive chunks of the same occupation.
+
+    Returns:
+        list: (rank, title, text, hits) tuples ordered by the best rank of
+        any chunk in the segment.
+    """
+    by_code = {}
+    for rank, hit in enumerate(hits):
+        code, number = _chunk_position(hit["doc_id"])
+        by_code.setdefault(code, []).append((number, rank, hit))
+
+    segments = []
+    for entries in by_code.values():
+        entries.sort(key=lambda entry: (entry[0] is None, entry[0] or 0, entry[1]))
+        run = []
+        for entry in entries:
+            if run and (entry[0] is None or run[-1][0] is None or entry[0] != run[-1][0] + 1):
+                segments.append(run)
+                run = []
+            run.append(entry)
+        segments.append(run)
+
+    packed = []
+    for run in segments:
+        hits_in_run = [hit for _, _, hit in run]
+        text = hits_in_run[0]["document"]
+        for hit in hits_in_run[1:]:
+            text = _merge_overlap(text, hit["document"])
+        if len(run) == 1:
+            title = hits_in_run[0]["title"]
+        else:
+            base_title = _CHUNK_TITLE_RE.sub("", hits_in_run[0]["title"])
+            title = f"{base_title} (Chunks {run[0][0]}-{run[-1][0]})"
+        packed.append((min(rank for _, rank, _ in run), title, text, hits_in_run))
+    packed.sort(key=lambda segment: segment[0])
+    return packed
+
+
+def _truncate(text, max_tokens):
+    """Cuts text at a word boundary so it fits in max_tokens."""
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low])
+
+
+def pack_context(hits, token_budget=None):
+    """
+    Builds the prompt context from ranked retrieval hits within a token budget.
+
+    Consecutive chunks of the same occupation ("CODE#n", "CODE#n+1") are
+    merged and the words they share through chunk overlap are sent once.
+    Segments are added in order of their best hit's rank until the budget is
+    used; the last one is truncated when a useful amount of room is left.
+
+    Returns:
+        tuple: (context, sources, stats) where sources lists the titles of the
+        chunks that made it into the context and stats has "tokens_sent",
+        "tokens_saved" (by merging overlap, against joining every hit
+        verbatim), "tokens_dropped" (cut to fit the budget) and "segments".
+    """
+    unpacked = SEGMENT_SEPARATOR.join(f"{hit['title']}: {hit['document']}" for hit in hits)
+    segments = [
+        (f"{title}: {text}", segment_hits) for _, title, text, segment_hits in _segments(hits)
+    ]
+    merged_tokens = count_tokens(SEGMENT_SEPARATOR.join(part for part, _ in segments))
+
+    parts, sources, used = [], [], 0
+    for part, segment_hits in segments:
+        cost = count_tokens(part) + (count_tokens(SEGMENT_SEPARATOR) if parts else 0)
+        if token_budget is not None and used + cost > token_budget:
+            room = token_budget - used - (count_tokens(SEGMENT_SEPARATOR) if parts else 0)
+            if room < MIN_SEGMENT_TOKENS:
+                continue
+            part = _truncate(part, room)
+            cost = count_tokens(part) + (count_tokens(SEGMENT_SEPARATOR) if parts else 0)
+        parts.append(part)
+        sources.extend(hit["title"] for hit in segment_hits)
+        used += cost
+
+    context = SEGMENT_SEPARATOR.join(parts)
+    tokens_sent = count_tokens(context)
+    stats = {
+        "tokens_sent": tokens_sent,
+        "tokens_saved": max(count_tokens(unpacked) - merged_tokens, 0),
+        "tokens_dropped": max(merged_tokens - tokens_sent, 0),
+        "segments": len(parts),
+    }
+    return context, sources, stats
@@ -1,21 +1,33 @@
+import itertools
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from .competencies import CompetencyIndex
+from .recommender import profile_from_answers
 
 
 def load_and_prepare_data(config):
     """Loads data files from Parquet, merges them, and performs clustering."""
+    # scikit-learn is only needed on this slow path, not when a snapshot is loaded
+    from sklearn.cluster import KMeans
+
     try:
         # Load and Merge Data using faster Parquet format
         df_jobs = pd.read_parquet(
             config["OCCUPATIONS_FILE_PATH"], columns=["O*NET-SOC Code", "Title"]
         ).set_index("O*NET-SOC Code")
 
-        df_interests = pd.read_parquet(config["INTERESTS_FILE_PATH"])
-        df_interests = df_interests[df_interests["Scale ID"] == "OI"]
+        # Only the occupational-interest rows and the three pivot columns are read
+        df_interests = pd.read_parquet(
+            config["INTERESTS_FILE_PATH"],
+            columns=["O*NET-SOC Code", "Element ID", "Data Value"],
+            filters=[("Scale ID", "==", "OI")],
+        )
 
         df_riasec_profiles = df_interests.pivot_table(
-            index="O*NET-SOC Code", columns="Element ID", values="Data Value"
+            index="O*NET-SOC Code", columns="Element ID", values="Data Value", observed=True
         )
+        df_riasec_profiles.index = df_riasec_profiles.index.astype(str)
+        df_riasec_profiles.columns = df_riasec_profiles.columns.astype(str)
 
         riasec_mapping = {
             "1.B.1.a": "R_score",
@@ -32,8 +44,8 @@ def load_and_prepare_data(config):
         features = ["R_score", "I_score", "A_score", "S_score", "E_score", "C_score"]
         job_scores = df_job_profiles[features].fillna(0)
         kmeans = KMeans(
-            n_clusters=8, random_state=42, n_init="auto"
-        ) 
+            n_clusters=config["N_CLUSTERS"], random_state=42, n_init="auto"
+        )
         df_job_profiles["cluster"] = kmeans.fit_predict(job_scores)
         cluster_centers = pd.DataFrame(kmeans.cluster_centers_, columns=features)
 
@@ -48,13 +60,14 @@ def load_and_prepare_data(config):
             cluster_centers["cluster_name"].to_dict()
         )
 
-        # Create knowledge, skills and abilities maps
-        knowledge_map = _get_top_elements(config["KNOWLEDGE_FILE_PATH"])
-        skills_map = _get_top_elements(config["SKILLS_FILE_PATH"])
-        abilities_map = _get_top_elements(config["ABILITIES_FILE_PATH"])
+        # Create knowledge, skills and abilities indexes aligned with the job rows
+        soc_codes = df_job_profiles.index.to_numpy()
+        knowledge_index = _load_competencies(config["KNOWLEDGE_FILE_PATH"], soc_codes)
+        skills_index = _load_competencies(config["SKILLS_FILE_PATH"], soc_codes)
+        abilities_index = _load_competencies(config["ABILITIES_FILE_PATH"], soc_codes)
 
         print("Data loaded and prepared successfully from Parquet files.")
-        return df_job_profiles, knowledge_map, skills_map, abilities_map
+        return df_job_profiles, knowledge_index, skills_index, abilities_index
 
     except FileNotFoundError as e:
         print(f"ERROR: Required data file not found: '{e.filename}'.")
@@ -67,21 +80,81 @@ def load_and_prepare_data(config):
         return None, None, None, None
 
 
-def _get_top_elements(filename, scale_id_filter="IM"):
-    """Helper function: Gets the top 5 elements for each occupation from Parquet files."""
+def iter_batch_recommendations(engine, answer_sets, top_k=20, chunk_size=1024, competency_top_n=5):
+    """
+    Scores many RIASEC answer sets against the job profiles, one chunk at a time.
+
+    Answer sets are consumed lazily from any iterable and scored chunk_size at a
+    time with a single matrix-matrix product, so memory stays bounded no matter
+    how many respondents are streamed through.
+
+    Args:
+        engine (RecommendationEngine): Engine built by create_app.
+        answer_sets (iterable): Dicts shaped like the /recommend request body,
+            optionally carrying an "id" key that is echoed back.
+        top_k (int): Number of recommendations per respondent.
+        chunk_size (int): Number of answer sets scored per matrix product.
+        competency_top_n (int): Knowledge/skill/ability names listed per occupation.
+
+    Yields:
+        dict: {"index", "id", "profile", "recommendations"} per respondent, in input order,
+        or {"index", "id", "error"} when an answer set cannot be scored.
+    """
+    indexed = enumerate(answer_sets)
+    while True:
+        chunk = list(itertools.islice(indexed, chunk_size))
+        if not chunk:
+            return
+
+        scored, profiles, failed = [], [], {}
+        for index, answers in chunk:
+            if not isinstance(answers, dict):
+                failed[index] = {"index": index, "id": None, "error": "Answer set must be a JSON object."}
+                continue
+            try:
+                profiles.append(profile_from_answers(answers))
+                scored.append((index, answers))
+            except (TypeError, ValueError) as e:
+                failed[index] = {
+                    "index": index,
+                    "id": answers.get("id"),
+                    "error": f"Invalid answer set: {e}",
+                }
+
+        results = (
+            engine.recommend_many(np.vstack(profiles), k=top_k, competency_top_n=competency_top_n)
+            if profiles
+            else []
+        )
+        by_index = {
+            index: {
+                "index": index,
+                "id": answers.get("id"),
+                "profile": profile.tolist(),
+                "recommendations": recommendations,
+            }
+            for (index, answers), profile, recommendations in zip(scored, profiles, results)
+        }
+        for index, _ in chunk:
+            yield by_index.get(index) or failed[index]
+
+
+def _load_competencies(filename, soc_codes, scale_id_filter="IM"):
+    """Helper function: Loads every element's importance per occupation from a Parquet file."""
     try:
-        df = pd.read_parquet(filename)
-        df_important = df[df["Scale ID"] == scale_id_filter]
-        top_elements = (
-            df_important.sort_values("Data Value", ascending=False)
-            .groupby("O*NET-SOC Code")
-            .head(5)
+        df_important = pd.read_parquet(
+            filename,
+            columns=["O*NET-SOC Code", "Element Name", "Data Value"],
+            filters=[("Scale ID", "==", scale_id_filter)],
         )
-        return (
-            top_elements.groupby("O*NET-SOC Code")["Element Name"].apply(list).to_dict()
+        return CompetencyIndex.from_ratings(
+            soc_codes,
+            df_important["O*NET-SOC Code"].to_numpy(),
+            df_important["Element Name"].to_numpy(),
+            df_important["Data Value"].to_numpy(),
         )
     except (FileNotFoundError, pd.errors.EmptyDataError):
         print(
             f"Warning: Competency file not found or is empty: '{filename}'. This section will be skipped."
         )
-        return {}
+        return CompetencyIndex.empty(len(soc_codes))
@@ -0,0 +1,278 @@
+import os
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+import socketserver
+from concurrent.futures import Future
+import numpy as np
+
+# Every message is a 4-byte big-endian length followed by the payload. A
+# request is one JSON frame; a reply is a JSON header frame, followed for
+# "encode" by one frame of float32 vectors in the shape the header gives.
+_LENGTH = struct.Struct(">I")
+
+
+def _send_frame(sock, payload):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Embedding server connection closed.")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def _recv_frame(sock):
+    (size,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return _recv_exactly(sock, size)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent encode requests into one model call.
+
+    A single thread owns the model. It takes the first waiting request, then
+    keeps adding requests until max_batch_size texts are collected or
+    max_wait seconds have passed since the first one, and encodes them in
+    one forward pass. A lone request therefore waits at most max_wait.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait=0.005):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = self.batches = self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        """Queues texts for encoding; returns a Future of their (n, dim) float32 array."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def close(self):
+        """Encodes the requests already queued, then stops the batching thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch, size = [item], len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._encode(batch, size)
+
+    def _encode(self, batch, size):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            vectors = np.asarray(
+                self.model.encode(texts, batch_size=max(size, 1)), dtype=np.float32
+            ) if texts else np.zeros((0, 0), dtype=np.float32)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.requests += len(batch)
+        self.batches += 1
+        self.texts += size
+        start = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[start:start + len(request_texts)])
+            start += len(request_texts)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until the client disconnects."""
+
+    def handle(self):
+        while True:
+            try:
+                frame = _recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                # A malformed frame is answered with an error like any other bad request
+                request = json.loads(frame)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object.")
+                if request.get("op") == "stats":
+                    _send_frame(self.request, json.dumps(self.server.batcher.stats()).encode())
+                    continue
+                texts = request["texts"]
+                if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                    raise ValueError("texts must be a list of strings.")
+                vectors = self.server.batcher.submit(texts).result()
+                header = {"shape": list(vectors.shape)}
+                _send_frame(self.request, json.dumps(header).encode())
+                _send_frame(self.request, np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+            except OSError:
+                return
+            except Exception as e:
+                try:
+                    _send_frame(self.request, json.dumps({"error": str(e)}).encode())
+                except OSError:
+                    return
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Shares one embedding model between all app workers of a host.
+
+    Each client connection gets a thread; every connection's requests go
+    through the same MicroBatcher, so questions arriving at the same time
+    from different workers are encoded in one forward pass.
+    """
+
+    daemon_threads = True
+    # socketserver's default backlog of 5 makes connects fail with EAGAIN
+    # when many worker threads open their connections at the same moment
+    request_queue_size = 128
+
+    def __init__(self, socket_path, model, max_batch_size=64, max_wait=0.005):
+        socket_path = str(socket_path)
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = MicroBatcher(model, max_batch_size, max_wait)
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class EmbeddingClient:
+    """
+    Drop-in replacement for the embedding model that encodes on an EmbeddingServer.
+
+    encode() has the same call shape as SentenceTransformer.encode for the
+    arguments this app uses. Each thread keeps its own connection. When the
+    server cannot be reached, times out or answers with an error, encode()
+    uses the model returned by fallback() (loaded on first use) instead, and
+    tries the server again on the next call.
+    """
+
+    def __init__(self, socket_path, timeout=10.0, fallback=None):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.fallback = fallback
+        self._fallback_model = None
+        self._fallback_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _request(self, request):
+        """
+        Sends a request and returns (header, socket).
+
+        A send that fails on a reused connection (the server restarted since
+        it was opened) is retried once on a new one. Nothing else is retried:
+        after a timeout the server may still be encoding the request.
+
+        Raises:
+            OSError: If the server is unreachable or does not answer in time.
+            RuntimeError: If the server answers with an error.
+        """
+        payload = json.dumps(request).encode()
+        for attempt in range(2):
+            reused = getattr(self._local, "sock", None) is not None
+            sock = self._connection()
+            try:
+                _send_frame(sock, payload)
+                break
+            except OSError as e:
+                self._disconnect()
+                if attempt or not reused or not isinstance(e, ConnectionError):
+                    raise
+        try:
+            header = json.loads(_recv_frame(sock))
+        except OSError:
+            # A late reply would be read as the answer to the next request
+            self._disconnect()
+            raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        return header, sock
+
+    def stats(self):
+        """Returns the server's batching counters; raises OSError when it is unreachable."""
+        return self._request({"op": "stats"})[0]
+
+    def _fallback_encode(self, sentences, error, **kwargs):
+        if self.fallback is None:
+            raise error
+        with self._fallback_lock:
+            if self._fallback_model is None:
+                print(f"Warning: Embedding server failed ({error}), loading the model in-process.")
+                self._fallback_model = self.fallback()
+        return self._fallback_model.encode(sentences, **kwargs)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Embeds a list of sentences (or one sentence) into a float32 array."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        try:
+            header, sock = self._request({"op": "encode", "texts": list(sentences)})
+            vectors = np.frombuffer(_recv_frame(sock), dtype="<f4").reshape(header["shape"])
+        except OSError as e:
+            self._disconnect()
+            vectors = self._fallback_encode(sentences, e, batch_size=batch_size, **kwargs)
+        except RuntimeError as e:
+            # The server answered, so the connection is still in step and is kept
+            vectors = self._fallback_encode(sentences, e, batch_size=batch_size, **kwargs)
+        return vectors[0] if single else vectors
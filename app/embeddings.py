@@ -0,0 +1,129 @@
+import json
+import pathlib
+import numpy as np
+
+# ONNX graphs written by scripts/export_onnx_model.py, relative to the model directory
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_qint8.onnx",
+}
+EMBEDDING_BACKENDS = ("torch", *ONNX_FILES)
+
+
+def _read_json(path, default=None):
+    if not path.exists():
+        return {} if default is None else default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxEmbedder:
+    """
+    Runs an exported sentence-transformers model with ONNX Runtime.
+
+    The transformer runs as an ONNX graph; tokenization (tokenizer.json),
+    pooling (1_Pooling/config.json) and L2 normalization (a Normalize entry
+    in modules.json) follow the model's own sentence-transformers config, so
+    vectors match SentenceTransformer.encode and torch is never imported.
+    encode() has the same call shape as SentenceTransformer.encode for the
+    arguments this app uses.
+    """
+
+    def __init__(self, model_path, file_name=ONNX_FILES["onnx"], threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = pathlib.Path(model_path)
+        onnx_path = model_path / file_name
+        if not onnx_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model '{onnx_path}' not found; run scripts/export_onnx_model.py first."
+            )
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.max_seq_length = _read_json(model_path / "sentence_bert_config.json").get(
+            "max_seq_length", 256
+        )
+        pad_token = _read_json(model_path / "tokenizer_config.json").get("pad_token", "[PAD]")
+        self.tokenizer = Tokenizer.from_file(str(model_path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token
+        )
+
+        pooling = _read_json(model_path / "1_Pooling" / "config.json")
+        self.pooling = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+        modules = _read_json(model_path / "modules.json", default=[])
+        self.normalize = any(module["type"].endswith(".Normalize") for module in modules)
+
+    def _encode_batch(self, sentences):
+        encodings = self.tokenizer.encode_batch(sentences)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        if self.pooling == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[:, :, None].astype(token_embeddings.dtype)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """
+        Embeds a list of sentences (or one sentence) into a float32 array.
+
+        Sentences are batched longest first, as sentence-transformers does, so
+        each batch is padded to similar lengths. Other keyword arguments of
+        SentenceTransformer.encode are accepted and ignored.
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        batches = [
+            self._encode_batch([sentences[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(sentences), batch_size)
+        ]
+        embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+        if self.normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name, backend="torch"):
+    """
+    Loads the embedding model for the configured EMBEDDING_BACKEND.
+
+    "torch" loads sentence-transformers; "onnx" and "onnx-int8" load the
+    graphs exported next to the model by scripts/export_onnx_model.py, so
+    model_name must then be a local model directory.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    if backend not in ONNX_FILES:
+        raise ValueError(
+            f"Unknown EMBEDDING_BACKEND '{backend}', expected one of: {', '.join(EMBEDDING_BACKENDS)}."
+        )
+    return OnnxEmbedder(model_name, ONNX_FILES[backend])
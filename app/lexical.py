@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import numpy as np
+
+# Bump whenever the on-disk layout or the tokenizer changes
+LEXICAL_FORMAT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+CHUNKS_FILE = "chunks.parquet"
+
+# Runs of letters and digits in any script ("c++" and "c#" keep their suffix)
+_TOKEN_RE = re.compile(r"[^\W_]+[+#]*")
+
+# Words that carry no occupation-specific meaning in chat questions
+STOPWORDS = frozenset(
+    "a about an and are as at be can could do does for from how i in into is it "
+    "me my of on or should tell that the their them there this to what when "
+    "where which who why will with would you your".split()
+)
+
+
+def _singular(token):
+    """Folds simple English plurals so "technologists" matches "technologist"."""
+    if len(token) <= 3 or not token.endswith("s") or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    return token[:-1]
+
+
+def tokenize(text):
+    """
+    Lowercases and splits text into index terms, dropping stopwords and plural endings.
+
+    Accents are removed, so "résumé" and "resume" are the same term; letters
+    without an ASCII form are kept as they are.
+    """
+    text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", text).casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [_singular(token) for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def soc_code_of(doc_id):
+    """Chunk ids are "CODE#n"; returns the occupation code part."""
+    return doc_id.split("#", 1)[0]
+
+
+def rows_by_soc_code(doc_ids):
+    """Maps each SOC code to the array of chunk rows that belong to it."""
+    rows = {}
+    for row, doc_id in enumerate(doc_ids):
+        rows.setdefault(soc_code_of(doc_id), []).append(row)
+    return {code: np.array(code_rows, dtype=np.int64) for code, code_rows in rows.items()}
+
+
+def restrict_rows(rows_by_code, soc_codes):
+    """Chunk rows of the given SOC codes, sorted; unknown codes are ignored."""
+    parts = [rows_by_code[code] for code in set(soc_codes) if code in rows_by_code]
+    return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the knowledge-base chunks, stored as memory-mapped arrays.
+
+    The vocabulary is a sorted term array; each term owns a slice of the
+    postings (chunk row, term frequency) given by term_offsets. A query looks
+    its terms up with a binary search and accumulates scores into one dense
+    array, so no per-document Python objects are built.
+    """
+
+    def __init__(self, index_path):
+        import pandas as pd
+
+        with open(index_path / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != LEXICAL_FORMAT_VERSION:
+            raise ValueError(f"Lexical index at '{index_path}' has an outdated format.")
+
+        def load(name):
+            return np.load(index_path / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+        self.k1 = manifest["k1"]
+        self.b = manifest["b"]
+        self.vocabulary = load("vocabulary")
+        self.term_offsets = load("term_offsets")
+        self.postings = load("postings")
+        self.term_frequencies = load("term_frequencies")
+        self.doc_lengths = load("doc_lengths")
+        avg_doc_length = float(manifest["avg_doc_length"]) or 1.0
+        self.length_norm = (
+            self.k1 * (1 - self.b + self.b * self.doc_lengths / avg_doc_length)
+        ).astype(np.float32)
+
+        chunks = pd.read_parquet(index_path / CHUNKS_FILE)
+        self.doc_ids = chunks["doc_id"].to_numpy(dtype=object)
+        self.titles = chunks["title"].to_numpy(dtype=object)
+        self.documents = chunks["content"].to_numpy(dtype=object)
+        self.rows_by_soc_code = rows_by_soc_code(self.doc_ids)
+
+        n_docs = len(self.doc_ids)
+        document_frequency = np.diff(self.term_offsets).astype(np.float64)
+        self.idf = np.log1p(
+            (n_docs - document_frequency + 0.5) / (document_frequency + 0.5)
+        ).astype(np.float32)
+        self.fast_path_hits = 0
+        self._fast_path_lock = threading.Lock()
+
+    @staticmethod
+    def build(index_path, records, k1=1.2, b=0.75):
+        """
+        Tokenizes knowledge-base records and writes the index directory.
+
+        Args:
+            index_path (Path): Target directory, replaced atomically.
+            records (iterable): Dicts with "doc_id", "title" and "content".
+        """
+        import pandas as pd
+
+        doc_ids, titles, documents, doc_lengths = [], [], [], []
+        term_postings = {}
+        for row, record in enumerate(records):
+            tokens = tokenize(f"{record['title']} {record['content']}")
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_postings.setdefault(token, []).append((row, count))
+            doc_ids.append(record["doc_id"])
+            titles.append(record["title"])
+            documents.append(record["content"])
+            doc_lengths.append(len(tokens))
+
+        vocabulary = sorted(term_postings)
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        postings, term_frequencies = [], []
+        for i, term in enumerate(vocabulary):
+            rows, counts = zip(*term_postings[term])
+            postings.extend(rows)
+            term_frequencies.extend(counts)
+            term_offsets[i + 1] = len(postings)
+
+        tmp_path = index_path.with_name(f"{index_path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        arrays = {
+            "vocabulary": np.array(vocabulary, dtype=str) if vocabulary else np.array([], dtype="<U1"),
+            "term_offsets": term_offsets,
+            "postings": np.array(postings, dtype=np.int32),
+            "term_frequencies": np.array(term_frequencies, dtype=np.uint16),
+            "doc_lengths": np.array(doc_lengths, dtype=np.int32),
+        }
+        for name, array in arrays.items():
+            np.save(tmp_path / f"{name}.npy", array, allow_pickle=False)
+        pd.DataFrame({"doc_id": doc_ids, "title": titles, "content": documents}).to_parquet(
+            tmp_path / CHUNKS_FILE, index=False
+        )
+        manifest = {
+            "format_version": LEXICAL_FORMAT_VERSION,
+            "k1": k1,
+            "b": b,
+            "documents": len(doc_ids),
+            "terms": len(vocabulary),
+            "avg_doc_length": float(np.mean(doc_lengths)) if doc_lengths else 0.0,
+        }
+        with open(tmp_path / MANIFEST_NAME, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_path = index_path.with_name(f"{index_path.name}.old-{os.getpid()}")
+        if index_path.exists():
+            index_path.rename(old_path)
+        tmp_path.rename(index_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return manifest
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _term_ids(self, terms):
+        positions = np.searchsorted(self.vocabulary, terms)
+        return [
+            int(position)
+            for term, position in zip(terms, positions)
+            if position < len(self.vocabulary) and self.vocabulary[position] == term
+        ]
+
+    def search(self, query, n_results=5, soc_codes=None):
+        """
+        Returns the n_results best BM25 matches for the query text, best first.
+
+        Each hit has the same keys as a retriever hit plus "matched", the
+        fraction of distinct query terms that occur in the chunk. With
+        soc_codes only chunks of those occupations are considered.
+        """
+        terms = sorted(set(tokenize(query)))
+        term_ids = self._term_ids(terms) if terms else []
+        if not term_ids:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        matched = np.zeros(len(self.doc_ids), dtype=np.int16)
+        for term_id in term_ids:
+            start, stop = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            rows = self.postings[start:stop]
+            tf = self.term_frequencies[start:stop].astype(np.float32)
+            scores[rows] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[rows])
+            matched[rows] += 1
+
+        if soc_codes:
+            rows = restrict_rows(self.rows_by_soc_code, soc_codes)
+            candidates = rows[scores[rows] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        k = min(n_results, len(candidates))
+        if k == 0:
+            return []
+        best = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = best[np.lexsort((best, -scores[best]))]
+        return [
+            {
+                "doc_id": self.doc_ids[row],
+                "title": self.titles[row],
+                "document": self.documents[row],
+                "score": float(scores[row]),
+                "matched": float(matched[row]) / len(terms),
+            }
+            for row in best
+        ]
+
+    def record_fast_path(self):
+        """Counts a question answered from BM25 alone; called from concurrent requests."""
+        with self._fast_path_lock:
+            self.fast_path_hits += 1
+
+    def info(self):
+        return {
+            "chunks": len(self.doc_ids),
+            "terms": len(self.vocabulary),
+            "fast_path_hits": self.fast_path_hits,
+        }
+
+
+def is_decisive(hits, ratio=1.5):
+    """
+    True when the best lexical hit can be trusted without a vector search.
+
+    Every query term must occur in the top chunk, and its score must beat the
+    best chunk of any other occupation by the given ratio. Chunks of the same
+    occupation share the "CODE" part of their "CODE#n" doc_id.
+    """
+    if not hits or hits[0]["matched"] < 1.0:
+        return False
+    occupation = soc_code_of(hits[0]["doc_id"])
+    for hit in hits[1:]:
+        if soc_code_of(hit["doc_id"]) != occupation:
+            return hits[0]["score"] >= ratio * hit["score"]
+    return True
+
+
+def reciprocal_rank_fusion(result_lists, n_results=5, k=60):
+    """
+    Merges ranked hit lists with reciprocal rank fusion (score = sum 1 / (k + rank)).
+
+    Hits are matched on doc_id; the first list a hit appears in supplies its
+    text, and "score" is replaced by the fused score.
+    """
+    fused, hits = {}, {}
+    for result_list in result_lists:
+        for rank, hit in enumerate(result_list, start=1):
+            doc_id = hit["doc_id"]
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(doc_id, hit)
+    ranked = sorted(fused, key=lambda doc_id: -fused[doc_id])[:n_results]
+    return [dict(hits[doc_id], score=fused[doc_id]) for doc_id in ranked]
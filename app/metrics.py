@@ -0,0 +1,224 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond scoring to slow LLM calls
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage timings of the request being served, for its Server-Timing header.
+# A context variable (not flask.g) so that asyncio.to_thread in the ASGI chat
+# path records into the same list.
+_request_timings = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """
+    Thread-safe duration histogram with one label, rendered in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, name, documentation, label, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def snapshot(self):
+        """Returns {label_value: (bucket_counts, count, sum)} with cumulative bucket counts."""
+        with self._lock:
+            series = {value: (list(counts), total) for value, (counts, total) in self._series.items()}
+        snapshot = {}
+        for value, (counts, total) in series.items():
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            snapshot[value] = (cumulative, running, total)
+        return snapshot
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for value, (cumulative, count, total) in sorted(self.snapshot().items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, bucket_count in zip(self.buckets, cumulative):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "occumend_stage_duration_seconds",
+    "Time spent in each request stage.",
+    "stage",
+)
+REQUEST_SECONDS = Histogram(
+    "occumend_request_duration_seconds",
+    "Time from request start until the response headers are ready, per endpoint.",
+    "endpoint",
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def observe_stage(stage, seconds):
+    """Records a stage duration in the histogram and in the current request's timings."""
+    STAGE_SECONDS.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    """Times the block as one occurrence of stage (see observe_stage)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def start_request():
+    """Starts collecting stage timings for the current request; returns a token for finish_request."""
+    return _request_timings.set([])
+
+
+def current_timings():
+    """The (stage, seconds) pairs recorded so far for the current request."""
+    return list(_request_timings.get() or [])
+
+
+def finish_request(token):
+    """Stops collecting and returns the (stage, seconds) pairs recorded since start_request."""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def server_timing(timings, total=None):
+    """
+    Formats stage timings as a Server-Timing header value, e.g.
+    "scoring;dur=0.21, chart_render;dur=14.02, total;dur=15.80".
+
+    A stage recorded more than once (a filtered search topped up with a global
+    one) is reported once with its summed duration.
+    """
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations["total"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items())
+
+
+def _timed_json_provider(app):
+    """The app's JSON provider with dumps() timed as the "json_serialize" stage."""
+    provider_class = type(app.json)
+
+    class TimedJSONProvider(provider_class):
+        def dumps(self, obj, **kwargs):
+            with timed("json_serialize"):
+                return super().dumps(obj, **kwargs)
+
+    return TimedJSONProvider(app)
+
+
+def init_app(app):
+    """Times every request, its JSON serialization, and adds the Server-Timing header."""
+    from flask import g, request
+
+    app.json = _timed_json_provider(app)
+
+    @app.before_request
+    def _start_timing():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_token = start_request()
+
+    @app.after_request
+    def _add_server_timing(response):
+        if "metrics_token" not in g:
+            return response
+        total = time.perf_counter() - g.metrics_started_at
+        timings = finish_request(g.pop("metrics_token"))
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(endpoint, total)
+        response.headers["Server-Timing"] = server_timing(timings, total)
+        return response
+
+
+def _samples(kind, name, documentation, samples, label):
+    """Renders a gauge or counter family with one sample per (label value, value) pair."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    lines.extend(f'{name}{{{label}="{_escape(key)}"}} {value}' for key, value in samples)
+    return lines
+
+
+def render_metrics(app):
+    """
+    Returns the /metrics page: stage and request histograms, startup phase
+    timings and cache statistics of the app.
+    """
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+    lines += _samples(
+        "gauge", "occumend_startup_phase_seconds",
+        "Wall time of each startup phase of this worker.",
+        sorted(app.startup_timings.items()), "phase",
+    )
+
+    caches = {}
+    if app.chart_renderer is not None:
+        caches["chart"] = app.chart_renderer.cache_info()
+    if app.embedding_cache is not None:
+        caches["embedding"] = app.embedding_cache.info()
+    if app.recommend_cache is not None:
+        caches["recommend"] = app.recommend_cache.info()
+    if app.chat_sessions is not None:
+        caches["chat_session"] = app.chat_sessions.info()
+    if caches:
+        lines += _samples(
+            "counter", "occumend_cache_hits_total", "Cache lookups that found an entry.",
+            [(name, info["hits"]) for name, info in caches.items()], "cache",
+        )
+        lines += _samples(
+            "counter", "occumend_cache_misses_total", "Cache lookups that found no entry.",
+            [(name, info["misses"]) for name, info in caches.items()], "cache",
+        )
+        lines += _samples(
+            "gauge", "occumend_cache_entries", "Entries currently held by each cache.",
+            [(name, info["size"]) for name, info in caches.items()], "cache",
+        )
+    if app.lexical_index is not None:
+        lines += _samples(
+            "counter", "occumend_lexical_fast_path_total",
+            "Chat questions answered from BM25 alone, without a vector search.",
+            [("bm25", app.lexical_index.fast_path_hits)], "index",
+        )
+    if app.chat_sessions is not None:
+        lines += _samples(
+            "counter", "occumend_chat_session_retrievals_total",
+            "Chat session turns by how their context was retrieved (new, extended, reused).",
+            sorted(app.chat_sessions.retrievals.items()), "outcome",
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+import numpy as np
+
+FEATURES = ["R_score", "I_score", "A_score", "S_score", "E_score", "C_score"]
+RIASEC_KEYS = ["R", "I", "A", "S", "E", "C"]
+
+# Likert averages over 8 questions move in steps of 1/8, so profiles are
+# snapped to that grid before scoring, rendering and caching.
+PROFILE_QUANTUM = 8
+
+
+def profile_from_answers(user_answers):
+    """Averages the Likert answers of each RIASEC category into a profile vector."""
+    return np.array(
+        [np.mean(user_answers.get(key, [0])) for key in RIASEC_KEYS], dtype=np.float64
+    )
+
+
+def quantize_profile(user_profile):
+    """Snaps a profile vector to the 1/PROFILE_QUANTUM grid that survey answers produce."""
+    return np.round(np.asarray(user_profile, dtype=np.float64) * PROFILE_QUANTUM) / PROFILE_QUANTUM
+
+
+class RecommendationEngine:
+    """
+    Read-only top-k search over the occupation RIASEC profiles.
+
+    The job matrix is L2-normalized once at construction so a user profile is
+    scored with a single matrix-vector product. Nothing on the engine is
+    mutated after construction, so one instance can be shared by all request
+    threads of a worker.
+
+    With search_clusters > 0 the occupations are also partitioned with
+    k-means over the normalized profiles (separate from the display
+    clusters), and stored contiguously per cluster. top_k then scores only
+    the search_probes clusters whose centroids are nearest to the user, and
+    falls back to exact search when those clusters hold fewer than k
+    occupations.
+    """
+
+    def __init__(
+        self,
+        job_matrix,
+        titles,
+        cluster_names,
+        soc_codes,
+        knowledge_index,
+        skills_index,
+        abilities_index,
+        search_clusters=0,
+        search_probes=2,
+    ):
+        job_matrix = np.nan_to_num(np.asarray(job_matrix, dtype=np.float32))
+        norms = np.linalg.norm(job_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.job_matrix = job_matrix / norms
+        self.job_matrix.setflags(write=False)
+
+        self.titles = np.asarray(titles, dtype=object)
+        self.cluster_names = np.asarray(cluster_names, dtype=object)
+        self.soc_codes = np.asarray(soc_codes, dtype=object)
+
+        # CompetencyIndex instances with the same row order as job_matrix
+        self.knowledge_index = knowledge_index
+        self.skills_index = skills_index
+        self.abilities_index = abilities_index
+
+        self.search_probes = max(1, int(search_probes))
+        self.centroids = self.cluster_offsets = self.cluster_rows = self.clustered_matrix = None
+        if search_clusters > 0 and len(self.job_matrix):
+            self._build_partition(search_clusters)
+
+    def _build_partition(self, n_clusters):
+        """Clusters the normalized profiles and lays rows out contiguously per cluster."""
+        from sklearn.cluster import KMeans
+
+        n_clusters = min(int(n_clusters), len(self.job_matrix))
+        labels = KMeans(n_clusters=n_clusters, random_state=42, n_init="auto").fit_predict(
+            self.job_matrix
+        )
+        # Unit-length mean of each cluster, so probing ranks clusters by cosine like the rows
+        centroids = np.zeros((n_clusters, self.job_matrix.shape[1]), dtype=np.float32)
+        np.add.at(centroids, labels, self.job_matrix)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        self.cluster_rows = np.argsort(labels, kind="stable")
+        self.cluster_offsets = np.zeros(n_clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_clusters), out=self.cluster_offsets[1:])
+        self.clustered_matrix = np.ascontiguousarray(self.job_matrix[self.cluster_rows])
+        self.centroids = centroids / norms
+        for array in (self.cluster_rows, self.cluster_offsets, self.clustered_matrix, self.centroids):
+            array.setflags(write=False)
+
+    @classmethod
+    def from_frame(
+        cls,
+        df_clustered_jobs,
+        knowledge_index,
+        skills_index,
+        abilities_index,
+        search_clusters=0,
+        search_probes=2,
+    ):
+        """Builds the engine from the DataFrame and indexes returned by load_and_prepare_data."""
+        return cls(
+            job_matrix=df_clustered_jobs[FEATURES].fillna(0).to_numpy(),
+            titles=df_clustered_jobs["Title"].to_numpy(),
+            cluster_names=df_clustered_jobs["cluster_name"].to_numpy(),
+            soc_codes=df_clustered_jobs.index.to_numpy(),
+            knowledge_index=knowledge_index,
+            skills_index=skills_index,
+            abilities_index=abilities_index,
+            search_clusters=search_clusters,
+            search_probes=search_probes,
+        )
+
+    def __len__(self):
+        return len(self.titles)
+
+    def score(self, user_vector):
+        """Returns the cosine similarity of the user profile to every occupation."""
+        user_vector = np.nan_to_num(np.asarray(user_vector, dtype=np.float32))
+        norm = np.linalg.norm(user_vector)
+        if norm == 0:
+            return np.zeros(len(self), dtype=np.float32)
+        return self.job_matrix @ (user_vector / norm)
+
+    def probe(self, user_vector, k=20):
+        """
+        Scores only the search_probes clusters nearest to the user profile.
+
+        Returns:
+            tuple: (rows, scores) of every occupation in the probed clusters,
+            or None when search is exact or those clusters hold fewer than k
+            occupations.
+        """
+        if self.centroids is None:
+            return None
+        user_vector = np.nan_to_num(np.asarray(user_vector, dtype=np.float32))
+        norm = np.linalg.norm(user_vector)
+        if norm == 0:
+            return None
+        user_vector = user_vector / norm
+
+        n_probes = min(self.search_probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ user_vector), n_probes - 1)[:n_probes]
+        starts, stops = self.cluster_offsets[nearest], self.cluster_offsets[nearest + 1]
+        if int((stops - starts).sum()) < k:
+            return None
+        rows = np.concatenate([self.cluster_rows[a:b] for a, b in zip(starts, stops)])
+        scores = np.concatenate([self.clustered_matrix[a:b] @ user_vector for a, b in zip(starts, stops)])
+        return rows, scores
+
+    def top_k(self, user_vector, k=20):
+        """Returns the row indices and similarities of the k best matches, best first."""
+        probed = self.probe(user_vector, k)
+        if probed is not None:
+            rows, scores = probed
+        else:
+            scores = self.score(user_vector)
+            rows = np.arange(len(scores))
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # Sort by descending score, breaking ties on row order for stable output
+        order = np.lexsort((rows[candidates], -scores[candidates]))
+        best = candidates[order]
+        return rows[best], scores[best]
+
+    def top_k_many(self, user_matrix, k=20):
+        """
+        Batched top_k: scores every row of user_matrix in one matrix-matrix product.
+        With a cluster partition each user is probed separately instead, so no
+        (n_users, n_occupations) score matrix is built.
+
+        Returns:
+            tuple: (rows, scores) arrays of shape (n_users, k), best match first.
+        """
+        if self.centroids is not None:
+            results = [self.top_k(user_vector, k) for user_vector in user_matrix]
+            k = min(k, len(self))
+            rows = np.array([user_rows for user_rows, _ in results], dtype=np.intp).reshape(-1, k)
+            scores = np.array([user_scores for _, user_scores in results], dtype=np.float32).reshape(-1, k)
+            return rows, scores
+
+        user_matrix = np.nan_to_num(np.asarray(user_matrix, dtype=np.float32))
+        norms = np.linalg.norm(user_matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (user_matrix / norms) @ self.job_matrix.T
+
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            empty = np.empty((len(user_matrix), 0))
+            return empty.astype(np.intp), empty.astype(np.float32)
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.lexsort((candidates, -candidate_scores), axis=1)
+        rows = np.take_along_axis(candidates, order, axis=1)
+        return rows, np.take_along_axis(candidate_scores, order, axis=1)
+
+    def recommend_many(self, user_matrix, k=20, competency_top_n=5):
+        """Returns one top-k recommendation list per row of user_matrix."""
+        rows, scores = self.top_k_many(user_matrix, k)
+        return [
+            [
+                self._recommendation(row, score, competency_top_n)
+                for row, score in zip(user_rows, user_scores)
+            ]
+            for user_rows, user_scores in zip(rows, scores)
+        ]
+
+    def recommend(self, user_vector, k=20, competency_top_n=5):
+        """
+        Returns the top-k recommendations in the /recommend payload format.
+
+        competency_top_n is the number of knowledge, skill and ability names
+        listed per occupation.
+        """
+        rows, scores = self.top_k(user_vector, k)
+        return [
+            self._recommendation(row, score, competency_top_n)
+            for row, score in zip(rows, scores)
+        ]
+
+    def _recommendation(self, row, score, competency_top_n):
+        return {
+            "Title": self.titles[row],
+            "soc_code": self.soc_codes[row],
+            "cluster_name": self.cluster_names[row],
+            "similarity": float(score),
+            "knowledge": self.knowledge_index.top(row, competency_top_n),
+            "skills": self.skills_index.top(row, competency_top_n),
+            "abilities": self.abilities_index.top(row, competency_top_n),
+        }
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+import time
+
+# Files that databases rewrite while merely being read; they must not trigger a reload
+_VOLATILE_SUFFIXES = ("-wal", "-shm", "-journal", ".lock")
+
+
+class DataGeneration:
+    """
+    One consistent set of the data-dependent handles of the app.
+
+    A generation is never mutated once installed: a reload builds a new one
+    and swaps it in with a single assignment to app.generation. A request
+    that reads app.generation once keeps a consistent view even when a
+    reload lands while it runs.
+    """
+
+    FIELDS = (
+        "df_clustered_jobs",
+        "knowledge_index",
+        "skills_index",
+        "abilities_index",
+        "recommender",
+        "data_version",
+        "chroma_client",
+        "onet_collection",
+        "retriever",
+        "lexical_index",
+    )
+    __slots__ = FIELDS + ("number", "loaded_at")
+
+    def __init__(self, number=0, **handles):
+        unknown = set(handles) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown generation fields: {', '.join(sorted(unknown))}.")
+        self.number = number
+        self.loaded_at = time.time()
+        for field in self.FIELDS:
+            setattr(self, field, handles.get(field))
+
+    def replace(self, number=None, **handles):
+        """
+        Returns a copy of this generation with some handles replaced. The copy
+        keeps the number and load time unless a new number is given.
+        """
+        current = {field: getattr(self, field) for field in self.FIELDS}
+        generation = DataGeneration(self.number if number is None else number, **{**current, **handles})
+        if number is None:
+            generation.loaded_at = self.loaded_at
+        return generation
+
+
+def input_fingerprint(paths):
+    """
+    Hashes the names, sizes and modification times of every file under paths.
+
+    Only stat() is called, so polling is cheap; files that databases touch on
+    reads (SQLite WAL and lock files) are ignored.
+    """
+    entries = []
+    for root in dict.fromkeys(str(path) for path in paths):
+        if os.path.isfile(root):
+            stat = os.stat(root)
+            entries.append((root, stat.st_size, stat.st_mtime_ns))
+            continue
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                if file_name.endswith(_VOLATILE_SUFFIXES):
+                    continue
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha256(repr(sorted(entries)).encode()).hexdigest()
+
+
+class Reloader:
+    """
+    Rebuilds the app's DataGeneration in the background and swaps it in.
+
+    build(timings) must return the handles of the new generation as a dict;
+    it runs on a background thread while the old generation keeps serving,
+    so no request waits for it. Only one reload runs at a time. A failed
+    reload leaves the old generation in place and is reported by status().
+
+    The watch polls a fingerprint of watch_paths and reloads once a change
+    has been stable for one full interval, so files still being written are
+    not picked up half-way.
+    """
+
+    def __init__(self, app, build, watch_paths=(), poll_interval=0):
+        self.app = app
+        self.build = build
+        self.watch_paths = tuple(watch_paths)
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.last_error = None
+        self.last_timings = {}
+        self._lock = threading.Lock()
+        self._running = None
+        self._watch_pid = None
+        # Taken now, so changes between startup and the first request are not missed
+        self._fingerprint = input_fingerprint(self.watch_paths) if poll_interval > 0 else None
+
+    def reload(self, reason="manual"):
+        """
+        Starts a reload unless one is already running.
+
+        Returns:
+            threading.Thread: The reload thread (the running one if a reload
+            was already in progress), which callers may join().
+        """
+        with self._lock:
+            if self._running is not None and self._running.is_alive():
+                return self._running
+            self._running = threading.Thread(
+                target=self._reload, args=(reason,), name="data-reload", daemon=True
+            )
+            self._running.start()
+            return self._running
+
+    def _reload(self, reason):
+        started_at = time.perf_counter()
+        timings = {}
+        try:
+            handles = self.build(timings)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"ERROR: Data reload ({reason}) failed, keeping generation {self.app.generation.number}. ERROR: {e}")
+            return
+
+        # Handles the build did not return (e.g. chat indexes on a recommend-only worker) carry over
+        generation = self.app.generation.replace(self.app.generation.number + 1, **handles)
+        self.app.generation = generation
+        self.reloads += 1
+        self.last_error = None
+        self.last_timings = timings
+        print(
+            f"Data reload ({reason}): generation {generation.number} installed in "
+            f"{time.perf_counter() - started_at:.2f}s."
+        )
+
+    def status(self):
+        generation = self.app.generation
+        return {
+            "generation": generation.number,
+            "loaded_at": generation.loaded_at,
+            "data_version": generation.data_version,
+            "reloading": self._running is not None and self._running.is_alive(),
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "last_timings": self.last_timings,
+        }
+
+    def ensure_watching(self):
+        """Starts the watch thread in this process if it is enabled and not running yet."""
+        # A thread started before a fork (gunicorn --preload) does not exist in the worker
+        if self.poll_interval <= 0 or self._watch_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+            threading.Thread(target=self._watch, name="data-watch", daemon=True).start()
+
+    def _watch(self):
+        current, pending = self._fingerprint, None
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                fingerprint = input_fingerprint(self.watch_paths)
+            except OSError as e:
+                print(f"Warning: Data watch could not read the input files. ERROR: {e}")
+                continue
+            if fingerprint == current:
+                pending = None
+            elif fingerprint != pending:
+                pending = fingerprint  # changed; wait one interval for it to settle
+            else:
+                current, pending = fingerprint, None
+                self.reload("files changed").join()
@@ -1,9 +1,21 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
-import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from .visualizations import create_radar_chart_image, create_bar_chart_image
-from .services import get_ai_response
+import hashlib
+import hmac
+import json
+import time
+from flask import Blueprint, Response, render_template, request, jsonify, current_app, stream_with_context
+from . import metrics
+from .services import (
+    build_messages,
+    complete_chat,
+    get_ai_response,
+    parse_soc_codes,
+    retrieve_context,
+    stream_ai_response,
+)
+from .sessions import parse_session_id, session_turn_context
+from .recommender import RIASEC_KEYS, profile_from_answers
+from .data_processing import iter_batch_recommendations
+from .visualizations import CHART_FORMATS, create_chart_spec
 
 bp = Blueprint('main', __name__)
 
@@ -11,50 +23,284 @@ bp = Blueprint('main', __name__)
 def index():
     return render_template("index.html")
 
-@bp.route("/recommend", methods=["POST"])
+def _role_error(subsystem):
+    """Returns a 503 response when this worker's APP_ROLE does not serve the subsystem."""
+    if subsystem in current_app.subsystems:
+        return None
+    return jsonify({
+        "error": f"This server runs as '{current_app.config['APP_ROLE']}' and does not serve {subsystem} requests."
+    }), 503
+
+
+@bp.route("/recommend", methods=["GET", "POST"])
 def recommend():
-    df_clustered_jobs = current_app.df_clustered_jobs
-    if df_clustered_jobs is None:
+    """
+    Returns the top 20 occupations and the charts for one set of survey answers.
+
+    Answers are POSTed as JSON ({"R": [1-5, ...], "I": [...], ...}) or sent in
+    the query string of a GET (R=4,5,3&I=2,3,...). Responses are cached per
+    profile, options and data version, and carry a strong ETag; a GET whose
+    If-None-Match matches is answered with 304 Not Modified.
+    """
+    role_error = _role_error("recommend")
+    if role_error:
+        return role_error
+    # One generation for the whole request, even if a reload is installed meanwhile
+    generation = current_app.generation
+    recommender = generation.recommender
+    if recommender is None:
         return jsonify({"error": "Server could not load data. Please check the logs."}), 500
 
-    user_answers = request.json
-    user_profile = {
-        "R_score": np.mean(user_answers.get("R", [0])), "I_score": np.mean(user_answers.get("I", [0])),
-        "A_score": np.mean(user_answers.get("A", [0])), "S_score": np.mean(user_answers.get("S", [0])),
-        "E_score": np.mean(user_answers.get("E", [0])), "C_score": np.mean(user_answers.get("C", [0])),
+    if request.method == "POST":
+        user_answers = request.get_json(silent=True)
+        error = _answers_error(user_answers)
+    else:
+        user_answers, error = _answers_from_args(request.args)
+    if error:
+        return error
+    chart_format = request.args.get("chart_format") or user_answers.get("chart_format", "png")
+    if chart_format not in CHART_FORMATS:
+        return jsonify({"error": f"'chart_format' must be one of: {', '.join(CHART_FORMATS)}."}), 400
+
+    competency_top_n, error = _competency_top_n(
+        request.args.get("competency_top_n") or user_answers.get("competency_top_n")
+    )
+    if error:
+        return error
+
+    # Scored exactly like /recommend/batch; survey answers repeat, so exact profiles still hit the cache
+    user_profile = profile_from_answers(user_answers)
+    cache_key = (generation.data_version, tuple(user_profile.tolist()), competency_top_n, chart_format)
+    cached = current_app.recommend_cache.get(cache_key)
+    cache_status = "hit"
+    if cached is None:
+        cache_status = "miss"
+        payload = _recommend_payload(recommender, user_profile, competency_top_n, chart_format)
+        body = (current_app.json.dumps(payload) + "\n").encode()
+        cached = (body, hashlib.sha256(body).hexdigest()[:32])
+        current_app.recommend_cache.set(cache_key, cached)
+    body, etag = cached
+
+    if request.method in ("GET", "HEAD") and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Browsers keep the response but revalidate it, which is where the 304s come from
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+def _recommend_payload(recommender, user_profile, competency_top_n, chart_format):
+    with metrics.timed("scoring"):
+        recommendations = recommender.recommend(user_profile, k=20, competency_top_n=competency_top_n)
+
+    # The spec format is plain numbers for the browser to draw, so Matplotlib is skipped
+    if chart_format == "spec":
+        with metrics.timed("chart_spec"):
+            chart_spec = create_chart_spec(user_profile.tolist(), recommendations)
+        return {
+            "recommendations": recommendations,
+            "chart_spec": chart_spec,
+        }
+
+    with metrics.timed("chart_render"):
+        chart_images = current_app.chart_renderer.render(
+            user_profile.tolist(), recommendations, chart_format
+        )
+
+    return {
+        "recommendations": recommendations,
+        "chart_images": chart_images,
     }
 
-    features = ["R_score", "I_score", "A_score", "S_score", "E_score", "C_score"]
-    job_scores = df_clustered_jobs[features].fillna(0)
-    user_vector = pd.DataFrame([user_profile])[features].values
-    
-    similarity_scores = cosine_similarity(user_vector, job_scores.values)
-    df_clustered_jobs["similarity"] = similarity_scores[0]
 
-    top_jobs = df_clustered_jobs.sort_values(by="similarity", ascending=False).head(20)
+def _answers_error(answers):
+    """Validates a POSTed answer set like the GET query string is validated; returns an error response or None."""
+    if not isinstance(answers, dict):
+        return jsonify({"error": "Request body must be a JSON object of answers."}), 400
+    for key in RIASEC_KEYS:
+        values = answers.get(key)
+        if values is None:
+            continue
+        if (
+            not isinstance(values, list)
+            or not values
+            or not all(isinstance(value, int) and not isinstance(value, bool) for value in values)
+        ):
+            return jsonify({"error": f"'{key}' must be a non-empty list of integers."}), 400
+    return None
+
+
+def _answers_from_args(args):
+    """Reads GET answers (R=4,5,3&I=2,...) into the POST body format; returns (answers, error_response)."""
+    answers = {}
+    for key in RIASEC_KEYS:
+        values = args.get(key)
+        if not values:
+            continue
+        try:
+            answers[key] = [int(value) for value in values.split(",")]
+        except ValueError:
+            return None, (jsonify({"error": f"'{key}' must be a comma-separated list of integers."}), 400)
+    return answers, None
+
+
+@bp.route("/recommend/batch", methods=["POST"])
+def recommend_batch():
+    """
+    Scores many answer sets at once and streams the results back as NDJSON.
+
+    Accepts either a JSON body {"profiles": [...], "top_k": 20, "include_charts": false,
+    "chart_format": "png", "competency_top_n": 5}
+    or an NDJSON body with one answer set per line (options then go in the query
+    string). NDJSON input is read line by line, so very large batches are never
+    held in memory as a whole.
+    """
+    role_error = _role_error("recommend")
+    if role_error:
+        return role_error
+    recommender = current_app.recommender
+    if recommender is None:
+        return jsonify({"error": "Server could not load data. Please check the logs."}), 500
+
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        options = request.args
+        answer_sets = _iter_ndjson(request.stream)
+    else:
+        options = request.get_json(silent=True)
+        if not isinstance(options, dict) or not isinstance(options.get("profiles"), list):
+            return jsonify({"error": "A 'profiles' list of answer sets is required."}), 400
+        answer_sets = options["profiles"]
+
+    try:
+        top_k = int(options.get("top_k", 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'top_k' must be an integer."}), 400
+    if top_k < 1:
+        return jsonify({"error": "'top_k' must be at least 1."}), 400
+    competency_top_n, error = _competency_top_n(options.get("competency_top_n"))
+    if error:
+        return error
+    include_charts = str(options.get("include_charts", "false")).lower() in ("1", "true", "yes")
+    chart_format = options.get("chart_format", "png")
+    if chart_format not in CHART_FORMATS:
+        return jsonify({"error": f"'chart_format' must be one of: {', '.join(CHART_FORMATS)}."}), 400
+
+    results = iter_batch_recommendations(
+        recommender,
+        answer_sets,
+        top_k=top_k,
+        chunk_size=current_app.config["BATCH_CHUNK_SIZE"],
+        competency_top_n=competency_top_n,
+    )
+
+    chart_renderer = current_app.chart_renderer
 
-    recommendations = []
-    for index, row in top_jobs.iterrows():
-        recommendations.append({
-            "Title": row["Title"], "cluster_name": row["cluster_name"], "similarity": row["similarity"],
-            "knowledge": current_app.knowledge_map.get(index, []),
-            "skills": current_app.skills_map.get(index, []),
-            "abilities": current_app.abilities_map.get(index, []),
-        })
+    def generate():
+        for result in results:
+            if include_charts and "recommendations" in result:
+                if chart_format == "spec":
+                    result["chart_spec"] = create_chart_spec(
+                        result["profile"], result["recommendations"]
+                    )
+                else:
+                    result["chart_images"] = chart_renderer.render(
+                        result["profile"], result["recommendations"], chart_format
+                    )
+            yield json.dumps(result, ensure_ascii=False) + "\n"
 
-    radar_chart_img = create_radar_chart_image(list(user_profile.values()))
-    bar_chart_img = create_bar_chart_image(recommendations)
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
+
+def _competency_top_n(value):
+    """Parses the optional competency_top_n option; returns (value, error_response)."""
+    if value is None or value == "":
+        return current_app.config["COMPETENCY_TOP_N"], None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "'competency_top_n' must be an integer."}), 400)
+    if value < 0:
+        return None, (jsonify({"error": "'competency_top_n' must not be negative."}), 400)
+    return value, None
+
+
+def _iter_ndjson(stream):
+    """Yields one parsed answer set per non-empty line of an NDJSON stream."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+
+
+@bp.route("/stats")
+def stats():
+    chart_renderer = current_app.chart_renderer
+    embedding_cache = current_app.embedding_cache
+    lexical_index = current_app.lexical_index
+    recommend_cache = current_app.recommend_cache
+    chat_sessions = current_app.chat_sessions
     return jsonify({
-        "recommendations": recommendations,
-        "chart_images": {"radar": radar_chart_img, "bar": bar_chart_img},
+        "role": current_app.config["APP_ROLE"],
+        "startup_timings": current_app.startup_timings,
+        "chart_cache": chart_renderer.cache_info() if chart_renderer is not None else None,
+        "embedding_cache": embedding_cache.info() if embedding_cache is not None else None,
+        "recommend_cache": recommend_cache.info() if recommend_cache is not None else None,
+        "lexical_index": lexical_index.info() if lexical_index is not None else None,
+        "chat_sessions": chat_sessions.info() if chat_sessions is not None else None,
+        "data": current_app.reloader.status(),
     })
 
+
+@bp.route("/admin/reload", methods=["GET", "POST"])
+def admin_reload():
+    """
+    POST reloads the job data and indexes of this worker in the background
+    and swaps them in once built; GET reports the current data generation.
+
+    Requires "Authorization: Bearer <ADMIN_TOKEN>", and answers 404 while
+    ADMIN_TOKEN is unset. A POST with ?wait=1 returns once the reload is done.
+    Only the worker that receives the request reloads; RELOAD_POLL_SECONDS
+    reloads every worker when the files change.
+    """
+    token = current_app.config["ADMIN_TOKEN"]
+    if not token:
+        return jsonify({"error": "Not found."}), 404
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return jsonify({"error": "A valid admin token is required."}), 401
+
+    reloader = current_app.reloader
+    if request.method == "GET":
+        return jsonify(reloader.status())
+
+    reload_thread = reloader.reload("admin endpoint")
+    wait = str(request.args.get("wait", "")).lower() in ("1", "true", "yes")
+    if wait:
+        reload_thread.join()
+    return jsonify(reloader.status()), 200 if wait else 202
+
+
+@bp.route("/metrics")
+def metrics_page():
+    """Stage and request latency histograms, startup timings and cache statistics for Prometheus."""
+    return Response(metrics.render_metrics(current_app), content_type=metrics.CONTENT_TYPE)
+
+
 @bp.route("/chat", methods=["POST"])
 def chat():
+    role_error = _role_error("chat")
+    if role_error:
+        return role_error
     if not current_app.llm_client:
         return jsonify({"error": "LLM client is not configured on the server."}), 500
-    if not current_app.onet_collection:
+    generation = current_app.generation
+    if generation.retriever is None:
         return jsonify({"error": "ONET collection is not configured on the server."}), 500
 
     data = request.json
@@ -63,19 +309,88 @@ def chat():
 
     if not user_question or not profile_summary:
         return jsonify({"error": "Question and profile summary are required."}), 400
+    try:
+        soc_codes = parse_soc_codes(data.get("soc_codes"))
+        session_id = parse_session_id(data.get("session_id"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    session = None
+    if session_id and current_app.chat_sessions is not None:
+        session = current_app.chat_sessions.session(session_id, soc_codes, generation.number)
+
+    stream = request.args.get("stream") or data.get("stream")
+    if str(stream).lower() in ("1", "true", "yes"):
+        return _chat_stream(generation, user_question, profile_summary, soc_codes, session)
 
     try:
+        if session is not None:
+            retrieved_docs, _, conversation_summary = session_turn_context(
+                current_app, generation, session, user_question
+            )
+            answer = complete_chat(
+                current_app.llm_client,
+                build_messages(user_question, profile_summary, retrieved_docs, conversation_summary),
+                current_app.config["LLM_CHAT_MODEL"],
+            )
+            session.add_turn(user_question, answer)
+            return jsonify({"answer": answer})
+
         answer = get_ai_response(
             llm_client=current_app.llm_client,
-            onet_collection=current_app.onet_collection,
+            retriever=generation.retriever,
             user_question=user_question,
             profile_summary=profile_summary,
             model=current_app.config['LLM_CHAT_MODEL'],
             embedding_model=current_app.embedding_model,
+            embedding_cache=current_app.embedding_cache,
+            embedding_model_name=current_app.config["EMBEDDING_MODEL_NAME"],
+            lexical_index=generation.lexical_index,
+            soc_codes=soc_codes,
+            n_results=current_app.config["CONTEXT_MAX_CHUNKS"],
+            context_token_budget=current_app.config["CONTEXT_TOKEN_BUDGET"],
         )
         return jsonify({"answer": answer})
     except ValueError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         current_app.logger.error(f"Unexpected error occurred in /chat: {e}")
-        return jsonify({"error": "An unexpected server error occurred."}), 500
\ No newline at end of file
+        return jsonify({"error": "An unexpected server error occurred."}), 500
+
+
+def _chat_stream(generation, user_question, profile_summary, soc_codes=None, session=None):
+    """Runs retrieval up front, then streams the LLM answer as Server-Sent Events."""
+    started_at = time.perf_counter()
+    conversation_summary = None
+    try:
+        if session is not None:
+            retrieved_docs, sources, conversation_summary = session_turn_context(
+                current_app, generation, session, user_question
+            )
+        else:
+            retrieved_docs, sources = retrieve_context(
+                generation.retriever,
+                user_question,
+                current_app.embedding_model,
+                current_app.embedding_cache,
+                current_app.config["EMBEDDING_MODEL_NAME"],
+                n_results=current_app.config["CONTEXT_MAX_CHUNKS"],
+                lexical_index=generation.lexical_index,
+                soc_codes=soc_codes,
+                token_budget=current_app.config["CONTEXT_TOKEN_BUDGET"],
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 500
+
+    events = stream_ai_response(
+        current_app.llm_client,
+        build_messages(user_question, profile_summary, retrieved_docs, conversation_summary),
+        current_app.config["LLM_CHAT_MODEL"],
+        sources=sources,
+        started_at=started_at,
+        on_answer=(lambda answer: session.add_turn(user_question, answer)) if session is not None else None,
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,88 +1,641 @@
-def get_ai_response(
-    llm_client, onet_collection, user_question, profile_summary, model, embedding_model
-):
+import functools
+import json
+import os
+import re
+import time
+import unicodedata
+from . import metrics
+from .context import pack_context
+from .lexical import (
+    is_decisive,
+    reciprocal_rank_fusion,
+    restrict_rows,
+    rows_by_soc_code,
+)
+
+SYSTEM_PROMPT = (
+    "You are 'OccumendAI', an expert and empathetic career strategist. "
+    "Your primary goal is to help the user understand their RIASEC profile and explore potential career paths in a thoughtful and empowering way. "
+    "You are not a simple Q&A bot; you are a guide."
+    "\n\n"
+    "### Core Directives:\n"
+    "1.  **Persona & Tone**: Be professional, encouraging, and insightful. Use a positive tone that builds the user's confidence. Address the user directly and respectfully."
+    "2.  **Grounding is Critical**: Base ALL your answers strictly on the user's profile summary and the O*NET job documents provided in the context. Explicitly reference the user's RIASEC scores (e.g., 'Your high score in Enterprising suggests...') and the provided job data. DO NOT invent information or provide details about jobs not included in the context."
+    "3.  **Synthesize, Don't Just List**: Do not just repeat the information given to you. Your value lies in connecting the dots. Explain *why* a certain job fits (or doesn't fit) the user's profile by linking specific job tasks or work environments to their RIASEC interests."
+    "4.  **Structure and Formatting**: Structure your answers for maximum clarity. Use simple HTML tags: `<h3>` for main sections, `<strong>` for emphasis, and `<ul>` with `<li>` for lists. Keep paragraphs concise."
+    "5.  **Maintain Dialogue**: Always end your response with a thoughtful, open-ended question to encourage further exploration and keep the conversation going. For example, 'Which of these aspects sounds most appealing to you?' or 'Would you like to dive deeper into the daily tasks of a Landscape Architect?'"
+    "\n\n"
+    "### Boundaries:\n"
+    "- You are NOT a life coach or a therapist. Avoid giving psychological advice."
+    "- You do NOT guarantee job placement or salary outcomes."
+    "- You do NOT provide information outside of the career context (e.g., financial advice, personal opinions)."
+)
+
+
+def _collection_pointer_path(db_path, base_name):
+    return os.path.join(str(db_path), f"{base_name}.pointer.json")
+
+
+def read_collection_pointer(db_path, base_name):
     """
-    Retrieves relevant documents from the database based on the user's question,
-    creates a prompt, and asks the LLM to generate an answer.
+    Returns the pointer record of the published version of a collection.
+
+    Every re-vectorization writes a new collection named "<base_name>__v<n>"
+    and publishes it by rewriting a small JSON pointer file next to the
+    database. A database written before collections were versioned has no
+    pointer, and base_name itself is the live collection.
+
+    Returns:
+        dict: "name" of the live collection, its "version" and the names of
+        the "previous" versions still kept for workers that have not reloaded.
+    """
+    try:
+        with open(_collection_pointer_path(db_path, base_name), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"name": base_name, "version": 0, "previous": []}
+
+
+def open_collection(client, db_path, base_name):
+    """Opens the published version of collection base_name."""
+    return client.get_collection(read_collection_pointer(db_path, base_name)["name"])
+
+
+def publish_collection(client, db_path, base_name, name, keep_previous=1):
+    """
+    Makes collection name the published version of base_name.
+
+    The pointer file is replaced with a single rename, so readers see either
+    the old or the new version. The replaced version and up to keep_previous
+    - 1 older ones are kept, since running workers may still query them until
+    they reload; older versions are deleted.
+
+    Returns:
+        dict: The new pointer record.
+    """
+    pointer = read_collection_pointer(db_path, base_name)
+    existing = {collection.name for collection in client.list_collections()}
+    previous = [old for old in [pointer["name"], *pointer["previous"]] if old in existing and old != name]
+    new_pointer = {
+        "name": name,
+        "version": pointer["version"] + 1,
+        "previous": previous[:keep_previous],
+        "published_at": time.time(),
+    }
+    path = _collection_pointer_path(db_path, base_name)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(new_pointer, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+    for old in previous[keep_previous:]:
+        client.delete_collection(old)
+    return new_pointer
+
+
+class ChromaRetriever:
+    """
+    Retriever backed by the persistent ChromaDB collection (HNSW index).
+
+    reopen, if given, returns the currently published collection; it is
+    called when a query fails, so a worker whose collection was retired by
+    a re-vectorization follows the pointer instead of failing every query.
+    """
+
+    name = "chroma"
+
+    def __init__(self, collection, reopen=None):
+        self.collection = collection
+        self.reopen = reopen
+
+    def query(self, query_vector, n_results=5, soc_codes=None):
+        """
+        Returns the n_results chunks nearest to query_vector, best first.
+
+        With soc_codes the search is restricted to chunks of those occupations.
+
+        Returns:
+            list: Dicts with "doc_id", "title", "document" and "score" keys.
+        """
+        query = dict(
+            query_embeddings=[query_vector],
+            n_results=n_results,
+            where={"soc_code": {"$in": list(soc_codes)}} if soc_codes else None,
+            include=["documents", "metadatas", "distances"],
+        )
+        try:
+            results = self.collection.query(**query)
+        except Exception:
+            if self.reopen is None:
+                raise
+            collection = self.reopen()
+            if collection.name == self.collection.name:
+                raise
+            print(f"Collection '{self.collection.name}' was retired, switching to '{collection.name}'.")
+            self.collection = collection
+            results = self.collection.query(**query)
+        ids = results.get("ids", [[]])[0]
+        docs = results.get("documents", [[]])[0]
+        metas = results.get("metadatas", [[]])[0]
+        distances = (results.get("distances") or [[None] * len(docs)])[0]
+        return [
+            {
+                "doc_id": doc_id,
+                "title": (meta or {}).get("title", "Untitled"),
+                "document": doc,
+                "score": -distance if distance is not None else None,
+            }
+            for doc_id, doc, meta, distance in zip(ids, docs, metas, distances)
+        ]
+
+
+class NumpyRetriever:
+    """
+    In-process exact retriever over a memory-mapped float32 embedding matrix.
+
+    The index directory holds embeddings.npy (one L2-normalized row per chunk)
+    and chunks.parquet (doc_id, title, content in the same row order). A query
+    is a single matrix-vector product followed by an argpartition top-k.
+    """
+
+    name = "numpy"
+    EMBEDDINGS_FILE = "embeddings.npy"
+    CHUNKS_FILE = "chunks.parquet"
+
+    def __init__(self, index_path):
+        import numpy as np
+        import pandas as pd
+
+        self.embeddings = np.load(index_path / self.EMBEDDINGS_FILE, mmap_mode="r")
+        chunks = pd.read_parquet(index_path / self.CHUNKS_FILE)
+        if len(chunks) != len(self.embeddings):
+            raise ValueError(
+                f"Vector index at '{index_path}' is inconsistent: "
+                f"{len(self.embeddings)} embeddings for {len(chunks)} chunks."
+            )
+        self.doc_ids = chunks["doc_id"].to_numpy(dtype=object)
+        self.titles = chunks["title"].to_numpy(dtype=object)
+        self.documents = chunks["content"].to_numpy(dtype=object)
+        self.rows_by_soc_code = rows_by_soc_code(self.doc_ids)
+
+    @classmethod
+    def build(cls, index_path, doc_ids, titles, documents, embeddings):
+        """Writes an index directory that NumpyRetriever can load."""
+        import numpy as np
+        import pandas as pd
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        index_path.mkdir(parents=True, exist_ok=True)
+        np.save(index_path / cls.EMBEDDINGS_FILE, embeddings / norms, allow_pickle=False)
+        pd.DataFrame(
+            {"doc_id": list(doc_ids), "title": list(titles), "content": list(documents)}
+        ).to_parquet(index_path / cls.CHUNKS_FILE, index=False)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def query(self, query_vector, n_results=5, soc_codes=None):
+        """Same contract as ChromaRetriever.query; scores are cosine similarities."""
+        import numpy as np
+
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        query_vector = query_vector / norm if norm else query_vector
+        if soc_codes:
+            # Only the rows of the requested occupations are scored
+            candidates = restrict_rows(self.rows_by_soc_code, soc_codes)
+            scores = self.embeddings[candidates] @ query_vector
+        else:
+            candidates = None
+            scores = self.embeddings @ query_vector
+
+        k = min(n_results, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        scores = scores[best]
+        rows = candidates[best] if candidates is not None else best
+        return [
+            {
+                "doc_id": self.doc_ids[row],
+                "title": self.titles[row],
+                "document": self.documents[row],
+                "score": float(score),
+            }
+            for row, score in zip(rows, scores)
+        ]
+
+
+def parse_soc_codes(value, max_codes=50):
+    """
+    Validates the optional list of recommended SOC codes sent with a chat question.
+
+    Raises:
+        ValueError: If value is not a list of at most max_codes strings.
+
+    Returns:
+        list: The codes, or None when no (or an empty) list was sent.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(code, str) for code in value):
+        raise ValueError("'soc_codes' must be a list of strings.")
+    if len(value) > max_codes:
+        raise ValueError(f"'soc_codes' may contain at most {max_codes} codes.")
+    return value or None
+
+
+def normalize_question(user_question):
+    """Normalizes a question so trivially different phrasings share one cache entry."""
+    text = unicodedata.normalize("NFKC", user_question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.") or text
+
+
+def encode_query(embedding_model, user_question, embedding_cache=None, model_name=""):
+    """
+    Embeds the normalized question, reusing a cached vector when one exists.
 
     Args:
-        llm_client: Initialized OpenAI client.
-        onet_collection: Initialized ChromaDB Collection.
-        user_question (str): The user's question.
-        profile_summary (str): The user's RIASEC profile summary.
-        model (str): Name of the LLM model to use.
         embedding_model: SentenceTransformer model for embedding.
+        user_question (str): The user's question.
+        embedding_cache (LRUCache, optional): Cache shared across requests.
+        model_name (str): Embedding model name, part of the cache key so vectors
+            from different models never mix.
+
+    Returns:
+        list: The query embedding.
+    """
+    text = normalize_question(user_question)
+    key = (model_name, text)
+    if embedding_cache is not None:
+        vector = embedding_cache.get(key)
+        if vector is not None:
+            return vector.tolist()
+
+    with metrics.timed("embedding"):
+        vector = embedding_model.encode([text])[0]
+    if embedding_cache is not None:
+        vector.setflags(write=False)
+        embedding_cache.set(key, vector)
+    return vector.tolist()
+
+
+def retrieve_context(
+    retriever,
+    user_question,
+    embedding_model,
+    embedding_cache=None,
+    embedding_model_name="",
+    n_results=5,
+    lexical_index=None,
+    soc_codes=None,
+    token_budget=None,
+    decisive_ratio=1.5,
+    rrf_k=60,
+):
+    """
+    Retrieves the O*NET chunks most relevant to the question and packs them
+    into prompt context (see context.pack_context) of at most token_budget tokens.
+
+    With a lexical_index the question is first run through BM25. If that
+    result is decisive (see lexical.is_decisive) it is used as is and the
+    question is never embedded; otherwise the BM25 and vector rankings are
+    merged with reciprocal rank fusion.
+
+    With soc_codes (the user's recommended occupations) the search is limited
+    to chunks of those occupations; if that yields fewer than n_results
+    chunks, the rest is filled from a search over the whole knowledge base.
 
     Raises:
-        ValueError: If an error occurs during service calls.
+        ValueError: If the vector search fails.
 
     Returns:
-        str: The answer generated by the AI model.
+        tuple: (retrieved_docs, sources) where retrieved_docs is the context text
+        for the prompt and sources lists the titles of the retrieved chunks.
     """
-    # Retrieve relevant documents from the vector database
-    try:
-        query_vector = embedding_model.encode([user_question]).tolist()[0]
-        results = onet_collection.query(
-            query_embeddings=[query_vector],
-            n_results=5,
-            include=["documents", "metadatas"],
+    hits = _retrieve_hits(
+        retriever,
+        user_question,
+        embedding_model,
+        embedding_cache,
+        embedding_model_name,
+        n_results,
+        lexical_index,
+        soc_codes,
+        decisive_ratio,
+        rrf_k,
+    )
+    return _pack(hits, token_budget)
+
+
+def retrieve_session_context(
+    session,
+    retriever,
+    user_question,
+    embedding_model,
+    embedding_cache=None,
+    embedding_model_name="",
+    n_results=5,
+    lexical_index=None,
+    token_budget=None,
+    reuse_similarity=0.85,
+    max_chunks=16,
+    decisive_ratio=1.5,
+    rrf_k=60,
+):
+    """
+    retrieve_context for a follow-up question in a chat session.
+
+    When the question embeds within reuse_similarity (cosine) of an earlier
+    question of the session, the session's chunks are packed again and no
+    search runs; the context is then identical to the previous turn's, so
+    the prompt prefix stays cacheable upstream. Otherwise the question is
+    searched as in retrieve_context (limited to the session's occupations)
+    and the new hits are merged in front of the session's chunks, keeping
+    at most max_chunks. The caller must hold session.lock.
+
+    Raises:
+        ValueError: If the vector search fails.
+
+    Returns:
+        tuple: (retrieved_docs, sources, outcome) with outcome "new",
+        "extended" or "reused".
+    """
+    query_vector = encode_query(
+        embedding_model, user_question, embedding_cache, embedding_model_name
+    )
+    if session.hits and session.best_similarity(query_vector) >= reuse_similarity:
+        outcome = "reused"
+    else:
+        outcome = "extended" if session.hits else "new"
+        hits = _retrieve_hits(
+            retriever,
+            user_question,
+            embedding_model,
+            embedding_cache,
+            embedding_model_name,
+            n_results,
+            lexical_index,
+            list(session.soc_codes) or None,
+            decisive_ratio,
+            rrf_k,
+            query_vector=query_vector,
         )
+        new_chunks = session.extend(hits, query_vector, max_chunks)
+        print(f"Chat session: {outcome} retrieval, {new_chunks} new chunks, {len(session.hits)} in the session")
+    retrieved_docs, sources = _pack(session.hits, token_budget)
+    return retrieved_docs, sources, outcome
 
-        docs = results.get("documents", [[]])[0]
-        metas = results.get("metadatas", [[]])[0]
-        retrieved_chunks = []
-        for doc, meta in zip(docs, metas):
-            title = meta.get("title", "Untitled")
-            retrieved_chunks.append(f"{title}: {doc}")
 
-        retrieved_docs = "\n\n---\n\n".join(retrieved_chunks)
+def _retrieve_hits(
+    retriever,
+    user_question,
+    embedding_model,
+    embedding_cache,
+    embedding_model_name,
+    n_results,
+    lexical_index,
+    soc_codes,
+    decisive_ratio,
+    rrf_k,
+    query_vector=None,
+):
+    """The ranked hits of retrieve_context, before packing."""
+    try:
+        search = functools.partial(
+            _search,
+            retriever,
+            user_question,
+            embedding_model,
+            embedding_cache,
+            embedding_model_name,
+            n_results,
+            lexical_index,
+            decisive_ratio,
+            rrf_k,
+            query_vector=query_vector,
+        )
+        hits = search(soc_codes=soc_codes)
+        if soc_codes and len(hits) < n_results:
+            seen = {hit["doc_id"] for hit in hits}
+            hits += [hit for hit in search() if hit["doc_id"] not in seen]
+        return hits[:n_results]
     except Exception as e:
-        print(f"ChromaDB search error: {e}")
+        print(f"Vector search error ({retriever.name}): {e}")
         raise ValueError(
             "Could not retrieve relevant documents from the knowledge base."
         )
 
-    # Create system and user prompts for the LLM
-    system_prompt = (
-        "You are 'OccumendAI', an expert and empathetic career strategist. "
-        "Your primary goal is to help the user understand their RIASEC profile and explore potential career paths in a thoughtful and empowering way. "
-        "You are not a simple Q&A bot; you are a guide."
-        "\n\n"
-        "### Core Directives:\n"
-        "1.  **Persona & Tone**: Be professional, encouraging, and insightful. Use a positive tone that builds the user's confidence. Address the user directly and respectfully."
-        "2.  **Grounding is Critical**: Base ALL your answers strictly on the user's profile summary and the O*NET job documents provided in the context. Explicitly reference the user's RIASEC scores (e.g., 'Your high score in Enterprising suggests...') and the provided job data. DO NOT invent information or provide details about jobs not included in the context."
-        "3.  **Synthesize, Don't Just List**: Do not just repeat the information given to you. Your value lies in connecting the dots. Explain *why* a certain job fits (or doesn't fit) the user's profile by linking specific job tasks or work environments to their RIASEC interests."
-        "4.  **Structure and Formatting**: Structure your answers for maximum clarity. Use simple HTML tags: `<h3>` for main sections, `<strong>` for emphasis, and `<ul>` with `<li>` for lists. Keep paragraphs concise."
-        "5.  **Maintain Dialogue**: Always end your response with a thoughtful, open-ended question to encourage further exploration and keep the conversation going. For example, 'Which of these aspects sounds most appealing to you?' or 'Would you like to dive deeper into the daily tasks of a Landscape Architect?'"
-        "\n\n"
-        "### Boundaries:\n"
-        "- You are NOT a life coach or a therapist. Avoid giving psychological advice."
-        "- You do NOT guarantee job placement or salary outcomes."
-        "- You do NOT provide information outside of the career context (e.g., financial advice, personal opinions)."
+
+def _pack(hits, token_budget):
+    retrieved_docs, sources, stats = pack_context(hits, token_budget)
+    print(
+        f"Chat context: {len(hits)} chunks packed into {stats['segments']} segments, "
+        f"{stats['tokens_sent']} tokens sent, {stats['tokens_saved']} saved by merging, "
+        f"{stats['tokens_dropped']} over budget"
     )
+    return retrieved_docs, sources
+
 
+def _search(
+    retriever,
+    user_question,
+    embedding_model,
+    embedding_cache,
+    embedding_model_name,
+    n_results,
+    lexical_index,
+    decisive_ratio,
+    rrf_k,
+    soc_codes=None,
+    query_vector=None,
+):
+    lexical_hits = []
+    if lexical_index is not None:
+        with metrics.timed("lexical_search"):
+            lexical_hits = lexical_index.search(
+                user_question, n_results=n_results * 4, soc_codes=soc_codes
+            )
+        if is_decisive(lexical_hits, decisive_ratio):
+            lexical_index.record_fast_path()
+            return lexical_hits[:n_results]
+
+    if query_vector is None:
+        query_vector = encode_query(
+            embedding_model, user_question, embedding_cache, embedding_model_name
+        )
+    with metrics.timed("vector_search"):
+        if not lexical_hits:
+            return retriever.query(query_vector, n_results=n_results, soc_codes=soc_codes)
+        vector_hits = retriever.query(query_vector, n_results=n_results * 4, soc_codes=soc_codes)
+    return reciprocal_rank_fusion([lexical_hits, vector_hits], n_results=n_results, k=rrf_k)
+
+
+def build_messages(user_question, profile_summary, retrieved_docs, conversation_summary=None):
+    """
+    Creates the system and user prompts for the LLM.
+
+    The system message is the constant SYSTEM_PROMPT and everything that
+    varies goes in the user message, so every request shares an identical
+    prefix that upstream prompt caching can reuse. The summary of earlier
+    turns follows the documents, so a session turn that reuses the previous
+    documents shares the prefix up to them as well.
+    """
+    conversation = (
+        f"EARLIER IN THIS CONVERSATION:\n{conversation_summary}\n\n" if conversation_summary else ""
+    )
     human_prompt = (
         f"USER PROFILE: {profile_summary}\n\n"
         f"O*NET JOB DOCUMENTS:\n"
         f"---------------------\n"
         f"{retrieved_docs}\n"
         f"---------------------\n\n"
+        f"{conversation}"
         f"Based on all the above, answer my question: '{user_question}'"
     )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": human_prompt},
+    ]
+
 
-    # Call the LLM to generate the answer
+def get_ai_response(
+    llm_client,
+    retriever,
+    user_question,
+    profile_summary,
+    model,
+    embedding_model,
+    embedding_cache=None,
+    embedding_model_name="",
+    lexical_index=None,
+    soc_codes=None,
+    n_results=5,
+    context_token_budget=None,
+):
+    """
+    Retrieves relevant documents from the database based on the user's question,
+    creates a prompt, and asks the LLM to generate an answer.
+
+    Args:
+        llm_client: Initialized OpenAI client.
+        retriever: ChromaRetriever or NumpyRetriever over the O*NET chunks.
+        user_question (str): The user's question.
+        profile_summary (str): The user's RIASEC profile summary.
+        model (str): Name of the LLM model to use.
+        embedding_model: SentenceTransformer model for embedding.
+        embedding_cache (LRUCache, optional): Query-embedding cache.
+        embedding_model_name (str): Name of the embedding model, used in cache keys.
+        lexical_index (BM25Index, optional): Enables hybrid retrieval and the
+            lexical fast path.
+        soc_codes (list, optional): Recommended SOC codes to search first.
+        n_results (int): Number of chunks retrieved before packing.
+        context_token_budget (int, optional): Maximum prompt tokens of O*NET context.
+
+    Raises:
+        ValueError: If an error occurs during service calls.
+
+    Returns:
+        str: The answer generated by the AI model.
+    """
+    # Retrieve relevant documents from the vector database
+    retrieved_docs, _ = retrieve_context(
+        retriever,
+        user_question,
+        embedding_model,
+        embedding_cache,
+        embedding_model_name,
+        n_results=n_results,
+        lexical_index=lexical_index,
+        soc_codes=soc_codes,
+        token_budget=context_token_budget,
+    )
+    messages = build_messages(user_question, profile_summary, retrieved_docs)
+    return complete_chat(llm_client, messages, model)
+
+
+def complete_chat(llm_client, messages, model):
+    """
+    Asks the LLM for one (non-streamed) answer to the prompt messages.
+
+    Raises:
+        ValueError: If the LLM call fails.
+
+    Returns:
+        str: The answer generated by the AI model.
+    """
     try:
-        response = llm_client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": human_prompt},
-            ],
-            temperature=0.7,
-            max_tokens=2000,
-        )
+        with metrics.timed("llm"):
+            response = llm_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=2000,
+            )
         answer = response.choices[0].message.content
         return answer
     except Exception as e:
         print(f"LLM API call error: {e}")
         raise ValueError("An error occurred while communicating with the AI model.")
+
+
+def stream_ai_response(llm_client, messages, model, sources=(), started_at=None, on_answer=None):
+    """
+    Streams the LLM answer as Server-Sent Events.
+
+    A "sources" event is sent before the LLM is called, then one "token" event
+    per content delta, and finally "done" (or "error" if the upstream call
+    fails mid-stream). Time to first token and total time are logged separately,
+    both measured from started_at (a time.perf_counter() value) when given.
+    on_answer, if given, is called with the complete answer text before "done".
+
+    Yields:
+        str: Encoded SSE messages.
+    """
+    start = started_at if started_at is not None else time.perf_counter()
+    yield format_sse("sources", {"sources": list(sources)})
+
+    first_token_at = None
+    answer_parts = []
+    llm_started_at = time.perf_counter()
+    try:
+        stream = llm_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=2000,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                metrics.observe_stage("llm_first_token", first_token_at - llm_started_at)
+            answer_parts.append(text)
+            yield format_sse("token", {"text": text})
+    except Exception as e:
+        print(f"LLM API streaming error: {e}")
+        yield format_sse("error", {"error": "An error occurred while communicating with the AI model."})
+        return
+
+    metrics.observe_stage("llm", time.perf_counter() - llm_started_at)
+    if on_answer is not None:
+        on_answer("".join(answer_parts))
+    total = time.perf_counter() - start
+    ttft = first_token_at - start if first_token_at is not None else None
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    print(f"Chat stream finished: time to first token {ttft_text}, total {total:.2f}s")
+    yield format_sse("done", {"ttft": ttft, "total": total})
+
+
+def format_sse(event, data):
+    """Encodes one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
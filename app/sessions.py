@@ -0,0 +1,208 @@
+import re
+import threading
+from collections import deque
+import numpy as np
+from .cache import LRUCache
+from .context import count_tokens
+from .services import retrieve_session_context
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,128}$")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def parse_session_id(value):
+    """
+    Validates the optional client-supplied chat session id.
+
+    Raises:
+        ValueError: If value is not 8-128 letters, digits, "-" or "_".
+
+    Returns:
+        str: The id, or None when none was sent.
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str) or not SESSION_ID_RE.match(value):
+        raise ValueError("'session_id' must be 8-128 letters, digits, '-' or '_'.")
+    return value
+
+
+def _soc_key(soc_codes):
+    return tuple(sorted(set(soc_codes))) if soc_codes else ()
+
+
+def compress_turn(question, answer, max_answer_tokens=60):
+    """
+    Condenses one question and answer into a line of the running summary.
+
+    The answer's HTML is stripped and only its leading sentences that fit in
+    max_answer_tokens are kept; the closing follow-up question the model is
+    asked to end with is dropped.
+    """
+    text = " ".join(_TAG_RE.sub(" ", answer or "").split())
+    sentences = [sentence for sentence in _SENTENCE_RE.split(text) if sentence]
+    if len(sentences) > 1 and sentences[-1].endswith("?"):
+        sentences = sentences[:-1]
+    kept = ""
+    for sentence in sentences:
+        candidate = f"{kept} {sentence}".strip()
+        if count_tokens(candidate) > max_answer_tokens:
+            break
+        kept = candidate
+    if not kept and sentences:
+        words = sentences[0].split()
+        while words and count_tokens(" ".join(words)) > max_answer_tokens:
+            words.pop()
+        kept = " ".join(words)
+    return f"Q: {' '.join(question.split())} A: {kept}"
+
+
+class ChatSession:
+    """
+    Retrieval set and running summary of one chat conversation.
+
+    hits holds the chunks retrieved so far, best first, and query_vectors the
+    embedded questions they were retrieved for. turns holds one compressed
+    line per answered question. Only the last max_turns question vectors and
+    turns are kept, so a long conversation does not grow the session or the
+    cost of a turn. A session is only used by the request holding its lock.
+    """
+
+    def __init__(self, soc_codes=None, generation=0, max_turns=20):
+        self.soc_codes = _soc_key(soc_codes)
+        self.generation = generation
+        self.hits = []
+        self.query_vectors = deque(maxlen=max_turns)
+        self.turns = deque(maxlen=max_turns)
+        self.turn_count = 0
+        self.lock = threading.Lock()
+
+    def reset_retrieval(self, soc_codes=None, generation=0):
+        """Drops the retrieval set (new occupations or reloaded data) but keeps the summary."""
+        self.soc_codes = _soc_key(soc_codes)
+        self.generation = generation
+        self.hits = []
+        self.query_vectors.clear()
+
+    def best_similarity(self, query_vector):
+        """Highest cosine similarity of query_vector to an earlier question of this session."""
+        if not self.query_vectors:
+            return -1.0
+        previous = np.asarray(self.query_vectors, dtype=np.float32)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(previous, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        norms[norms == 0] = 1.0
+        return float(np.max(previous @ query_vector / norms))
+
+    def extend(self, hits, query_vector, max_chunks):
+        """
+        Merges a new retrieval into the set: the new hits first, then the
+        earlier ones they do not repeat, capped at max_chunks.
+
+        Returns:
+            int: The number of chunks that were not in the set before.
+        """
+        known = {hit["doc_id"] for hit in self.hits}
+        new_ids = {hit["doc_id"] for hit in hits}
+        self.hits = (list(hits) + [hit for hit in self.hits if hit["doc_id"] not in new_ids])[:max_chunks]
+        if query_vector is not None:
+            self.query_vectors.append(query_vector)
+        return len(new_ids - known)
+
+    def add_turn(self, question, answer, max_answer_tokens=60):
+        """Appends the compressed turn to the summary; takes the session lock itself."""
+        line = compress_turn(question, answer, max_answer_tokens)
+        with self.lock:
+            self.turns.append(line)
+            self.turn_count += 1
+
+    def summary(self, token_budget=None):
+        """
+        The running summary: the compressed turns, newest kept first when
+        they do not all fit in token_budget.
+        """
+        lines, used = [], 0
+        for line in reversed(self.turns):
+            cost = count_tokens(line) + 1
+            if token_budget is not None and used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+        if self.turn_count > len(lines):
+            lines.append(f"({self.turn_count - len(lines)} earlier turns omitted)")
+        return "\n".join(reversed(lines))
+
+
+class SessionStore(LRUCache):
+    """
+    Chat sessions by client-supplied id, evicted after ttl seconds without a
+    turn (or least recently used beyond maxsize).
+
+    retrievals counts how each session turn got its context: "new" (first
+    retrieval of a session), "extended" (store queried, set merged) or
+    "reused" (no store query).
+    """
+
+    def __init__(self, maxsize=10000, ttl=1800, max_turns=20):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.max_turns = max_turns
+        self.retrievals = {"new": 0, "extended": 0, "reused": 0}
+        # Two first turns of one session arriving together must not create two sessions
+        self._session_lock = threading.Lock()
+
+    def session(self, session_id, soc_codes=None, generation=0):
+        """
+        Returns the session stored under session_id, creating it if needed.
+
+        A stored session whose occupations or data generation differ from
+        the request's keeps its summary but starts a new retrieval set.
+        Every call renews the session's TTL.
+        """
+        with self._session_lock:
+            session = self.get(session_id)
+            if session is None:
+                session = ChatSession(soc_codes, generation, self.max_turns)
+            self.set(session_id, session)
+        if session.soc_codes != _soc_key(soc_codes) or session.generation != generation:
+            with session.lock:
+                session.reset_retrieval(soc_codes, generation)
+        return session
+
+    def record_retrieval(self, outcome):
+        """Counts how a session turn got its context; called from concurrent requests."""
+        with self._session_lock:
+            self.retrievals[outcome] += 1
+
+    def info(self):
+        with self._session_lock:
+            retrievals = dict(self.retrievals)
+        return {**super().info(), "retrievals": retrievals}
+
+
+def session_turn_context(app, generation, session, user_question):
+    """
+    Retrieves the context of one session turn with the app's settings.
+
+    Returns:
+        tuple: (retrieved_docs, sources, conversation_summary) for build_messages.
+    """
+    config = app.config
+    with session.lock:
+        retrieved_docs, sources, outcome = retrieve_session_context(
+            session,
+            generation.retriever,
+            user_question,
+            app.embedding_model,
+            app.embedding_cache,
+            config["EMBEDDING_MODEL_NAME"],
+            n_results=config["CONTEXT_MAX_CHUNKS"],
+            lexical_index=generation.lexical_index,
+            token_budget=config["CONTEXT_TOKEN_BUDGET"],
+            reuse_similarity=config["CHAT_SESSION_REUSE_SIMILARITY"],
+            max_chunks=config["CHAT_SESSION_MAX_CHUNKS"],
+        )
+        conversation_summary = session.summary(config["CHAT_SUMMARY_TOKEN_BUDGET"])
+    app.chat_sessions.record_retrieval(outcome)
+    return retrieved_docs, sources, conversation_summary
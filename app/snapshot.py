@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from .competencies import CompetencyIndex
+from .recommender import FEATURES
+
+# Bump whenever the snapshot layout or the preparation logic changes
+SNAPSHOT_FORMAT_VERSION = 2
+
+COMPETENCY_KINDS = ("knowledge", "skills", "abilities")
+INPUT_FILE_KEYS = (
+    "ABILITIES_FILE_PATH",
+    "INTERESTS_FILE_PATH",
+    "KNOWLEDGE_FILE_PATH",
+    "OCCUPATIONS_FILE_PATH",
+    "SKILLS_FILE_PATH",
+)
+MANIFEST_NAME = "manifest.json"
+
+
+def compute_input_hash(config):
+    """Hashes the input parquet files and preparation settings the snapshot is built from."""
+    digest = hashlib.sha256()
+    digest.update(f"format={SNAPSHOT_FORMAT_VERSION};".encode())
+    digest.update(f"clusters={config['N_CLUSTERS']};".encode())
+    for key in INPUT_FILE_KEYS:
+        with open(config[key], "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(config, df_clustered_jobs, knowledge_index, skills_index, abilities_index):
+    """
+    Writes the prepared data as a directory of .npy arrays plus a manifest.
+
+    Every array is stored uncompressed so workers can np.load it with
+    mmap_mode="r". The CSR arrays of each CompetencyIndex are stored as they
+    are, so the loaded indexes are backed directly by the memory maps.
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    snapshot_path = config["SNAPSHOT_PATH"]
+    tmp_path = snapshot_path.with_name(f"{snapshot_path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    soc_codes = df_clustered_jobs.index.to_numpy().astype(str)
+    cluster_labels = df_clustered_jobs["cluster"].to_numpy().astype(np.int32)
+    cluster_names = (
+        df_clustered_jobs.groupby("cluster")["cluster_name"].first()
+        .reindex(range(cluster_labels.max() + 1), fill_value="")
+        .to_numpy().astype(str)
+    )
+
+    arrays = {
+        "soc_codes": soc_codes,
+        "titles": df_clustered_jobs["Title"].to_numpy().astype(str),
+        "job_matrix": df_clustered_jobs[FEATURES].to_numpy(dtype=np.float32),
+        "cluster_labels": cluster_labels,
+        "cluster_names": cluster_names,
+    }
+    indexes = dict(zip(COMPETENCY_KINDS, (knowledge_index, skills_index, abilities_index)))
+    for kind, index in indexes.items():
+        arrays[f"{kind}_names"] = np.array(index.names, dtype=str) if index.names else np.array([], dtype="<U1")
+        arrays[f"{kind}_offsets"] = index.offsets
+        arrays[f"{kind}_elements"] = index.element_ids
+        arrays[f"{kind}_importance"] = index.importance
+
+    for name, array in arrays.items():
+        np.save(tmp_path / f"{name}.npy", array, allow_pickle=False)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "input_hash": compute_input_hash(config),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "rows": len(soc_codes),
+        "arrays": sorted(arrays),
+    }
+    with open(tmp_path / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory in so readers never see a half-written snapshot
+    old_path = snapshot_path.with_name(f"{snapshot_path.name}.old-{os.getpid()}")
+    if snapshot_path.exists():
+        snapshot_path.rename(old_path)
+    tmp_path.rename(snapshot_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return manifest
+
+
+def load_snapshot(config, input_hash=None):
+    """
+    Memory-maps the prepared data snapshot if it matches the current inputs.
+
+    Args:
+        config (dict): The app config.
+        input_hash (str, optional): compute_input_hash(config), when the
+            caller has already computed it.
+
+    Returns:
+        tuple: Same shape as load_and_prepare_data, or None when the snapshot
+        is missing, stale or unreadable and the caller should rebuild the data.
+    """
+    snapshot_path = config["SNAPSHOT_PATH"]
+    try:
+        with open(snapshot_path / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        print(f"No data snapshot at '{snapshot_path}', preparing data from Parquet files.")
+        return None
+
+    try:
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            print("Data snapshot format is outdated, preparing data from Parquet files.")
+            return None
+        if manifest.get("input_hash") != (input_hash or compute_input_hash(config)):
+            print("Data snapshot does not match the input files, preparing data from Parquet files.")
+            return None
+
+        arrays = {
+            name: np.load(snapshot_path / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            for name in manifest["arrays"]
+        }
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Data snapshot could not be read ({e}), preparing data from Parquet files.")
+        return None
+
+    soc_codes = arrays["soc_codes"]
+    df_clustered_jobs = pd.DataFrame(
+        arrays["job_matrix"], columns=FEATURES, index=pd.Index(soc_codes, name="O*NET-SOC Code")
+    )
+    df_clustered_jobs.insert(0, "Title", arrays["titles"])
+    df_clustered_jobs["cluster"] = arrays["cluster_labels"]
+    df_clustered_jobs["cluster_name"] = arrays["cluster_names"][arrays["cluster_labels"]]
+
+    indexes = [
+        CompetencyIndex(
+            arrays[f"{kind}_names"],
+            arrays[f"{kind}_offsets"],
+            arrays[f"{kind}_elements"],
+            arrays[f"{kind}_importance"],
+        )
+        for kind in COMPETENCY_KINDS
+    ]
+    print(f"Data snapshot loaded from '{snapshot_path}' ({manifest['created_at']}).")
+    return (df_clustered_jobs, *indexes)
+
@@ -10,6 +10,9 @@ const questions = [
 
 const steps = ['R', 'I', 'A', 'S', 'E', 'C'];
 const optionLabels = ['Dislike', 'Slightly Dislike', 'Neutral', 'Slightly Enjoy', 'Enjoy'];
+// 'spec' asks the server for chart data only; the charts are drawn here as inline SVG
+const chartFormat = 'spec';
+const chartColor = '#007bff';
 let currentStep = 0;
 let userAnswers = {}; // Store all answers
 
@@ -19,6 +22,8 @@ let surveyBody, backBtn, nextBtn, progressBar, validationMsg, formContainer, res
 
 let userProfileSummary = '';
 let recommendationsData = [];
+// One chat session per page load, so follow-up questions reuse the retrieved context
+const chatSessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
 
 // --- 3. FUNCTIONS ---
 
@@ -151,11 +156,12 @@ async function submitAndShowResults() {
 
     try {
         await new Promise(resolve => setTimeout(resolve, 450));
-        const response = await fetch('/recommend', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(answersForBackend),
-        });
+        // A GET lets the browser revalidate a repeated survey with If-None-Match (304)
+        const params = new URLSearchParams({ chart_format: chartFormat });
+        for (const category in answersForBackend) {
+            params.set(category, answersForBackend[category].join(','));
+        }
+        const response = await fetch(`/recommend?${params}`, { cache: 'no-cache' });
 
         if (!response.ok) {
             const errorText = await response.text();
@@ -183,19 +189,31 @@ function renderResults(data, answersForBackend) {
     const topJobs = recommendationsData.slice(0, 3).map(rec => rec.Title).join(', ');
     userProfileSummary = `My RIASEC interest scores are: Realistic: ${riasecScores.R}, Investigative: ${riasecScores.I}, Artistic: ${riasecScores.A}, Social: ${riasecScores.S}, Enterprising: ${riasecScores.E}, Conventional: ${riasecScores.C}. The top recommended jobs for me were: ${topJobs}.`;
 
+    let radarChartHtml, barChartHtml;
+    if (data.chart_spec) {
+        radarChartHtml = renderRadarChart(data.chart_spec.radar);
+        barChartHtml = renderBarChart(data.chart_spec.bar);
+    } else if (chartFormat === 'svg') {
+        radarChartHtml = data.chart_images.radar;
+        barChartHtml = data.chart_images.bar;
+    } else {
+        radarChartHtml = `<img src="${data.chart_images.radar}" alt="Your Interest Profile Radar Chart">`;
+        barChartHtml = `<img src="${data.chart_images.bar}" alt="Top Job Matches Bar Chart">`;
+    }
+
     let resultsHtml = '<h2>Your Results</h2>';
     resultsHtml += `
         <div class="charts-container">
             <div class="chart-block">
                 <h3>Your Interest Profile</h3>
                 <div class="chart-wrapper">
-                    <img src="${data.chart_images.radar}" alt="Your Interest Profile Radar Chart">
+                    ${radarChartHtml}
                 </div>
             </div>
             <div class="chart-block">
                 <h3>Top Job Matches</h3>
                 <div class="chart-wrapper">
-                    <img src="${data.chart_images.bar}" alt="Top Job Matches Bar Chart">
+                    ${barChartHtml}
                 </div>
             </div>
         </div>
@@ -242,6 +260,57 @@ function renderResults(data, answersForBackend) {
     renderSuggestedQuestions();
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function renderRadarChart(spec) {
+    const size = 400, center = size / 2, radius = 140;
+    const count = spec.labels.length;
+    const point = (index, value) => {
+        const angle = (2 * Math.PI * index) / count;
+        const r = (radius * (value - spec.min)) / (spec.max - spec.min);
+        return [center + r * Math.cos(angle), center - r * Math.sin(angle)];
+    };
+
+    let svg = `<svg viewBox="0 0 ${size} ${size}" role="img" aria-label="Your Interest Profile Radar Chart">`;
+    for (let level = spec.min + 1; level <= spec.max; level++) {
+        const ring = spec.labels.map((_, i) => point(i, level).join(',')).join(' ');
+        svg += `<polygon points="${ring}" fill="none" stroke="#ccc" stroke-dasharray="3,3"/>`;
+        const [x, y] = point(0.5, level);
+        svg += `<text x="${x}" y="${y}" font-size="11" fill="grey">${level}</text>`;
+    }
+    spec.labels.forEach((label, i) => {
+        const [x, y] = point(i, spec.max);
+        const [lx, ly] = point(i, spec.max + 0.6);
+        const anchor = Math.abs(lx - center) < 1 ? 'middle' : (lx > center ? 'start' : 'end');
+        svg += `<line x1="${center}" y1="${center}" x2="${x}" y2="${y}" stroke="#ccc"/>`;
+        svg += `<text x="${lx}" y="${ly}" font-size="13" font-weight="bold" fill="#333" text-anchor="${anchor}" dominant-baseline="middle">${label}</text>`;
+    });
+    const shape = spec.values.map((value, i) => point(i, value).join(',')).join(' ');
+    svg += `<polygon points="${shape}" fill="${chartColor}" fill-opacity="0.25" stroke="${chartColor}" stroke-width="3"/>`;
+    return svg + '</svg>';
+}
+
+function renderBarChart(spec) {
+    const width = 400, rowHeight = 38, gap = 6;
+    const height = spec.values.length * (rowHeight + gap);
+    const minValue = Math.min(...spec.values) - 5, maxValue = Math.max(...spec.values) + 0.1;
+    const barWidth = value => ((value - minValue) / (maxValue - minValue)) * (width - 60);
+
+    let svg = `<svg viewBox="0 0 ${width} ${height}" role="img" aria-label="Top Job Matches Bar Chart">`;
+    spec.values.forEach((value, i) => {
+        const y = i * (rowHeight + gap), w = barWidth(value);
+        svg += `<rect x="0" y="${y}" width="${w}" height="${rowHeight}" fill="${chartColor}"/>`;
+        const label = spec.labels[i].length > 48 ? `${spec.labels[i].slice(0, 47)}…` : spec.labels[i];
+        svg += `<text x="8" y="${y + rowHeight / 2}" font-size="11" font-weight="bold" fill="white" dominant-baseline="middle"><title>${escapeHtml(spec.labels[i])}</title>${escapeHtml(label)}</text>`;
+        svg += `<text x="${w + 4}" y="${y + rowHeight / 2}" font-size="11" fill="#444" dominant-baseline="middle">${value.toFixed(1)}${spec.unit}</text>`;
+    });
+    return svg + '</svg>';
+}
+
 function renderSuggestedQuestions() {
     const container = document.getElementById('suggested-questions-container');
     container.innerHTML = '';
@@ -273,6 +342,46 @@ function addChatMessage(message, className) {
     return messageElement;
 }
 
+async function streamChatAnswer(response, messageElement) {
+    // Parses the Server-Sent Events from /chat?stream=true and renders tokens as they arrive
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let dataText = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) dataText += line.slice(6);
+            });
+            const payload = dataText ? JSON.parse(dataText) : {};
+
+            if (eventName === 'token') {
+                answer += payload.text;
+                messageElement.innerHTML = marked.parse(answer);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (eventName === 'error') {
+                answer += `\n\n${payload.error}`;
+                messageElement.innerHTML = marked.parse(answer);
+            }
+        }
+    }
+    if (!answer) {
+        messageElement.innerHTML = marked.parse('Sorry, something went wrong.');
+    }
+}
+
 // --- 4. EVENT LISTENERS & INITIALIZATION ---
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -361,18 +470,23 @@ document.addEventListener('DOMContentLoaded', () => {
         chatInput.style.height = 'auto';
         const typingIndicator = addChatMessage("Typing...", 'bot-message');
         try {
-            const response = await fetch('/chat', {
+            const response = await fetch('/chat?stream=true', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ question: userQuestion, profile_summary: userProfileSummary }),
+                body: JSON.stringify({
+                    question: userQuestion,
+                    profile_summary: userProfileSummary,
+                    soc_codes: recommendationsData.map(rec => rec.soc_code),
+                    session_id: chatSessionId,
+                }),
             });
-            const data = await response.json();
-            typingIndicator.remove();
-            if (data.answer) {
-                addChatMessage(data.answer, 'bot-message');
-            } else {
+            if (!response.ok || !response.body) {
+                const data = await response.json();
+                typingIndicator.remove();
                 addChatMessage(data.error || 'Sorry, something went wrong.', 'bot-message');
+                return;
             }
+            await streamChatAnswer(response, typingIndicator);
         } catch (error) {
             typingIndicator.remove();
             addChatMessage('I seem to be having trouble connecting. Please try again later.', 'bot-message');
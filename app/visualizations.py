@@ -1,35 +1,57 @@
 import io
+import os
+import re
 import base64
+import multiprocessing
+import textwrap
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
-import pandas as pd
-import matplotlib
+from .cache import LRUCache
+from .recommender import PROFILE_QUANTUM
 
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import seaborn as sns
-import textwrap
+CHART_FORMATS = ("png", "svg", "spec")
 
+RIASEC_LABELS = [
+    "Realistic",
+    "Investigative",
+    "Artistic",
+    "Social",
+    "Enterprising",
+    "Conventional",
+]
 
-def create_radar_chart_image(user_profile_values):
-    """Creates a visually enhanced radar chart and returns it as a Base64 string."""
-    labels = np.array(
-        [
-            "Realistic",
-            "Investigative",
-            "Artistic",
-            "Social",
-            "Enterprising",
-            "Conventional",
-        ]
-    )
+_theme_applied = False
+
+
+def _plotting():
+    """Imports Matplotlib and seaborn on first use and applies the chart theme once."""
+    global _theme_applied
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    if not _theme_applied:
+        sns.set_theme(style="whitegrid")
+        _theme_applied = True
+    return sns, Figure
+
+
+def create_radar_chart_image(user_profile_values, chart_format="png"):
+    """Creates a visually enhanced radar chart and returns it as a Base64 PNG or SVG markup."""
+    _, Figure = _plotting()
+    labels = np.array(RIASEC_LABELS)
     stats = np.concatenate((user_profile_values, [user_profile_values[0]]))
     angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False)
     angles = np.concatenate((angles, [angles[0]]))
 
-    sns.set_theme(style="whitegrid")
     radar_color = "#007bff"
 
-    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
+    fig = Figure(figsize=(8, 8))
+    ax = fig.add_subplot(polar=True)
 
     ax.plot(angles, stats, color=radar_color, linewidth=3)
     ax.fill(angles, stats, color=radar_color, alpha=0.25)
@@ -44,11 +66,14 @@ def create_radar_chart_image(user_profile_values):
     ax.grid(color="gray", linestyle="--", linewidth=0.5, alpha=0.7)
     ax.spines["polar"].set_visible(False)
 
-    return _fig_to_base64(fig)
+    return _fig_to_payload(fig, chart_format)
 
 
-def create_bar_chart_image(recommendations):
+def create_bar_chart_image(recommendations, chart_format="png"):
     """Creates a bar chart with wrapped occupation labels inside the bars to prevent overflow."""
+    import pandas as pd
+
+    sns, Figure = _plotting()
     top_recommendations = recommendations[:10]
 
     data = {
@@ -57,9 +82,8 @@ def create_bar_chart_image(recommendations):
     }
     df = pd.DataFrame(data).sort_values("Similarity", ascending=False)
 
-    sns.set_theme(style="whitegrid")
-
-    fig, ax = plt.subplots(figsize=(8, 8))
+    fig = Figure(figsize=(8, 8))
+    ax = fig.add_subplot()
 
     bars = sns.barplot(
         x="Similarity",
@@ -82,7 +106,7 @@ def create_bar_chart_image(recommendations):
 
     ax.grid(axis="x", linestyle="-", linewidth=0.7, alpha=0.3)
 
-    sns.despine(left=True, bottom=True)
+    sns.despine(ax=ax, left=True, bottom=True)
     ax.tick_params(axis="x", labelbottom=False)
 
     for index, (bar, row) in enumerate(zip(bars.patches, df.itertuples())):
@@ -113,14 +137,182 @@ def create_bar_chart_image(recommendations):
 
     fig.tight_layout(pad=1.5)
 
+    return _fig_to_payload(fig, chart_format)
+
+
+def create_chart_spec(user_profile_values, recommendations):
+    """
+    Returns the numeric series behind both charts so the browser can draw them.
+
+    This is the 'spec' chart format: no Matplotlib is involved at all.
+    """
+    top_recommendations = sorted(
+        recommendations[:10], key=lambda rec: rec["similarity"], reverse=True
+    )
+    return {
+        "radar": {
+            "labels": RIASEC_LABELS,
+            "values": [round(float(value), 4) for value in user_profile_values],
+            "min": 0,
+            "max": 5,
+        },
+        "bar": {
+            "labels": [rec["Title"] for rec in top_recommendations],
+            "values": [round(float(rec["similarity"]) * 100, 2) for rec in top_recommendations],
+            "unit": "%",
+        },
+    }
+
+
+def _fig_to_payload(fig, chart_format):
+    if chart_format == "svg":
+        return _fig_to_svg(fig)
     return _fig_to_base64(fig)
 
 
 def _fig_to_base64(fig):
     """Converts a Matplotlib figure to a Base64 string with high resolution."""
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", pad_inches=0.3)
-    plt.close(fig)
+    fig.savefig(buf, format="png", pad_inches=0.3)
     buf.seek(0)
     image_base64 = base64.b64encode(buf.read()).decode("utf-8")
     return f"data:image/png;base64,{image_base64}"
+
+
+def _fig_to_svg(fig):
+    """Converts a Matplotlib figure to minified inline SVG markup."""
+    import matplotlib
+
+    buf = io.StringIO()
+    # Keep text as <text> elements instead of embedding every glyph as a path
+    with matplotlib.rc_context({"svg.fonttype": "none"}):
+        fig.savefig(buf, format="svg", pad_inches=0.3, metadata={"Date": None})
+    svg = buf.getvalue()
+    svg = svg[svg.index("<svg"):]
+    svg = re.sub(r"<!--.*?-->|<metadata>.*?</metadata>", "", svg, flags=re.DOTALL)
+    svg = re.sub(r">\s+<", "><", svg)
+    return re.sub(r"\s+", " ", svg).strip()
+
+
+def _radar_key(user_profile_values):
+    return tuple(int(round(value * PROFILE_QUANTUM)) for value in user_profile_values)
+
+
+def _bar_key(recommendations):
+    return tuple(
+        (rec["Title"], round(float(rec["similarity"]), 4)) for rec in recommendations[:10]
+    )
+
+
+def _render_radar(key, chart_format):
+    return create_radar_chart_image([step / PROFILE_QUANTUM for step in key], chart_format)
+
+
+def _render_bar(key, chart_format):
+    return create_bar_chart_image(
+        [{"Title": title, "similarity": similarity} for title, similarity in key],
+        chart_format,
+    )
+
+
+def _warm_up():
+    return os.getpid()
+
+
+class ChartRenderer:
+    """
+    Renders the result charts in a bounded process pool and caches the images.
+
+    Matplotlib is not safe to drive from several request threads, so figures
+    are drawn in worker processes (or inline when max_workers is 0). Images are
+    cached in an LRU keyed by the quantized profile and the recommendation list
+    they were drawn from. A pool that dies or does not answer within timeout
+    seconds is discarded and the charts are drawn inline instead.
+    """
+
+    def __init__(self, max_workers=2, cache_size=512, timeout=30):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = LRUCache(maxsize=cache_size)
+        self._pool = None
+        self._pool_pid = None
+        # Two first requests arriving together must not each start a pool
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            # A pool inherited through fork (e.g. gunicorn --preload) is unusable in the child
+            if self._pool is None or self._pool_pid != os.getpid():
+                # spawn avoids forking a process that may already be running threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard_pool(self, pool, terminate=False):
+        """
+        Drops pool (unless another request already replaced it) so the next
+        render starts a new one. With terminate, its worker processes are
+        killed as well: shutdown() alone leaves a hung worker running.
+        """
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        workers = list((getattr(pool, "_processes", None) or {}).values()) if terminate else []
+        pool.shutdown(wait=False, cancel_futures=True)
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    def warm_up(self):
+        """Starts the renderer processes in the background so the first request does not pay for it."""
+        if self.max_workers > 0:
+            pool = self._get_pool()
+            for _ in range(self.max_workers):
+                pool.submit(_warm_up)
+
+    def render(self, user_profile_values, recommendations, chart_format="png"):
+        """Returns {"radar": ..., "bar": ...} images, rendering only cache misses."""
+        jobs = {
+            "radar": (("radar", chart_format, _radar_key(user_profile_values)), _render_radar),
+            "bar": (("bar", chart_format, _bar_key(recommendations)), _render_bar),
+        }
+        images, pending = {}, {}
+        for name, (key, render_fn) in jobs.items():
+            images[name] = self.cache.get(key)
+            if images[name] is None:
+                pending[name] = (key, render_fn)
+
+        if self.max_workers > 0 and pending:
+            pool = self._get_pool()
+            futures = {}
+            try:
+                for name, (key, render_fn) in pending.items():
+                    futures[name] = pool.submit(render_fn, key[2], chart_format)
+                for name, future in futures.items():
+                    images[name] = future.result(timeout=self.timeout)
+            except BrokenProcessPool:
+                print("Warning: Chart renderer pool died, rendering inline.")
+                self._discard_pool(pool)
+            except FutureTimeoutError:
+                print(f"Warning: Chart renderer pool did not answer within {self.timeout}s, rendering inline.")
+                for future in futures.values():
+                    future.cancel()
+                self._discard_pool(pool, terminate=True)
+
+        for name, (key, render_fn) in pending.items():
+            if images[name] is None:
+                images[name] = render_fn(key[2], chart_format)
+            self.cache.set(key, images[name])
+        return images
+
+    def cache_info(self):
+        return self.cache.info()
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,5 @@
+from app import create_app
+from app.async_chat import create_asgi_app
+
+# ASGI entry point with the async /chat path, e.g. `uvicorn asgi:application --workers 2`
+application = create_asgi_app(create_app())
@@ -0,0 +1,374 @@
+"""
+Load test for /recommend and /chat with local stand-ins for the LLM and the
+vector store.
+
+    python -m benchmarks.run --concurrency 8 --requests 200 --output results.json
+    python -m benchmarks.run --output results.json --baseline baseline.json
+
+The app is built with create_app and served by a threaded werkzeug server on
+a free local port. LLM calls go to benchmarks.stub_llm.StubLLMServer, so the
+upstream cost is set by --llm-latency and --llm-tokens-per-second. With
+--vector-store synthetic (the default) chat retrieval runs against a NumPy and
+BM25 index built from occupations.parquet with a hashing embedder; with
+--vector-store chroma the configured on-disk collection and embedding model
+are used. Per-stage timings are read from each response's Server-Timing
+header. With --baseline the run exits with status 1 when a latency
+percentile or the throughput of a scenario regresses by more than
+--max-regression; --report-only lists the regressions without failing.
+"""
+import sys
+import json
+import time
+import random
+import logging
+import pathlib
+import argparse
+import platform
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import create_app
+from app.config import Config
+from app.recommender import RIASEC_KEYS
+from benchmarks.stub_llm import StubLLMServer
+
+SCENARIOS = ("recommend_spec", "recommend_png", "chat", "chat_stream")
+
+# Latency percentiles compared against the baseline
+COMPARED_PERCENTILES = ("p50", "p95", "p99")
+
+QUESTION_TEMPLATES = [
+    "What does a {title} do day to day?",
+    "What skills do I need to become a {title}?",
+    "Is {title} a good fit for someone who likes working with people?",
+    "How do I get started as a {title}?",
+    "What is the work environment like for a {title}?",
+]
+
+
+def parse_server_timing(header):
+    """Parses a Server-Timing header into {stage: milliseconds}, leaving out the total."""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name != "total":
+                timings[name] = float(value)
+    return timings
+
+
+def summarize(values):
+    """Percentiles of a list of millisecond durations."""
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def answer_sets(n, seed):
+    """n random survey answer sets, eight 1-5 Likert answers per RIASEC key."""
+    rng = random.Random(seed)
+    return [{key: [rng.randint(1, 5) for _ in range(8)] for key in RIASEC_KEYS} for _ in range(n)]
+
+
+def chat_payloads(recommender, n, seed):
+    """n chat requests about random occupations, restricted to 20 SOC codes like the UI sends."""
+    rng = random.Random(seed)
+    rows = list(range(len(recommender.titles)))
+    payloads = []
+    for _ in range(n):
+        picked = rng.sample(rows, min(20, len(rows)))
+        title = recommender.titles[picked[0]]
+        payloads.append({
+            "question": rng.choice(QUESTION_TEMPLATES).format(title=title),
+            "profile_summary": ", ".join(f"{key}:{rng.uniform(1, 5):.1f}" for key in RIASEC_KEYS),
+            "soc_codes": [str(recommender.soc_codes[row]) for row in picked],
+        })
+    return payloads
+
+
+def _recommend_request(chart_format):
+    def send(http, payload):
+        response = http.post(f"/recommend?chart_format={chart_format}", json=payload)
+        response.raise_for_status()
+        return {"timings": parse_server_timing(response.headers.get("server-timing"))}
+    return send
+
+
+def _chat_request(http, payload):
+    response = http.post("/chat", json=payload)
+    response.raise_for_status()
+    return {"timings": parse_server_timing(response.headers.get("server-timing"))}
+
+
+def _chat_stream_request(http, payload):
+    """
+    Reads the SSE answer and reports the time to the first answer token. The
+    Server-Timing header is sent before the answer, so it covers retrieval only.
+    """
+    start = time.perf_counter()
+    first_token = None
+    with http.stream("POST", "/chat?stream=1", json=payload) as response:
+        response.raise_for_status()
+        timings = parse_server_timing(response.headers.get("server-timing"))
+        event = None
+        for line in response.iter_lines():
+            if line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif line.startswith("data:") and event == "error":
+                raise RuntimeError(line)
+    return {"ttft": first_token, "timings": timings}
+
+
+def run_scenario(base_url, send, payloads, concurrency, warmup):
+    """
+    Sends every payload once from concurrency client threads, after warmup
+    unmeasured requests.
+
+    Returns:
+        dict: Request and error counts, throughput, latency percentiles,
+        per-stage percentiles from the Server-Timing headers, and time to
+        first token for streamed chat.
+    """
+    local = threading.local()
+    clients = []
+    clients_lock = threading.Lock()
+
+    def client():
+        if not hasattr(local, "http"):
+            local.http = httpx.Client(base_url=base_url, timeout=120)
+            with clients_lock:
+                clients.append(local.http)
+        return local.http
+
+    def one(payload):
+        start = time.perf_counter()
+        try:
+            extra = send(client(), payload)
+            return time.perf_counter() - start, extra, None
+        except Exception as e:
+            return time.perf_counter() - start, {}, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads[:warmup]))
+        started_at = time.perf_counter()
+        results = list(pool.map(one, payloads))
+        wall_seconds = time.perf_counter() - started_at
+    for http in clients:
+        http.close()
+
+    latencies = [seconds * 1000 for seconds, _, error in results if error is None]
+    errors = [error for _, _, error in results if error is not None]
+    report = {
+        "requests": len(results),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+    ttft = [extra["ttft"] * 1000 for _, extra, error in results if error is None and extra.get("ttft")]
+    if ttft:
+        report["ttft_ms"] = summarize(ttft)
+    stages = {}
+    for _, extra, error in results:
+        if error is None:
+            for stage, milliseconds in extra.get("timings", {}).items():
+                stages.setdefault(stage, []).append(milliseconds)
+    report["stages_ms"] = {stage: summarize(values) for stage, values in sorted(stages.items())}
+    if errors:
+        report["first_error"] = errors[0]
+    return report
+
+
+def build_app(args, stub, workdir):
+    """Creates the app against the stub LLM and the selected vector store."""
+    overrides = {
+        "APP_ROLE": "all",
+        "OPEN_ROUTER_API_KEY": "benchmark",
+        "LLM_BASE_URL": stub.base_url,
+        "CHART_RENDER_WORKERS": args.chart_workers,
+    }
+    store = None
+    if args.vector_store == "synthetic":
+        from benchmarks.synthetic import HashingEmbedder, build_synthetic_store
+
+        embedder = HashingEmbedder(encode_latency=args.embed_latency)
+        store = build_synthetic_store(workdir, Config.OCCUPATIONS_FILE_PATH, embedder)
+        overrides.update({
+            "RETRIEVER_BACKEND": "numpy",
+            "NUMPY_INDEX_PATH": workdir / "vector_index",
+            "LEXICAL_INDEX_PATH": workdir / "bm25_index",
+        })
+
+    config_class = type("BenchmarkConfig", (Config,), overrides)
+    app = create_app(config_class)
+    if store is not None:
+        # The index was embedded with the hashing model, so queries must use it too
+        app.retriever, app.lexical_index = store
+        app.embedding_model = embedder
+    if app.recommender is None:
+        raise RuntimeError("Recommendation data could not be loaded.")
+    if app.retriever is None or app.embedding_model is None:
+        raise RuntimeError("Chat retrieval could not be initialized; try --vector-store synthetic.")
+    return app
+
+
+def serve(app):
+    """Serves app on a free local port from a background thread; returns (server, base_url)."""
+    from werkzeug.serving import make_server
+
+    # One access-log line per request would distort the timings
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def compare(results, baseline, max_regression, min_delta_ms):
+    """
+    Lists the regressions of results against a baseline run.
+
+    A latency percentile regresses when it is more than max_regression
+    (a fraction) and more than min_delta_ms above the baseline; throughput
+    regresses when it drops by more than max_regression.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for percentile in COMPARED_PERCENTILES:
+            now = current["latency_ms"].get(percentile)
+            before = previous["latency_ms"].get(percentile)
+            if now is None or not before:
+                continue
+            if now > before * (1 + max_regression) and now - before > min_delta_ms:
+                regressions.append(
+                    f"{name} latency {percentile}: {before:.1f} ms -> {now:.1f} ms "
+                    f"(+{(now / before - 1) * 100:.0f}%)"
+                )
+        before, now = previous.get("throughput_rps"), current.get("throughput_rps")
+        if before and now is not None and now < before * (1 - max_regression):
+            regressions.append(
+                f"{name} throughput: {before:.1f} -> {now:.1f} req/s ({(now / before - 1) * 100:.0f}%)"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name} errors: {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def main(args):
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}. Choose from: {', '.join(SCENARIOS)}.")
+
+    stub = StubLLMServer(
+        first_token_latency=args.llm_latency,
+        tokens_per_second=args.llm_tokens_per_second,
+        answer_tokens=args.llm_answer_tokens,
+    ).start()
+    with tempfile.TemporaryDirectory(prefix="occumend-bench-") as workdir:
+        app = build_app(args, stub, pathlib.Path(workdir))
+        server, base_url = serve(app)
+
+        profiles = answer_sets(args.profiles, args.seed)
+        questions = chat_payloads(app.recommender, args.profiles, args.seed)
+        senders = {
+            "recommend_spec": (_recommend_request("spec"), profiles),
+            "recommend_png": (_recommend_request("png"), profiles),
+            "chat": (_chat_request, questions),
+            "chat_stream": (_chat_stream_request, questions),
+        }
+
+        results = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "vector_store": args.vector_store,
+                "chunks": len(app.retriever) if hasattr(app.retriever, "__len__") else None,
+                "llm_latency": args.llm_latency,
+                "llm_tokens_per_second": args.llm_tokens_per_second,
+                "llm_answer_tokens": args.llm_answer_tokens,
+                "chart_workers": args.chart_workers,
+            },
+            "startup_timings": app.startup_timings,
+            "scenarios": {},
+        }
+        try:
+            for name in scenarios:
+                send, pool = senders[name]
+                payloads = [pool[i % len(pool)] for i in range(args.requests)]
+                print(f"Running {name}: {args.requests} requests at concurrency {args.concurrency}...")
+                report = run_scenario(base_url, send, payloads, args.concurrency, args.warmup)
+                results["scenarios"][name] = report
+                latency = report["latency_ms"]
+                print(
+                    f"  p50 {latency.get('p50', 0):.1f} ms, p95 {latency.get('p95', 0):.1f} ms, "
+                    f"p99 {latency.get('p99', 0):.1f} ms, {report['throughput_rps']:.1f} req/s, "
+                    f"{report['errors']} errors"
+                )
+        finally:
+            server.shutdown()
+            stub.stop()
+            if app.chart_renderer is not None:
+                app.chart_renderer.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("Performance regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 0 if args.report_only else 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test /recommend and /chat with a stub LLM.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of: {', '.join(SCENARIOS)}.")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads.")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent first.")
+    parser.add_argument("--profiles", type=int, default=50, help="Distinct payloads per scenario (repeats hit caches).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vector-store", choices=("synthetic", "chroma"), default="synthetic")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="Seconds per synthetic embedding call.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM seconds to first token.")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--llm-answer-tokens", type=int, default=50)
+    parser.add_argument("--chart-workers", type=int, default=Config.CHART_RENDER_WORKERS)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed fractional slowdown.")
+    parser.add_argument("--min-delta-ms", type=float, default=10.0, help="Ignore latency changes smaller than this.")
+    parser.add_argument("--report-only", action="store_true", help="List regressions but exit with status 0.")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+
+from app.lexical import BM25Index, tokenize
+from app.services import NumpyRetriever
+
+
+class HashingEmbedder:
+    """
+    Deterministic stand-in for the SentenceTransformer model.
+
+    Each token is hashed into one of dimension buckets with a +/-1 sign, so
+    texts that share words get similar vectors and retrieval behaves like a
+    (weak) bag-of-words model. encode_latency adds a fixed sleep per call to
+    model the cost of the real encoder.
+    """
+
+    def __init__(self, dimension=384, encode_latency=0.0):
+        self.dimension = dimension
+        self.encode_latency = encode_latency
+
+    def _vector(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, **kwargs):
+        if self.encode_latency:
+            time.sleep(self.encode_latency)
+        return np.stack([self._vector(text) for text in sentences])
+
+
+def synthetic_records(occupations_path, chunks_per_occupation=3, seed=0):
+    """
+    Yields knowledge-base records for every occupation in occupations.parquet.
+
+    The first chunk is the real title and description; the remaining chunks
+    reuse description sentences in a shuffled order, so chunk counts and
+    lengths are close to the real knowledge base without task data.
+    """
+    rng = np.random.default_rng(seed)
+    occupations = pd.read_parquet(
+        occupations_path, columns=["O*NET-SOC Code", "Title", "Description"]
+    )
+    for code, title, description in occupations.itertuples(index=False):
+        sentences = [s.strip() for s in str(description).split(".") if s.strip()] or [title]
+        for idx in range(1, chunks_per_occupation + 1):
+            if idx == 1:
+                content = f"Occupation: {title}\n\nSummary: {description}"
+            else:
+                picked = rng.permutation(len(sentences))
+                content = f"{title}. " + ". ".join(sentences[i] for i in picked) + "."
+            yield {
+                "doc_id": f"{code}#{idx}",
+                "soc_code": code,
+                "title": f"{title} (Chunk {idx})",
+                "content": content,
+            }
+
+
+def build_synthetic_store(index_dir, occupations_path, embedder, chunks_per_occupation=3):
+    """
+    Writes a NumPy vector index and a BM25 index for the synthetic knowledge
+    base under index_dir and returns (retriever, lexical_index).
+    """
+    records = list(synthetic_records(occupations_path, chunks_per_occupation))
+    embeddings = embedder.encode([record["content"] for record in records])
+    vector_path = index_dir / "vector_index"
+    lexical_path = index_dir / "bm25_index"
+    NumpyRetriever.build(
+        vector_path,
+        [record["doc_id"] for record in records],
+        [record["title"] for record in records],
+        [record["content"] for record in records],
+        embeddings,
+    )
+    BM25Index.build(lexical_path, records)
+    return NumpyRetriever(vector_path), BM25Index(lexical_path)
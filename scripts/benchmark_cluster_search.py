@@ -0,0 +1,131 @@
+import sys
+import time
+import pathlib
+import argparse
+import numpy as np
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.config import Config
+from app.competencies import CompetencyIndex
+from app.data_processing import load_and_prepare_data
+from app.recommender import FEATURES, RIASEC_KEYS, RecommendationEngine, quantize_profile
+from app.snapshot import load_snapshot
+
+
+def _catalog(config, n_rows, noise, rng):
+    """
+    The occupation RIASEC profiles, replicated with Gaussian noise up to
+    n_rows to stand in for a catalog extended with alternate titles.
+    """
+    df_clustered_jobs = (load_snapshot(config) or load_and_prepare_data(config))[0]
+    if df_clustered_jobs is None:
+        print("ERROR: Occupation data could not be loaded.")
+        sys.exit(1)
+    base = df_clustered_jobs[FEATURES].fillna(0).to_numpy(dtype=np.float32)
+    copies = max(1, -(-n_rows // len(base)))
+    matrix = np.tile(base, (copies, 1))[:n_rows]
+    if len(matrix) > len(base):
+        matrix[len(base):] += rng.normal(scale=noise, size=matrix[len(base):].shape).astype(np.float32)
+    return np.clip(matrix, 0, None)
+
+
+def _engine(job_matrix, search_clusters=0, search_probes=2):
+    n_rows = len(job_matrix)
+    labels = np.array([str(row) for row in range(n_rows)], dtype=object)
+    return RecommendationEngine(
+        job_matrix,
+        titles=labels,
+        cluster_names=labels,
+        soc_codes=labels,
+        knowledge_index=CompetencyIndex.empty(n_rows),
+        skills_index=CompetencyIndex.empty(n_rows),
+        abilities_index=CompetencyIndex.empty(n_rows),
+        search_clusters=search_clusters,
+        search_probes=search_probes,
+    )
+
+
+def _search(engine, queries, k):
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = engine.top_k(query, k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(rows)
+    return np.array(timings), results
+
+
+def benchmark(n_rows, n_queries, k, cluster_counts, probe_counts, noise, seed):
+    """
+    Reports recall@k and latency of the two-stage cluster search against
+    exact search for every (clusters, probes) pair.
+
+    Queries are survey profiles: six averages of eight 1-5 Likert answers,
+    snapped to the grid /recommend uses. Recall is the share of the exact
+    top-k rows that the pruned search also returns. A query falls back to
+    exact search when its probed clusters hold fewer than k rows; the
+    fallback rate is reported per configuration.
+    """
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    rng = np.random.default_rng(seed)
+    job_matrix = _catalog(config, n_rows, noise, rng)
+    answers = rng.integers(1, 6, size=(n_queries, len(RIASEC_KEYS), 8))
+    queries = quantize_profile(answers.mean(axis=2))
+
+    exact_engine = _engine(job_matrix)
+    exact_engine.top_k(queries[0], k)  # warm up
+    exact_timings, exact = _search(exact_engine, queries, k)
+    print(f"{len(job_matrix)} occupations, {len(queries)} queries, top-{k}")
+    print(
+        f"{'exact':>16}: p50 {np.percentile(exact_timings, 50):.3f} ms, "
+        f"p95 {np.percentile(exact_timings, 95):.3f} ms"
+    )
+
+    for n_clusters in cluster_counts:
+        start = time.perf_counter()
+        engine = _engine(job_matrix, n_clusters)
+        build_seconds = time.perf_counter() - start
+        sizes = np.diff(engine.cluster_offsets)
+        print(
+            f"{n_clusters} clusters built in {build_seconds:.2f} s "
+            f"(members min {sizes.min()}, median {int(np.median(sizes))}, max {sizes.max()})"
+        )
+        for n_probes in probe_counts:
+            if n_probes > n_clusters:
+                continue
+            engine.search_probes = n_probes
+            fallbacks = sum(engine.probe(query, k) is None for query in queries)
+            timings, results = _search(engine, queries, k)
+            recall = np.mean([
+                len(set(found) & set(truth)) / len(truth) for found, truth in zip(results, exact)
+            ])
+            speedup = np.percentile(exact_timings, 50) / np.percentile(timings, 50)
+            print(
+                f"{f'{n_probes}/{n_clusters} probed':>16}: p50 {np.percentile(timings, 50):.3f} ms, "
+                f"p95 {np.percentile(timings, 95):.3f} ms, recall@{k} {recall:.3f}, "
+                f"{speedup:.1f}x, fallback {fallbacks / len(queries):.1%}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall versus latency of cluster-pruned recommendation search.")
+    parser.add_argument("--rows", type=int, default=200_000, help="Catalog size after replication.")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--clusters", default="16,64,256", help="Comma-separated cluster counts.")
+    parser.add_argument("--probes", default="1,2,4,8,16", help="Comma-separated probe counts.")
+    parser.add_argument("--noise", type=float, default=0.15, help="Noise added to replicated profiles.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(
+        args.rows,
+        args.queries,
+        args.top_k,
+        [int(value) for value in args.clusters.split(",")],
+        [int(value) for value in args.probes.split(",")],
+        args.noise,
+        args.seed,
+    )
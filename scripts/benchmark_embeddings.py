@@ -0,0 +1,144 @@
+import sys
+import time
+import pathlib
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.config import Config
+from app.embeddings import EMBEDDING_BACKENDS, ONNX_FILES
+
+QUESTION_TEMPLATES = [
+    "What does a {title} do?",
+    "What skills does a {title} need?",
+    "What is the work environment of a {title} like?",
+]
+
+
+def _rss_mb():
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _measure(backend, model_name, queries, corpus, batch_size):
+    """
+    Runs in a fresh process so RSS reflects only this backend: loads the model,
+    times single-query encoding and bulk corpus encoding, and returns the vectors.
+    """
+    from app.embeddings import load_embedding_model
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model = load_embedding_model(model_name, backend)
+    load_seconds = time.perf_counter() - start
+    model.encode(queries[:1])  # first call allocates the runtime's buffers
+
+    query_vectors, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(model.encode([query])[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    corpus_vectors = model.encode(corpus, batch_size=batch_size)
+    bulk_seconds = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "rss_mb": _rss_mb() - rss_before,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "bulk_per_second": len(corpus) / bulk_seconds,
+        "query_vectors": np.asarray(query_vectors, dtype=np.float32),
+        "corpus_vectors": np.asarray(corpus_vectors, dtype=np.float32),
+    }
+
+
+def _top_k(query_vectors, corpus_vectors, k):
+    scores = query_vectors @ corpus_vectors.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def benchmark(backends, n_queries, top_k, batch_size, min_recall, min_cosine, seed):
+    """
+    Compares embedding backends against torch and checks retrieval parity.
+
+    Queries are questions about random occupations, and the corpus is the
+    occupation descriptions. Parity is measured the way production uses the
+    model: the corpus is embedded once with torch (as the stored index is),
+    and each backend's query vectors must retrieve the same top-k as torch's
+    query vectors (recall@k) and stay close to them (cosine similarity).
+
+    Returns:
+        bool: True when every backend meets min_recall and min_cosine.
+    """
+    occupations = pd.read_parquet(Config.OCCUPATIONS_FILE_PATH, columns=["Title", "Description"])
+    rng = np.random.default_rng(seed)
+    corpus = [f"{title}: {description}" for title, description in occupations.itertuples(index=False)]
+    rows = rng.choice(len(occupations), size=min(n_queries, len(occupations)), replace=False)
+    queries = [
+        QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(title=occupations["Title"].iloc[row])
+        for i, row in enumerate(rows)
+    ]
+
+    model_name = Config.EMBEDDING_MODEL_NAME
+    results = {}
+    for backend in ["torch", *[b for b in backends if b != "torch"]]:
+        if backend != "torch" and not (pathlib.Path(model_name) / ONNX_FILES[backend]).exists():
+            print(f"{backend:>9}: skipped, run scripts/export_onnx_model.py first")
+            continue
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[backend] = pool.submit(
+                _measure, backend, model_name, queries, corpus, batch_size
+            ).result()
+
+    reference = results["torch"]
+    exact = _top_k(reference["query_vectors"], reference["corpus_vectors"], top_k)
+    print(f"{len(queries)} queries, {len(corpus)} documents, top-{top_k}")
+    passed = True
+    for backend, result in results.items():
+        found = _top_k(result["query_vectors"], reference["corpus_vectors"], top_k)
+        recall = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(found, exact)])
+        cosine = np.sum(result["query_vectors"] * reference["query_vectors"], axis=1)
+        ok = recall >= min_recall and cosine.min() >= min_cosine
+        passed &= ok
+        print(
+            f"{backend:>9}: load {result['load_seconds']:.2f} s, +{result['rss_mb']:.0f} MB RSS, "
+            f"query p50 {result['query_p50_ms']:.2f} ms / p95 {result['query_p95_ms']:.2f} ms, "
+            f"bulk {result['bulk_per_second']:.0f} docs/s, recall@{top_k} {recall:.3f}, "
+            f"min cosine {cosine.min():.4f}{'' if ok else '  FAILED'}"
+        )
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends and check retrieval parity.")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS), help="Comma-separated backends.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Required recall@k against torch.")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Required query cosine against torch.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    ok = benchmark(
+        [backend.strip() for backend in args.backends.split(",") if backend.strip()],
+        args.queries,
+        args.top_k,
+        args.batch_size,
+        args.min_recall,
+        args.min_cosine,
+        args.seed,
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,70 @@
+import sys
+import time
+import pathlib
+import argparse
+import numpy as np
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import chromadb
+from app.config import Config
+from app.services import ChromaRetriever, NumpyRetriever, open_collection
+
+
+def _latency_ms(retriever, queries, n_results):
+    timings = []
+    results = []
+    for query_vector in queries:
+        start = time.perf_counter()
+        hits = retriever.query(query_vector, n_results=n_results)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append([hit["doc_id"] for hit in hits])
+    return np.array(timings), results
+
+
+def benchmark(n_queries, n_results, seed):
+    """
+    Compares the ChromaDB and NumPy retrievers on the same query vectors.
+
+    Queries are stored chunk embeddings with a little noise added, so they
+    land near real content. Recall@k is measured against the exact NumPy
+    top-k, which is the ground truth for both backends.
+    """
+    numpy_retriever = NumpyRetriever(Config.NUMPY_INDEX_PATH)
+    client = chromadb.PersistentClient(path=str(Config.VECTOR_DB_PATH))
+    chroma_retriever = ChromaRetriever(
+        open_collection(client, Config.VECTOR_DB_PATH, Config.ONET_COLLECTION_NAME)
+    )
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(numpy_retriever), size=min(n_queries, len(numpy_retriever)), replace=False)
+    queries = np.asarray(numpy_retriever.embeddings[rows], dtype=np.float32)
+    queries += rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    queries = [query.tolist() for query in queries]
+
+    exact = None
+    print(f"{len(queries)} queries, top-{n_results}, {len(numpy_retriever)} chunks")
+    for retriever in (numpy_retriever, chroma_retriever):
+        retriever.query(queries[0], n_results=n_results)  # warm caches
+        timings, results = _latency_ms(retriever, queries, n_results)
+        if exact is None:
+            exact = results
+        recall = np.mean([
+            len(set(found) & set(truth)) / len(truth) for found, truth in zip(results, exact)
+        ])
+        print(
+            f"{retriever.name:>6}: p50 {np.percentile(timings, 50):.3f} ms, "
+            f"p95 {np.percentile(timings, 95):.3f} ms, recall@{n_results} {recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the chat retriever backends.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.queries, args.top_k, args.seed)
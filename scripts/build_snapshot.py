@@ -0,0 +1,33 @@
+import sys
+import pathlib
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.config import Config
+from app.data_processing import load_and_prepare_data
+from app.snapshot import write_snapshot
+
+
+def build_snapshot():
+    """
+    Runs the full data preparation once and writes it as a memory-mappable
+    snapshot that the app loads at startup instead of re-clustering.
+    """
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+
+    df_clustered_jobs, knowledge_index, skills_index, abilities_index = load_and_prepare_data(config)
+    if df_clustered_jobs is None:
+        print("ERROR: Data could not be prepared, snapshot was not written.")
+        sys.exit(1)
+
+    manifest = write_snapshot(config, df_clustered_jobs, knowledge_index, skills_index, abilities_index)
+    print(
+        f"Snapshot with {manifest['rows']} occupations written to "
+        f"'{config['SNAPSHOT_PATH']}' (input hash {manifest['input_hash'][:12]})."
+    )
+
+
+if __name__ == "__main__":
+    build_snapshot()
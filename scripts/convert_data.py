@@ -1,8 +1,9 @@
 import pandas as pd
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
 
 # Project root directory
-BASE_DIR = pathlib.Path(__file__).parent.resolve()
+BASE_DIR = pathlib.Path(__file__).parents[1].resolve()
 DATA_PATH = BASE_DIR / "data"
 
 # List of files to convert
@@ -11,31 +12,81 @@ files_to_convert = [
     "interests.xlsx",
     "knowledge.xlsx",
     "occupations.xlsx",
-    "skills.xlsx"
+    "skills.xlsx",
+    "task_statements.xlsx",
+    "work_context.xlsx",
 ]
 
-def convert_excel_to_parquet():
-    """Reads Excel files from the data directory and saves them as Parquet files."""
-    print("Starting conversion from Excel to Parquet...")
-    
-    for file_name in files_to_convert:
-        excel_path = DATA_PATH / file_name
-        parquet_path = DATA_PATH / file_name.replace(".xlsx", ".parquet")
+# Repeated identifiers are stored dictionary-encoded, measurements as float32
+CATEGORICAL_COLUMNS = ["O*NET-SOC Code", "Element ID", "Element Name", "Scale ID"]
+FLOAT32_COLUMNS = ["Data Value", "Standard Error", "Lower CI Bound", "Upper CI Bound"]
+
+
+def apply_types(df):
+    """
+    Gives O*NET rating tables (files with a Scale ID column) an explicit schema
+    and sorts them by Scale ID, so every scale lands in its own row groups.
+    Lookup tables such as occupations.xlsx are returned unchanged.
+    """
+    if "Scale ID" not in df.columns:
+        return df
+    df = df.sort_values(["Scale ID", "O*NET-SOC Code"], kind="stable").reset_index(drop=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(str).astype("category")
+    for column in FLOAT32_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+    return df
+
+
+def write_parquet(df, parquet_path):
+    """Writes df, starting a new row group at every Scale ID so readers can skip whole scales."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if "Scale ID" not in df.columns:
+        df.to_parquet(parquet_path, index=False)
+        return
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(parquet_path, table.schema) as writer:
+        for _, scale_rows in df.groupby("Scale ID", observed=True, sort=True).indices.items():
+            writer.write_table(table.slice(scale_rows[0], len(scale_rows)))
 
-        if not excel_path.exists():
-            print(f"Warning: {excel_path} not found. Skipping.")
-            continue
 
-        try:
-            # Read the Excel file
+def convert_file(file_name):
+    """Converts one Excel file; returns a status line for the summary."""
+    excel_path = DATA_PATH / file_name
+    parquet_path = DATA_PATH / file_name.replace(".xlsx", ".parquet")
+
+    if excel_path.exists():
+        source_path = excel_path
+    elif parquet_path.exists():
+        # The Excel sources are not committed; upgrade the existing Parquet copy in place
+        source_path = parquet_path
+    else:
+        return f"Warning: {excel_path} not found. Skipping."
+
+    try:
+        if source_path == excel_path:
             df = pd.read_excel(excel_path)
-            
-            # Save as Parquet
-            df.to_parquet(parquet_path, index=False)
-            
-            print(f"Successfully converted {excel_path} to {parquet_path}")
-        except Exception as e:
-            print(f"Failed to convert {file_name}. Error: {e}")
+        else:
+            df = pd.read_parquet(parquet_path)
+        write_parquet(apply_types(df), parquet_path)
+        return f"Successfully converted {source_path} to {parquet_path}"
+    except Exception as e:
+        return f"Failed to convert {file_name}. Error: {e}"
+
+
+def convert_excel_to_parquet(max_workers=None):
+    """Reads Excel files from the data directory in parallel and saves them as typed Parquet files."""
+    print("Starting conversion from Excel to Parquet...")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for message in pool.map(convert_file, files_to_convert):
+            print(message)
+
 
 if __name__ == "__main__":
-    convert_excel_to_parquet()
\ No newline at end of file
+    convert_excel_to_parquet()
@@ -0,0 +1,41 @@
+import sys
+import pathlib
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import chromadb
+from app.config import Config
+from app.services import NumpyRetriever, open_collection
+
+
+def export_numpy_index():
+    """
+    Copies the chunks and their stored embeddings out of ChromaDB into the
+    flat index used by RETRIEVER_BACKEND=numpy. No text is re-embedded.
+    """
+    client = chromadb.PersistentClient(path=str(Config.VECTOR_DB_PATH))
+    try:
+        collection = open_collection(client, Config.VECTOR_DB_PATH, Config.ONET_COLLECTION_NAME)
+    except Exception as e:
+        print(f"ERROR: Collection '{Config.ONET_COLLECTION_NAME}' could not be opened: {e}")
+        print("Please run 'vectorize_knowledge_base.py' first.")
+        sys.exit(1)
+
+    records = collection.get(include=["documents", "metadatas", "embeddings"])
+    doc_ids = records["ids"]
+    titles = [(meta or {}).get("title", "Untitled") for meta in records["metadatas"]]
+
+    NumpyRetriever.build(
+        Config.NUMPY_INDEX_PATH,
+        doc_ids,
+        titles,
+        records["documents"],
+        records["embeddings"],
+    )
+    print(f"Exported {len(doc_ids)} chunks to '{Config.NUMPY_INDEX_PATH}'.")
+
+
+if __name__ == "__main__":
+    export_numpy_index()
@@ -0,0 +1,80 @@
+import sys
+import pathlib
+import argparse
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.config import Config
+from app.embeddings import ONNX_FILES
+
+
+def export_onnx(model_path, opset=17):
+    """
+    Exports the transformer of a local sentence-transformers model to ONNX.
+
+    Only the transformer is exported (token embeddings out); pooling and
+    normalization are applied by app.embeddings.OnnxEmbedder from the model's
+    own config. Batch and sequence dimensions are dynamic.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_path = model_path / ONNX_FILES["onnx"]
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model = AutoModel.from_pretrained(model_path)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    sample = tokenizer(["Export sample sentence."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(output_path),
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            # The dynamo exporter (the default since torch 2.9) needs onnxscript
+            # and ignores dynamic_axes; the TorchScript exporter needs neither
+            dynamo=False,
+        )
+    print(f"Exported '{model_path}' to '{output_path}'.")
+    return output_path
+
+
+def quantize_int8(model_path):
+    """Writes a dynamically quantized (int8 weights) copy of the exported graph."""
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        print(f"ERROR: int8 quantization needs the 'onnx' package ({e}).")
+        return None
+
+    input_path = model_path / ONNX_FILES["onnx"]
+    output_path = model_path / ONNX_FILES["onnx-int8"]
+    quantize_dynamic(str(input_path), str(output_path), weight_type=QuantType.QInt8)
+    size_mb = output_path.stat().st_size / 1e6
+    print(f"Quantized '{input_path}' to '{output_path}' ({size_mb:.1f} MB).")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (and int8).")
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL_NAME, help="Local model directory.")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-int8", action="store_true", help="Skip the int8 quantized copy.")
+    args = parser.parse_args()
+
+    model_path = pathlib.Path(args.model)
+    if not model_path.is_absolute():
+        model_path = PROJECT_ROOT / model_path
+    export_onnx(model_path, args.opset)
+    if not args.no_int8:
+        quantize_int8(model_path)
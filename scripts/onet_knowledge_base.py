@@ -2,23 +2,26 @@ import pandas as pd
 import json
 import re
 import pathlib
+import argparse
+from multiprocessing import Pool
 
 # File paths
 PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
 DATA_DIR = PROJECT_ROOT / "data"
 
-OCCUPATIONS_FILE_PATH = DATA_DIR / "occupations.xlsx"
-TASKS_STATEMENTS_FILE_PATH = DATA_DIR / "task_statements.xlsx"
-WORK_CONTEXT_FILE_PATH = DATA_DIR / "work_context.xlsx"
+# Parquet copies written by convert_data.py
+OCCUPATIONS_FILE_PATH = DATA_DIR / "occupations.parquet"
+TASKS_STATEMENTS_FILE_PATH = DATA_DIR / "task_statements.parquet"
+WORK_CONTEXT_FILE_PATH = DATA_DIR / "work_context.parquet"
 
-datafromdb = pd.read_excel(WORK_CONTEXT_FILE_PATH)
+ONET_KNOWLEDGE_BASE_FILE_PATH = DATA_DIR / "onet_knowledge_base.jsonl"
 
 
 def clean_text(text):
     """Clean special characters (basic) and extra whitespace in the text."""
     if not isinstance(text, str):
         return ""
-    text = re.sub(r"\s+", " ", text) 
+    text = re.sub(r"\s+", " ", text)
     return text.strip()
 
 
@@ -48,50 +51,41 @@ def chunk_text(text, max_words=200, overlap=40):
     return chunks
 
 
-def build_knowledge_base():
+def iter_occupation_documents():
     """
-    Read data from O*NET files, create a combined text document per occupation,
-    and save it into a JSON file.
+    Yield (code, title, combined_text) for every occupation, reading only the
+    columns that are needed from the Parquet files.
     """
-    try:
-        # Core occupation data (Title and Description)
-        df_occupations = pd.read_excel(
-            OCCUPATIONS_FILE_PATH, usecols=["O*NET-SOC Code", "Title", "Description"]
-        )
-        df_occupations.set_index("O*NET-SOC Code", inplace=True)
-
-        # Tasks
-        df_tasks = pd.read_excel(
-            TASKS_STATEMENTS_FILE_PATH, usecols=["O*NET-SOC Code", "Task"]
-        )
-        tasks_dict = (
-            df_tasks.groupby("O*NET-SOC Code")["Task"]
-            .apply(lambda x: " ".join(f"- {clean_text(t)}" for t in x))
-            .to_dict()
-        )
-
-        # Work Context
-        df_context = pd.read_excel(
-            WORK_CONTEXT_FILE_PATH,
-            usecols=["O*NET-SOC Code", "Element Name", "Category"],
-        )
-
-        # Group by occupation; join unique context element names
-        context_dict = (
-            df_context.groupby("O*NET-SOC Code")["Element Name"]
-            .apply(lambda x: ", ".join(x.unique()))
-            .to_dict()
-        )
-
-    except FileNotFoundError as e:
-        print(f"ERROR: Could not find data file: {e.filename}")
-        return
-
-    knowledge_base = []
-
-    for code, row in df_occupations.iterrows():
-        title = clean_text(row["Title"])
-        description = clean_text(row["Description"])
+    # Core occupation data (Title and Description)
+    df_occupations = pd.read_parquet(
+        OCCUPATIONS_FILE_PATH, columns=["O*NET-SOC Code", "Title", "Description"]
+    )
+
+    # Tasks
+    df_tasks = pd.read_parquet(
+        TASKS_STATEMENTS_FILE_PATH, columns=["O*NET-SOC Code", "Task"]
+    )
+    tasks_dict = (
+        df_tasks.groupby("O*NET-SOC Code")["Task"]
+        .apply(lambda x: " ".join(f"- {clean_text(t)}" for t in x))
+        .to_dict()
+    )
+    del df_tasks
+
+    # Work Context: group by occupation; join unique context element names
+    df_context = pd.read_parquet(
+        WORK_CONTEXT_FILE_PATH, columns=["O*NET-SOC Code", "Element Name"]
+    )
+    context_dict = (
+        df_context.groupby("O*NET-SOC Code")["Element Name"]
+        .apply(lambda x: ", ".join(x.unique()))
+        .to_dict()
+    )
+    del df_context
+
+    for code, title, description in df_occupations.itertuples(index=False):
+        title = clean_text(title)
+        description = clean_text(description)
 
         # Get tasks
         tasks = tasks_dict.get(code, "No specific tasks listed.")
@@ -106,24 +100,84 @@ def build_knowledge_base():
             f"Key Tasks:\n{tasks}\n\n"
             f"Work Environment and Context includes: {work_context}"
         )
+        yield code, title, combined_text
+
+
+def chunk_occupation(document):
+    """Turn one (code, title, combined_text) document into its knowledge-base records."""
+    code, title, combined_text = document
+    chunks = chunk_text(combined_text, max_words=200, overlap=50)
+    if not chunks:
+        chunks = [combined_text]
+
+    return [
+        {
+            "doc_id": f"{code}#{idx}",
+            "soc_code": code,
+            "title": f"{title} (Chunk {idx})",
+            "content": chunk,
+        }
+        for idx, chunk in enumerate(chunks, start=1)
+    ]
 
-        chunks = chunk_text(combined_text, max_words=200, overlap=50)
-        if not chunks:
-            chunks = [combined_text]
 
-        for idx, chunk in enumerate(chunks, start=1):
-            knowledge_base.append(
-                {
-                    "doc_id": f"{code}#{idx}",
-                    "title": f"{title} (Chunk {idx})",
-                    "content": chunk,
-                }
-            )
+def iter_knowledge_base(workers=0):
+    """
+    Yield knowledge-base records one at a time, in occupation order.
+
+    With workers > 0 the chunking step runs in a process pool; records are
+    still yielded in the same order as the single-process path.
+    """
+    documents = iter_occupation_documents()
+    if workers > 0:
+        with Pool(workers) as pool:
+            for records in pool.imap(chunk_occupation, documents, chunksize=16):
+                yield from records
+    else:
+        for document in documents:
+            yield from chunk_occupation(document)
+
+
+def iter_knowledge_base_file(path=ONET_KNOWLEDGE_BASE_FILE_PATH, batch_size=1000):
+    """Read a JSONL knowledge base back as lists of at most batch_size records."""
+    batch = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def build_knowledge_base(workers=0):
+    """
+    Read data from O*NET files, create a combined text document per occupation,
+    and stream its chunks into a JSONL file (one record per line).
+    """
+    output_filename = ONET_KNOWLEDGE_BASE_FILE_PATH
+    tmp_filename = output_filename.with_suffix(".jsonl.tmp")
+    count = 0
+    try:
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            for record in iter_knowledge_base(workers):
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    except FileNotFoundError as e:
+        tmp_filename.unlink(missing_ok=True)
+        print(f"ERROR: Could not find data file: {e.filename or e}")
+        print("Please run 'convert_data.py' first.")
+        return
 
-    output_filename = DATA_DIR / "onet_knowledge_base.json"
-    with open(output_filename, "w", encoding="utf-8") as f:
-        json.dump(knowledge_base, f, indent=2, ensure_ascii=False)
+    tmp_filename.replace(output_filename)
+    print(f"Wrote {count} knowledge base records to '{output_filename}'.")
 
 
 if __name__ == "__main__":
-    build_knowledge_base()
+    parser = argparse.ArgumentParser(description="Build the O*NET knowledge base as JSONL.")
+    parser.add_argument("--workers", type=int, default=0, help="Chunking processes (0 = in-process).")
+    args = parser.parse_args()
+    build_knowledge_base(workers=args.workers)
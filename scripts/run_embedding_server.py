@@ -0,0 +1,56 @@
+import sys
+import signal
+import pathlib
+import argparse
+
+# Make the app package importable when run as a script
+PROJECT_ROOT = pathlib.Path(__file__).parents[1].resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.config import Config
+from app.embedding_server import EmbeddingServer
+from app.embeddings import EMBEDDING_BACKENDS, load_embedding_model
+
+
+def run_server(socket_path, backend, max_batch_size, max_wait_ms):
+    """
+    Loads the embedding model once and serves it to the app workers of this
+    host over a Unix socket until interrupted.
+
+    Start it before the workers and set EMBEDDING_SERVER_SOCKET to the same
+    path for them, e.g.
+        python scripts/run_embedding_server.py --socket /tmp/occumend-embed.sock
+        EMBEDDING_SERVER_SOCKET=/tmp/occumend-embed.sock gunicorn -w 4 run:app
+    """
+    model = load_embedding_model(Config.EMBEDDING_MODEL_NAME, backend)
+    server = EmbeddingServer(socket_path, model, max_batch_size, max_wait_ms / 1000)
+    # Exit through the finally block on SIGTERM too, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(
+        f"Embedding server for '{Config.EMBEDDING_MODEL_NAME}' ({backend} backend) listening on "
+        f"'{socket_path}', batches of up to {max_batch_size} texts, {max_wait_ms:g} ms max wait."
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.batcher.stats()
+        print(
+            f"Embedding server stopped after {stats['requests']} requests in {stats['batches']} "
+            f"batches (mean batch size {stats['mean_batch_size']:.1f})."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the embedding model to all app workers over a Unix socket.")
+    parser.add_argument(
+        "--socket", default=Config.EMBEDDING_SERVER_SOCKET or "/tmp/occumend-embed.sock",
+        help="Unix socket path (EMBEDDING_SERVER_SOCKET for the workers).",
+    )
+    parser.add_argument("--backend", default=Config.EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--max-batch-size", type=int, default=Config.EMBEDDING_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=Config.EMBEDDING_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+    run_server(args.socket, args.backend, args.max_batch_size, args.max_wait_ms)
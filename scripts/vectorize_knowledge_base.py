@@ -1,48 +1,254 @@
+import sys
 import pathlib
-import json
+import time
+import hashlib
+import argparse
 import chromadb
-from sentence_transformers import SentenceTransformer
+from onet_knowledge_base import ONET_KNOWLEDGE_BASE_FILE_PATH, iter_knowledge_base_file
 
 # File paths
 SCRIPT_DIR = pathlib.Path(__file__).parent.resolve()
 PROJECT_ROOT = SCRIPT_DIR.parent
-ONET_KNOWLEDGE_BASE_FILE_PATH = PROJECT_ROOT / "data" / "onet_knowledge_base.json"
 CHROMA_DB_PATH = PROJECT_ROOT / "data" / "chroma_db"
+LEXICAL_INDEX_PATH = PROJECT_ROOT / "data" / "bm25_index"
 
+# Make the app package importable when run as a script
+sys.path.insert(0, str(PROJECT_ROOT))
+from app.config import Config
+from app.embeddings import EMBEDDING_BACKENDS, load_embedding_model
+from app.lexical import BM25Index
+from app.services import publish_collection, read_collection_pointer
 
-def vectorize_and_store():
+COLLECTION_NAME = Config.ONET_COLLECTION_NAME
+# Names left behind by the earlier staging-and-rename swap
+LEGACY_COLLECTION_NAMES = (f"{COLLECTION_NAME}__staging", f"{COLLECTION_NAME}__retired")
+MODEL_NAME = "all-MiniLM-L6-v2"
+# The ONNX backends load the graphs exported into the local model directory
+ONNX_MODEL_PATH = PROJECT_ROOT / Config.EMBEDDING_MODEL_NAME
+
+# Chroma caps the size of a single add/get call, so everything is done in batches
+WRITE_BATCH_SIZE = 1000
+
+
+def content_hash(doc, model_name=MODEL_NAME):
+    """Fingerprint of everything that determines a chunk's stored embedding and metadata."""
+    digest = hashlib.sha256()
+    for part in (model_name, doc["title"], doc["content"]):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def embedding_key(backend):
+    """Model identity used in content hashes; a different backend re-embeds every chunk."""
+    return MODEL_NAME if backend == "torch" else f"{MODEL_NAME}:{backend}"
+
+
+def chunk_metadata(doc_id, title, doc_hash):
+    """Metadata stored with every chunk; soc_code lets /chat filter to recommended occupations."""
+    return {"title": title, "soc_code": doc_id.split("#", 1)[0], "content_hash": doc_hash}
+
+
+def _batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _existing_hashes(client, live_name):
     """
-    Reads the knowledge base, converts texts to vectors, and stores them in ChromaDB.
+    Returns the live collection (or None), its {doc_id: content_hash} map and
+    the number of chunks whose metadata predates the current chunk_metadata.
     """
-    client = chromadb.PersistentClient(path=str(CHROMA_DB_PATH))
-
-    collection_name = "onet_data"
     existing_collections = {col.name for col in client.list_collections()}
-    if collection_name in existing_collections:
-        client.delete_collection(collection_name)
-    collection = client.create_collection(collection_name)
+    if live_name not in existing_collections:
+        return None, {}, 0
+    collection = client.get_collection(live_name)
+    hashes = {}
+    stale_metadata = 0
+    total = collection.count()
+    for offset in range(0, total, WRITE_BATCH_SIZE):
+        records = collection.get(include=["metadatas"], limit=WRITE_BATCH_SIZE, offset=offset)
+        for doc_id, meta in zip(records["ids"], records["metadatas"]):
+            meta = meta or {}
+            hashes[doc_id] = meta.get("content_hash")
+            stale_metadata += "soc_code" not in meta
+    return collection, hashes, stale_metadata
+
+
+def _copy_unchanged(live_collection, staging_collection, doc_ids):
+    """
+    Copies stored embeddings for unchanged chunks, so they are not re-encoded.
+    Metadata is rewritten, which upgrades chunks stored by older versions.
+    """
+    for batch_ids in _batched(doc_ids, WRITE_BATCH_SIZE):
+        records = live_collection.get(
+            ids=batch_ids, include=["documents", "metadatas", "embeddings"]
+        )
+        staging_collection.add(
+            ids=records["ids"],
+            documents=records["documents"],
+            metadatas=[
+                chunk_metadata(doc_id, meta.get("title", "Untitled"), meta.get("content_hash"))
+                for doc_id, meta in zip(records["ids"], records["metadatas"])
+            ],
+            embeddings=records["embeddings"],
+        )
+
+
+def _encode_changed(embedding_model, staging_collection, documents, batch_size, pool):
+    """Encodes one batch of new or changed chunks and upserts them."""
+    # Only sentence-transformers has a multi-process pool; ONNX Runtime uses all cores itself
+    pool_kwargs = {"pool": pool} if pool is not None else {}
+    vectors = embedding_model.encode(
+        [doc["content"] for doc in documents],
+        batch_size=batch_size,
+        **pool_kwargs,
+    )
+    staging_collection.upsert(
+        ids=[doc["doc_id"] for doc in documents],
+        documents=[doc["content"] for doc in documents],
+        metadatas=[chunk_metadata(doc["doc_id"], doc["title"], doc["hash"]) for doc in documents],
+        embeddings=vectors.tolist(),
+    )
+
 
-    model_name = "all-MiniLM-L6-v2"
-    embedding_model = SentenceTransformer(model_name)
+def _drop_unpublished(client, pointer):
+    """Deletes versions a failed run created but never published."""
+    kept = {pointer["name"], *pointer["previous"]}
+    for collection in client.list_collections():
+        name = collection.name
+        unpublished = name.startswith(f"{COLLECTION_NAME}__v") and name not in kept
+        if unpublished or name in LEGACY_COLLECTION_NAMES:
+            client.delete_collection(name)
 
+
+def _read_batches(knowledge_base_file, existing_hashes, full, model_key=MODEL_NAME):
+    """Streams the knowledge base, yielding (unchanged_ids, changed_docs) per batch."""
+    for batch in iter_knowledge_base_file(knowledge_base_file, batch_size=WRITE_BATCH_SIZE):
+        unchanged_ids, changed = [], []
+        for doc in batch:
+            doc["hash"] = content_hash(doc, model_key)
+            if not full and existing_hashes.get(doc["doc_id"]) == doc["hash"]:
+                unchanged_ids.append(doc["doc_id"])
+            else:
+                changed.append(doc)
+        yield unchanged_ids, changed
+
+
+def build_lexical_index(knowledge_base_file=ONET_KNOWLEDGE_BASE_FILE_PATH):
+    """Writes the BM25 index over the same chunks, streamed from the JSONL file."""
+    start = time.perf_counter()
+    records = (
+        doc
+        for batch in iter_knowledge_base_file(knowledge_base_file, batch_size=WRITE_BATCH_SIZE)
+        for doc in batch
+    )
+    manifest = BM25Index.build(LEXICAL_INDEX_PATH, records)
+    print(
+        f"BM25 index with {manifest['documents']} chunks and {manifest['terms']} terms "
+        f"written to '{LEXICAL_INDEX_PATH}' in {time.perf_counter() - start:.1f}s."
+    )
+
+
+def vectorize_and_store(batch_size=64, workers=0, full=False, backend="torch", keep_previous=1):
+    """
+    Reads the knowledge base and brings the ChromaDB collection up to date.
+
+    Each chunk is stored with a content hash. Only chunks whose hash is new or
+    different are re-embedded; unchanged chunks keep their stored vectors and
+    chunks that no longer exist are dropped. The result is written to a new
+    versioned collection and published through the collection pointer once
+    complete, so the app never sees a partial index. The replaced version is
+    kept until the next run, so workers that have not reloaded yet keep
+    answering; their retriever follows the pointer if it is gone.
+    The BM25 index used for hybrid retrieval is rebuilt from the same chunks.
+
+    The JSONL knowledge base is streamed twice in bounded batches: once to
+    find what changed and once to write it, so memory does not grow with
+    the size of the knowledge base.
+
+    Args:
+        batch_size (int): Sentences per forward pass of the embedding model.
+        workers (int): Encoder processes; 0 encodes in this process.
+        full (bool): Re-embed every chunk regardless of stored hashes.
+        backend (str): Embedding backend, one of app.embeddings.EMBEDDING_BACKENDS.
+        keep_previous (int): Replaced versions to keep for running workers.
+    """
     knowledge_base_file = ONET_KNOWLEDGE_BASE_FILE_PATH
-    try:
-        with open(knowledge_base_file, "r", encoding="utf-8") as f:
-            documents = json.load(f)
-    except FileNotFoundError:
+    if not knowledge_base_file.exists():
         print(f"ERROR: Knowledge base file not found at '{knowledge_base_file}'.")
         print("Please run 'onet_knowledge_base.py' first.")
         return
 
-    doc_contents = [doc["content"] for doc in documents]
-    doc_ids = [doc["doc_id"] for doc in documents]
-    titles = [doc["title"] for doc in documents]
-    vectors = embedding_model.encode(doc_contents).tolist()
+    client = chromadb.PersistentClient(path=str(CHROMA_DB_PATH))
+    pointer = read_collection_pointer(CHROMA_DB_PATH, COLLECTION_NAME)
+    live_collection, existing_hashes, stale_metadata = _existing_hashes(client, pointer["name"])
+
+    current_ids = set()
+    n_changed = 0
+    model_key = embedding_key(backend)
+    for unchanged_ids, changed in _read_batches(knowledge_base_file, existing_hashes, full, model_key):
+        current_ids.update(unchanged_ids)
+        current_ids.update(doc["doc_id"] for doc in changed)
+        n_changed += len(changed)
+    removed = sum(1 for doc_id in existing_hashes if doc_id not in current_ids)
+
+    if live_collection is not None and not n_changed and not removed and not stale_metadata:
+        print(f"Collection '{pointer['name']}' is up to date ({len(current_ids)} chunks).")
+        if not LEXICAL_INDEX_PATH.exists():
+            build_lexical_index(knowledge_base_file)
+        return
+
+    _drop_unpublished(client, pointer)
+    staging_collection = client.create_collection(f"{COLLECTION_NAME}__v{pointer['version'] + 1}")
+
+    embedding_model = None
+    if n_changed:
+        embedding_model = load_embedding_model(
+            MODEL_NAME if backend == "torch" else ONNX_MODEL_PATH, backend
+        )
+    use_pool = n_changed and workers > 0 and backend == "torch"
+    pool = embedding_model.start_multi_process_pool(["cpu"] * workers) if use_pool else None
+    elapsed = 0.0
+    try:
+        for unchanged_ids, changed in _read_batches(knowledge_base_file, existing_hashes, full, model_key):
+            if unchanged_ids:
+                _copy_unchanged(live_collection, staging_collection, unchanged_ids)
+            if changed:
+                start = time.perf_counter()
+                _encode_changed(embedding_model, staging_collection, changed, batch_size, pool)
+                elapsed += time.perf_counter() - start
+    finally:
+        if pool is not None:
+            embedding_model.stop_multi_process_pool(pool)
+
+    pointer = publish_collection(
+        client, CHROMA_DB_PATH, COLLECTION_NAME, staging_collection.name, keep_previous=keep_previous
+    )
 
-    metadatas = [{"title": title} for title in titles]
-    collection.add(ids=doc_ids, documents=doc_contents, metadatas=metadatas, embeddings=vectors)
-    print(f"Inserted {len(documents)} documents into ChromaDB.")
+    throughput = f"{n_changed / elapsed:.1f} chunks/s" if elapsed else "n/a"
+    print(
+        f"Collection '{pointer['name']}' published: {n_changed} embedded, "
+        f"{len(current_ids) - n_changed} reused, {removed} removed ({backend}, {throughput})."
+    )
+    build_lexical_index(knowledge_base_file)
 
 
 if __name__ == "__main__":
-    vectorize_and_store()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Incrementally vectorize the O*NET knowledge base.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Sentences per encode batch.")
+    parser.add_argument("--workers", type=int, default=0, help="Encoder processes (0 = in-process).")
+    parser.add_argument("--full", action="store_true", help="Re-embed every chunk.")
+    parser.add_argument(
+        "--backend", choices=EMBEDDING_BACKENDS, default=Config.EMBEDDING_BACKEND,
+        help="Embedding backend (defaults to EMBEDDING_BACKEND).",
+    )
+    parser.add_argument(
+        "--keep-previous", type=int, default=1,
+        help="Replaced collection versions to keep for workers that have not reloaded.",
+    )
+    args = parser.parse_args()
+    vectorize_and_store(
+        batch_size=args.batch_size, workers=args.workers, full=args.full, backend=args.backend,
+        keep_previous=args.keep_previous,
+    )
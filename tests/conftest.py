@@ -2,17 +2,35 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
-from app import app as flask_app 
+from app import create_app
+from app.config import Config
 
-@pytest.fixture
-def app():
-    """Create and configure a new app instance for each test."""
-    flask_app.config.update({
-        "TESTING": True,
-    })
+
+class TestConfig(Config):
+    """Serves both roles without external services: charts render inline and no LLM key is set."""
+    TESTING = True
+    APP_ROLE = "all"
+    OPEN_ROUTER_API_KEY = None
+    CHART_RENDER_WORKERS = 0
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """One app instance for the test session; chat tests patch its clients per test."""
+    tmp_path = tmp_path_factory.mktemp("app")
+
+    class SessionConfig(TestConfig):
+        # Keep the chat subsystem away from on-disk indexes and the vector database
+        RETRIEVER_BACKEND = "numpy"
+        NUMPY_INDEX_PATH = tmp_path / "vector_index"
+        LEXICAL_INDEX_PATH = tmp_path / "bm25_index"
+
+    flask_app = create_app(SessionConfig)
     yield flask_app
+    flask_app.chart_renderer.shutdown()
+
 
 @pytest.fixture
 def client(app):
     """A test client for the app."""
-    return app.test_client()
\ No newline at end of file
+    return app.test_client()
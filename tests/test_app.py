@@ -1,53 +1,81 @@
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
 import pytest
-from unittest.mock import MagicMock, patch
-from app import calculate_scores
+from unittest.mock import MagicMock
+from app.competencies import CompetencyIndex
+from app.recommender import RIASEC_KEYS, RecommendationEngine, profile_from_answers
 
-def test_calculate_scores_all_neutral():
+
+def test_profile_from_answers_all_neutral():
     """
     Tests that when the user answers "Neutral" (3) to all questions,
     the score for all categories should be 3.0.
     """
-    # Create mock form data as if all 48 questions are answered with 3 (q0 to q47).
-    mock_form_data = {f"q{i}": "3" for i in range(48)}
-    
-    # Calculate scores
-    scores = calculate_scores(mock_form_data)
-    
-    # Expected result: Average should be 3.0 for each category
-    expected_scores = {
-        'R': 3.0, 'I': 3.0, 'A': 3.0,
-        'S': 3.0, 'E': 3.0, 'C': 3.0
-    }
-    
-    # Check if the result is as expected
-    assert scores == expected_scores
+    answers = {key: [3] * 8 for key in RIASEC_KEYS}
+
+    profile = profile_from_answers(answers)
 
-def test_calculate_scores_max_realistic():
+    assert profile.tolist() == [3.0] * 6
+
+
+def test_profile_from_answers_max_realistic():
     """
     Tests that when the user answers "Like Very Much" (5) to all Realistic questions,
     and "Dislike Very Much" (1) to all other questions,
     the Realistic score should be 5.0 and others should be 1.0.
     """
-    mock_form_data = {}
-    # Give 5 to Realistic questions (first 8 questions, q0-q7)
-    for i in range(8):
-        mock_form_data[f"q{i}"] = "5"
-    
-    # Give 1 to all other questions (q8-q47)
-    for i in range(8, 48):
-        mock_form_data[f"q{i}"] = "1"
+    answers = {key: [1] * 8 for key in RIASEC_KEYS}
+    answers["R"] = [5] * 8
 
-    scores = calculate_scores(mock_form_data)
+    profile = profile_from_answers(answers)
 
-    expected_scores = {
-        'R': 5.0, 'I': 1.0, 'A': 1.0,
-        'S': 1.0, 'E': 1.0, 'C': 1.0
-    }
+    assert profile.tolist() == [5.0, 1.0, 1.0, 1.0, 1.0, 1.0]
+
+
+def _engine(job_matrix, **kwargs):
+    n_rows = len(job_matrix)
+    labels = [str(row) for row in range(n_rows)]
+    return RecommendationEngine(
+        job_matrix, labels, labels, labels,
+        CompetencyIndex.empty(n_rows), CompetencyIndex.empty(n_rows), CompetencyIndex.empty(n_rows),
+        **kwargs,
+    )
+
+
+def test_cluster_search_probing_every_cluster_matches_exact():
+    """
+    Tests that the two-stage search returns exactly the exact top-k when
+    every cluster is probed.
+    """
+    rng = np.random.default_rng(0)
+    job_matrix = rng.uniform(1, 7, size=(500, 6))
+    exact = _engine(job_matrix)
+    pruned = _engine(job_matrix, search_clusters=8, search_probes=8)
+
+    for user_vector in rng.uniform(1, 5, size=(20, 6)):
+        exact_rows, exact_scores = exact.top_k(user_vector, k=20)
+        rows, scores = pruned.top_k(user_vector, k=20)
+        assert rows.tolist() == exact_rows.tolist()
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+def test_cluster_search_falls_back_to_exact_for_small_clusters():
+    """
+    Tests that a query whose probed clusters hold fewer than k occupations
+    is answered by exact search.
+    """
+    rng = np.random.default_rng(1)
+    job_matrix = rng.uniform(1, 7, size=(60, 6))
+    exact = _engine(job_matrix)
+    pruned = _engine(job_matrix, search_clusters=30, search_probes=1)
+    user_vector = np.array([4.0, 2.0, 3.0, 1.0, 5.0, 2.0])
 
-    assert scores == expected_scores
+    assert pruned.probe(user_vector, k=20) is None
+    assert pruned.top_k(user_vector, k=20)[0].tolist() == exact.top_k(user_vector, k=20)[0].tolist()
+    assert pruned.top_k_many(np.tile(user_vector, (3, 1)), k=20)[0].shape == (3, 20)
 
 
 def test_home_page(client):
@@ -56,72 +84,590 @@ def test_home_page(client):
     """
     response = client.get('/')
     assert response.status_code == 200
-    assert b"Career Interest Survey" in response.data # Check if the page title exists in the HTML
+    assert b"Career Recommendation Engine" in response.data  # Check if the page title exists in the HTML
+
 
 def test_recommend_endpoint_basic(client):
     """
     Tests whether a basic request to the /recommend endpoint is successful.
-    This test does not check the database or AI part yet, it only verifies if the endpoint works.
     """
-    # Send data as if all answers are "Neutral"
-    mock_form_data = {f"q{i}": "3" for i in range(48)}
+    answers = {key: [3] * 8 for key in RIASEC_KEYS}
+
+    response = client.post('/recommend', json=answers)
 
-    response = client.post('/recommend', json=mock_form_data)
-    
     assert response.status_code == 200
     assert response.is_json
-    
+
     json_data = response.get_json()
-    
+
     # Check for actual keys
-    assert 'recommendations' in json_data
-    assert 'chart_images' in json_data
+    assert len(json_data['recommendations']) == 20
+    assert set(json_data['chart_images']) == {"radar", "bar"}
 
 
-def test_chat_endpoint_with_code(client):
+def test_recommend_endpoint_chart_spec(client):
     """
-    Tests the original /chat function by mocking both LLM and database calls.
+    Tests that chart_format=spec returns chart data instead of images.
     """
-    # Prepare fake API and Database responses
-    mock_llm_response_content = "This is the final AI answer."
+    answers = {key: [1] * 8 for key in RIASEC_KEYS}
+    answers["I"] = [5] * 8
+
+    response = client.post('/recommend?chart_format=spec&competency_top_n=2', json=answers)
+
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert 'chart_images' not in json_data
+    assert json_data['chart_spec']['radar']['values'] == [1.0, 5.0, 1.0, 1.0, 1.0, 1.0]
+    first = json_data['recommendations'][0]
+    assert first['soc_code']
+    assert len(first['knowledge']) <= 2
+
+
+def test_recommend_rejects_unknown_chart_format(client):
+    response = client.post('/recommend?chart_format=gif', json={key: [3] * 8 for key in RIASEC_KEYS})
+
+    assert response.status_code == 400
+
+
+def test_recommend_batch_json_body(client):
+    """
+    Tests that /recommend/batch scores a JSON list of answer sets in input
+    order, with the same results as /recommend and an error row for an
+    invalid entry.
+    """
+    investigative = {key: [1] * 8 for key in RIASEC_KEYS}
+    investigative["I"] = [5] * 8
+    neutral = {key: [3] * 8 for key in RIASEC_KEYS}
+
+    response = client.post('/recommend/batch', json={
+        "profiles": [dict(investigative, id="a"), "not an answer set", dict(neutral, id="c")],
+        "top_k": 3,
+    })
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row["index"], row["id"]) for row in rows] == [(0, "a"), (1, None), (2, "c")]
+    assert rows[1]["error"] == "Answer set must be a JSON object."
+    assert len(rows[0]["recommendations"]) == 3
+    single = client.post('/recommend', json=investigative).get_json()
+    assert [rec["Title"] for rec in rows[0]["recommendations"]] == [
+        rec["Title"] for rec in single["recommendations"][:3]
+    ]
+    assert client.post('/recommend/batch', json={"top_k": 3}).status_code == 400
+
+
+def test_recommend_batch_ndjson_body_reports_malformed_lines(client):
+    """
+    Tests the NDJSON body: options come from the query string, blank lines
+    are skipped and malformed or invalid lines get per-item error rows.
+    """
+    neutral = {key: [3] * 8 for key in RIASEC_KEYS}
+    non_numeric = dict(neutral, R=["often", "never"])
+    body = "\n".join([
+        json.dumps(dict(neutral, id="ok")),
+        "{not json",
+        "",
+        json.dumps(dict(non_numeric, id="words")),
+    ]) + "\n"
+
+    response = client.post(
+        '/recommend/batch?top_k=2', data=body, content_type='application/x-ndjson'
+    )
+
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["index"] for row in rows] == [0, 1, 2]
+    assert rows[0]["id"] == "ok" and len(rows[0]["recommendations"]) == 2
+    assert rows[1] == {"index": 1, "id": None, "error": "Answer set must be a JSON object."}
+    assert rows[2]["id"] == "words" and rows[2]["error"].startswith("Invalid answer set")
+
+
+def test_chart_renderer_caches_and_falls_back_inline(monkeypatch):
+    """
+    Tests that ChartRenderer renders inline with max_workers=0, serves
+    repeated charts from its cache, and renders inline when the pool does
+    not answer in time.
+    """
+    from concurrent.futures import Future
+    from app import visualizations
+
+    rendered = []
+    monkeypatch.setattr(visualizations, "_render_radar", lambda key, chart_format: rendered.append("radar") or "<radar>")
+    monkeypatch.setattr(visualizations, "_render_bar", lambda key, chart_format: rendered.append("bar") or "<bar>")
+    recommendations = [{"Title": "Actuaries", "similarity": 0.9}]
+
+    inline = visualizations.ChartRenderer(max_workers=0)
+    assert inline.render([3.0] * 6, recommendations, "svg") == {"radar": "<radar>", "bar": "<bar>"}
+    assert inline.render([3.0] * 6, recommendations, "svg") == {"radar": "<radar>", "bar": "<bar>"}
+    assert rendered == ["radar", "bar"]
+    assert inline.cache_info()["hits"] == 2
+
+    class HungPool:
+        def submit(self, fn, *args):
+            return Future()  # never completes
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    pooled = visualizations.ChartRenderer(max_workers=1, timeout=0.05)
+    pooled._pool, pooled._pool_pid = HungPool(), os.getpid()
+    assert pooled.render([3.0] * 6, recommendations, "svg") == {"radar": "<radar>", "bar": "<bar>"}
+    assert pooled._pool is None
+    assert rendered == ["radar", "bar", "radar", "bar"]
+
+
+def _render_hangs_in_worker(key, chart_format):
+    """Renders inline at once but never returns in a renderer worker process."""
+    import multiprocessing
+    import time
+
+    if multiprocessing.parent_process() is not None:
+        time.sleep(600)
+    return "<chart>"
+
+
+def test_chart_renderer_terminates_hung_workers(monkeypatch):
+    """
+    Tests that a pool discarded after a timeout takes its hung worker
+    processes down with it and that the next render starts a new pool.
+    """
+    from app import visualizations
+
+    monkeypatch.setattr(visualizations, "_render_radar", _render_hangs_in_worker)
+    monkeypatch.setattr(visualizations, "_render_bar", _render_hangs_in_worker)
+    renderer = visualizations.ChartRenderer(max_workers=1, timeout=1)
+    try:
+        pool = renderer._get_pool()
+        pool.submit(visualizations._warm_up).result()
+        workers = list(pool._processes.values())
+
+        images = renderer.render([3.0] * 6, [{"Title": "Actuaries", "similarity": 0.9}], "svg")
+
+        assert images == {"radar": "<chart>", "bar": "<chart>"}
+        for worker in workers:
+            worker.join(timeout=10)
+        assert workers and not any(worker.is_alive() for worker in workers)
+        assert renderer._get_pool() is not pool
+    finally:
+        renderer.shutdown()
+
+
+def _knowledge_base_hits(code, title, text):
+    """Chunks text the way onet_knowledge_base.py does and returns them as retrieval hits."""
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+    from onet_knowledge_base import chunk_occupation
+
+    return [
+        {"doc_id": record["doc_id"], "title": record["title"], "document": record["content"], "score": 0.0}
+        for record in chunk_occupation((code, title, text))
+    ]
+
+
+def test_pack_context_merges_consecutive_chunks():
+    """
+    Tests that consecutive overlapping chunks are merged back into the
+    original text under a "Chunks i-j" label, that separate chunks keep their
+    own labels, and the token stats.
+    """
+    from app.context import SEGMENT_SEPARATOR, count_tokens, pack_context
+
+    text = " ".join(f"word{i}" for i in range(500))
+    developer_hits = _knowledge_base_hits("15-1252.00", "Software Developers", text)
+    other_hits = _knowledge_base_hits("11-1011.00", "Chief Executives", text)
+    assert len(developer_hits) == 3
+    # Ranked out of order, with a gap between the Chief Executives chunks
+    hits = [developer_hits[1], other_hits[2], developer_hits[0], other_hits[0], developer_hits[2]]
+
+    context, sources, stats = pack_context(hits)
+
+    segments = context.split(SEGMENT_SEPARATOR)
+    assert segments[0] == f"Software Developers (Chunks 1-3): {text}"
+    assert segments[1].startswith("Chief Executives (Chunk 3): ")
+    assert segments[2].startswith("Chief Executives (Chunk 1): ")
+    assert sources == [
+        "Software Developers (Chunk 1)", "Software Developers (Chunk 2)", "Software Developers (Chunk 3)",
+        "Chief Executives (Chunk 3)", "Chief Executives (Chunk 1)",
+    ]
+    unpacked = SEGMENT_SEPARATOR.join(f"{hit['title']}: {hit['document']}" for hit in hits)
+    assert stats == {
+        "tokens_sent": count_tokens(context),
+        "tokens_saved": count_tokens(unpacked) - count_tokens(context),
+        "tokens_dropped": 0,
+        "segments": 3,
+    }
+
+
+def test_pack_context_truncates_to_token_budget():
+    """
+    Tests that the best segment is cut at a word boundary to fit the budget
+    and that segments without useful room left are dropped.
+    """
+    from app.context import count_tokens, pack_context
+
+    text = " ".join(f"word{i}" for i in range(500))
+    hits = _knowledge_base_hits("15-1252.00", "Software Developers", text)[:1]
+    hits += _knowledge_base_hits("11-1011.00", "Chief Executives", text)[:1]
+
+    context, sources, stats = pack_context(hits, token_budget=100)
+
+    assert context.startswith("Software Developers (Chunk 1): word0 word1")
+    assert count_tokens(context) <= 100
+    assert sources == ["Software Developers (Chunk 1)"]
+    full_tokens = count_tokens(pack_context(hits)[0])
+    assert stats == {
+        "tokens_sent": count_tokens(context),
+        "tokens_saved": 0,
+        "tokens_dropped": full_tokens - count_tokens(context),
+        "segments": 1,
+    }
+
+
+@pytest.fixture
+def chat_app(app, monkeypatch):
+    """The session app with a mocked LLM client, embedding model and retriever."""
     mock_llm_response = MagicMock()
     mock_llm_response.choices = [MagicMock()]
-    mock_llm_response.choices[0].message = MagicMock()
-    mock_llm_response.choices[0].message.content = mock_llm_response_content
+    mock_llm_response.choices[0].message.content = "This is the final AI answer."
+    llm_client = MagicMock()
+    llm_client.chat.completions.create.return_value = mock_llm_response
 
-    mock_db_results = {
-        "documents": [
-            ["Doc 1: Info about marketing.", "Doc 2: Info about sales."]
-        ]
-    }
+    embedding_model = MagicMock()
+    embedding_model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 4), dtype=np.float32)
 
-    # Set up patches (objects to be mocked)
-    with patch('app.llm_client') as mock_llm, \
-         patch('app.onet_collection') as mock_db:
+    retriever = MagicMock()
+    retriever.query.return_value = [
+        {"doc_id": "11-2021.00#1", "title": "Marketing Managers (Chunk 1)", "document": "Doc 1: Info about marketing.", "score": 0.9},
+        {"doc_id": "41-4012.00#1", "title": "Sales Representatives (Chunk 1)", "document": "Doc 2: Info about sales.", "score": 0.8},
+    ]
 
-        # Set what the fake objects' methods should return
-        mock_llm.chat.completions.create.return_value = mock_llm_response
-        mock_db.query.return_value = mock_db_results
+    monkeypatch.setattr(app, "llm_client", llm_client)
+    monkeypatch.setattr(app, "embedding_model", embedding_model)
+    monkeypatch.setattr(app, "retriever", retriever)
+    monkeypatch.setattr(app, "lexical_index", None)
+    return app
 
-        # Send request with correct JSON data as expected by the original code
+
+def test_chat_endpoint(chat_app):
+    """
+    Tests the /chat function by mocking the LLM, the embedding model and the retriever.
+    """
+    response = chat_app.test_client().post('/chat', json={
+        'question': 'Tell me about marketing jobs.',
+        'profile_summary': 'R:4.5, I:3.2, A:2.1, S:4.8, E:3.9, C:4.1',
+    })
+
+    response_data = response.get_json()
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}. Data: {response_data}"
+    assert response_data['answer'] == "This is the final AI answer."
+
+    chat_app.retriever.query.assert_called_once()
+    assert chat_app.retriever.query.call_args.kwargs["n_results"] == chat_app.config["CONTEXT_MAX_CHUNKS"]
+    chat_app.llm_client.chat.completions.create.assert_called_once()
+    prompt = json.dumps(chat_app.llm_client.chat.completions.create.call_args.kwargs["messages"])
+    assert "Info about marketing" in prompt
+
+
+def _sse_events(response):
+    """Parses a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for frame in response.get_data(as_text=True).split("\n\n"):
+        if frame:
+            event_line, data_line = frame.split("\n")
+            assert event_line.startswith("event: ") and data_line.startswith("data: ")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_chat_stream_sends_sse_frames(chat_app):
+    """
+    Tests that /chat with stream on sends the sources first, one token event
+    per content delta, and ends with "done", or "error" if the upstream
+    stream fails.
+    """
+    from types import SimpleNamespace
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    chat_app.llm_client.chat.completions.create.return_value = iter(
+        [chunk("Marketing "), SimpleNamespace(choices=[]), chunk(None), chunk("fits you.")]
+    )
+    body = {'question': 'Tell me about marketing jobs.', 'profile_summary': 'E:4.5', 'stream': True}
+
+    response = chat_app.test_client().post('/chat', json=body)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _sse_events(response)
+    assert events[0] == ("sources", {"sources": ["Marketing Managers (Chunk 1)", "Sales Representatives (Chunk 1)"]})
+    assert events[1:3] == [("token", {"text": "Marketing "}), ("token", {"text": "fits you."})]
+    assert events[-1][0] == "done" and set(events[-1][1]) == {"ttft", "total"}
+    assert len(events) == 4
+    assert chat_app.llm_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+    def broken_stream():
+        yield chunk("Marketing ")
+        raise ConnectionError("upstream closed")
+
+    chat_app.llm_client.chat.completions.create.return_value = broken_stream()
+    events = _sse_events(chat_app.test_client().post('/chat?stream=1', json=dict(body, stream=False)))
+    assert [event for event, _ in events] == ["sources", "token", "error"]
+
+
+def test_async_chat_coalesces_identical_questions(chat_app, monkeypatch):
+    """
+    Tests that the ASGI /chat path answers concurrent identical questions
+    with a single upstream LLM call, while a different question gets its own.
+    """
+    import asyncio
+    from types import SimpleNamespace
+    from app.async_chat import create_asgi_app
+
+    monkeypatch.setitem(chat_app.config, "OPEN_ROUTER_API_KEY", "test-key")
+    application = create_asgi_app(chat_app)
+    upstream_questions = []
+
+    async def create(**kwargs):
+        upstream_questions.append(kwargs["messages"][-1]["content"])
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Shared answer."))])
+
+    application.chat_service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    async def post_chat(question):
+        messages = []
+
+        async def receive():
+            body = json.dumps({'question': question, 'profile_summary': 'E:4.5'}).encode()
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/chat", "query_string": b"", "headers": []}
+        await application(scope, receive, send)
+        return messages[0]["status"], json.loads(b"".join(m.get("body", b"") for m in messages[1:]))
+
+    async def main():
+        same = [post_chat("What does a marketing manager do?") for _ in range(5)]
+        return await asyncio.gather(*same, post_chat("What does a nurse do?"))
+
+    responses = asyncio.run(main())
+
+    assert responses == [(200, {"answer": "Shared answer."})] * 6
+    assert len(upstream_questions) == 2
+    assert application.chat_service.coalesced == 4
+
+
+def test_chat_endpoint_requires_question(chat_app):
+    response = chat_app.test_client().post('/chat', json={'profile_summary': 'R:4.5'})
+
+    assert response.status_code == 400
+
+
+def test_chat_endpoint_rejects_invalid_soc_codes(chat_app):
+    response = chat_app.test_client().post('/chat', json={
+        'question': 'Tell me about marketing jobs.',
+        'profile_summary': 'R:4.5',
+        'soc_codes': 'not-a-list',
+    })
+
+    assert response.status_code == 400
+
+
+def test_chat_session_reuses_retrieval_and_summarizes_turns(chat_app, monkeypatch):
+    """
+    Tests that a follow-up in the same session reuses the retrieved chunks
+    without a search, sends a summary of the earlier turn, and that a new
+    topic searches again.
+    """
+    from app.cache import LRUCache
+    from benchmarks.synthetic import HashingEmbedder
+
+    # A fresh cache, so no vectors of the mock model from other tests are reused
+    monkeypatch.setattr(chat_app, "embedding_cache", LRUCache())
+    monkeypatch.setattr(chat_app, "embedding_model", HashingEmbedder())
+    client = chat_app.test_client()
+    retrievals = dict(chat_app.chat_sessions.retrievals)
+
+    def ask(question):
         response = client.post('/chat', json={
-            'question': 'Tell me about marketing jobs.',
-            'profile_summary': 'R:4.5, I:3.2, A:2.1, S:4.8, E:3.9, C:4.1'
+            'question': question,
+            'profile_summary': 'R:4.5, I:3.2, A:2.1, S:4.8, E:3.9, C:4.1',
+            'session_id': 'test-session-reuse',
         })
+        assert response.status_code == 200, response.get_json()
+        return json.dumps(chat_app.llm_client.chat.completions.create.call_args.kwargs["messages"])
+
+    first_prompt = ask('Tell me about marketing jobs.')
+    second_prompt = ask('Tell me about marketing jobs?')
+    assert chat_app.retriever.query.call_count == 1
+    assert "EARLIER IN THIS CONVERSATION" not in first_prompt
+    assert "Q: Tell me about marketing jobs. A: This is the final AI answer." in second_prompt
+
+    ask('What do sales representatives earn?')
+    assert chat_app.retriever.query.call_count == 2
+    outcomes = {key: value - retrievals[key] for key, value in chat_app.chat_sessions.retrievals.items()}
+    assert outcomes == {"new": 1, "reused": 1, "extended": 1}
+
+
+def test_chat_session_keeps_only_recent_turns():
+    """Tests that a session keeps a bounded number of question vectors and turns."""
+    from app.sessions import ChatSession
+
+    session = ChatSession(max_turns=3)
+    for i in range(10):
+        session.extend([], np.full(4, i + 1.0, dtype=np.float32), max_chunks=16)
+        session.add_turn(f"Question {i}?", f"Answer {i}.")
+
+    assert len(session.query_vectors) == 3
+    assert len(session.turns) == 3
+    summary = session.summary()
+    assert summary.startswith("(7 earlier turns omitted)")
+    assert "Question 9?" in summary and "Question 6?" not in summary
+
+
+def test_chat_rejects_invalid_session_id(chat_app):
+    response = chat_app.test_client().post('/chat', json={
+        'question': 'Tell me about marketing jobs.',
+        'profile_summary': 'R:4.5',
+        'session_id': 'bad id!',
+    })
+
+    assert response.status_code == 400
+
+
+def test_recommend_sets_server_timing(client):
+    response = client.post('/recommend?chart_format=spec', json={key: [3] * 8 for key in RIASEC_KEYS})
+
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert stages[:2] == ["scoring", "chart_spec"]
+    assert "json_serialize" in stages
+    assert stages[-1] == "total"
+
+
+def test_metrics_endpoint(client):
+    client.post('/recommend?chart_format=spec', json={key: [3] * 8 for key in RIASEC_KEYS})
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert 'occumend_stage_duration_seconds_count{stage="scoring"}' in body
+    assert 'occumend_request_duration_seconds_bucket{endpoint="/recommend",le="+Inf"}' in body
+    assert 'occumend_startup_phase_seconds{phase="data_load"}' in body
+    assert 'occumend_cache_hits_total{cache="chart"}' in body
+
+
+def test_recommend_get_matches_post_and_is_cached(client):
+    answers = {key: [2, 3, 4, 5, 1, 2, 3, 4] for key in RIASEC_KEYS}
+    query = "&".join(f"{key}={','.join(map(str, values))}" for key, values in answers.items())
+
+    posted = client.post('/recommend?chart_format=spec', json=answers)
+    fetched = client.get(f'/recommend?chart_format=spec&{query}')
+
+    assert posted.status_code == fetched.status_code == 200
+    assert fetched.get_json() == posted.get_json()
+    assert fetched.headers["ETag"] == posted.headers["ETag"]
+    assert fetched.headers["X-Cache"] == "hit"
+
+
+def test_recommend_if_none_match_returns_304(client):
+    query = "&".join(f"{key}=3,3,3,3,4,4,4,4" for key in RIASEC_KEYS)
+    first = client.get(f'/recommend?chart_format=spec&{query}')
+    etag = first.headers["ETag"]
+
+    repeat = client.get(f'/recommend?chart_format=spec&{query}', headers={"If-None-Match": etag})
+    other_options = client.get(
+        f'/recommend?chart_format=spec&competency_top_n=1&{query}', headers={"If-None-Match": etag}
+    )
+
+    assert repeat.status_code == 304
+    assert repeat.headers["ETag"] == etag
+    assert repeat.data == b""
+    assert other_options.status_code == 200
+    assert other_options.headers["ETag"] != etag
+
+
+def test_recommend_get_rejects_malformed_answers(client):
+    response = client.get('/recommend?R=1,two,3')
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("body", [[1, 2], {"R": ["x"]}, {"R": 3}, {"R": []}, {"R": [4.5]}])
+def test_recommend_post_rejects_malformed_answers(client, body):
+    response = client.post('/recommend', json=body)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_recommend_matches_batch_for_off_grid_answers(client):
+    """
+    Tests that an answer set whose profile is not on the 1/8 grid (three
+    answers per category) is scored exactly, the same as /recommend/batch.
+    """
+    answers = {key: [5, 4, 4] for key in RIASEC_KEYS}
+    answers["R"] = [1, 2, 2]
+
+    single = client.post('/recommend?chart_format=spec', json=answers).get_json()
+    batch = json.loads(client.post('/recommend/batch', json={"profiles": [answers], "top_k": 20}).get_data())
+
+    assert single["chart_spec"]["radar"]["values"][1] == pytest.approx(13 / 3, abs=1e-4)
+    assert batch["profile"][1] == pytest.approx(13 / 3)
+    assert [(rec["Title"], rec["similarity"]) for rec in single["recommendations"]] == [
+        (rec["Title"], rec["similarity"]) for rec in batch["recommendations"]
+    ]
+
+
+@pytest.mark.parametrize("role", ["recommend-only", "chat-only"])
+def test_app_role_loads_and_serves_only_its_subsystem(tmp_path, monkeypatch, role):
+    """
+    Tests that a worker started for one APP_ROLE loads only that subsystem's
+    handles and answers the other subsystem's endpoints with a 503.
+    """
+    import app as app_package
+    from app import embeddings
+    from benchmarks.synthetic import HashingEmbedder
+    from conftest import TestConfig
+
+    loaded = []
+    load_job_data, open_retrieval = app_package._load_job_data, app_package._open_retrieval
+    monkeypatch.setattr(
+        app_package, "_load_job_data", lambda config, timings: loaded.append("recommend") or load_job_data(config, timings)
+    )
+    monkeypatch.setattr(
+        app_package, "_open_retrieval", lambda config, timings: loaded.append("chat") or open_retrieval(config, timings)
+    )
+    monkeypatch.setattr(embeddings, "load_embedding_model", lambda model_name, backend: HashingEmbedder())
 
-        # Validate results
-        response_data = response.get_json()
+    class RoleConfig(TestConfig):
+        APP_ROLE = role
+        RETRIEVER_BACKEND = "numpy"
+        NUMPY_INDEX_PATH = tmp_path / "vector_index"
+        LEXICAL_INDEX_PATH = tmp_path / "bm25_index"
 
-        # Check status code and error message
-        assert response.status_code == 200, f"Expected 200, got {response.status_code}. Data: {response_data}"
+    role_app = app_package.create_app(RoleConfig)
+    client = role_app.test_client()
+    answers = {key: [3, 3, 3] for key in "RIASEC"}
 
-        # Check if the returned answer is correct
-        assert 'answer' in response_data
-        assert response_data['answer'] == mock_llm_response_content
+    if role == "recommend-only":
+        assert loaded == ["recommend"]
+        assert role_app.recommender is not None
+        assert role_app.embedding_model is None and role_app.embedding_cache is None
+        assert role_app.retriever is None and role_app.chat_sessions is None
+        assert client.post("/recommend", json=answers).status_code == 200
+        response = client.post("/chat", json={"question": "What do nurses do?", "profile_summary": "R"})
+    else:
+        assert loaded == ["chat"]
+        assert role_app.embedding_model is not None
+        assert role_app.recommender is None and role_app.df_clustered_jobs is None
+        assert role_app.recommend_cache is None and role_app.chart_renderer is None
+        assert client.post("/recommend/batch", json=[answers]).status_code == 503
+        response = client.post("/recommend", json=answers)
 
-        # Check that the mocked functions were called correctly
-        mock_db.query.assert_called_once_with(
-            query_texts=['Tell me about marketing jobs.'],
-            n_results=5
-        )
-        mock_llm.chat.completions.create.assert_called_once()
+    assert response.status_code == 503
+    assert f"runs as '{role}'" in response.get_json()["error"]
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.run import compare
+
+
+def _results(p95, throughput, errors=0):
+    return {"scenarios": {"chat": {
+        "latency_ms": {"p50": p95 / 2, "p95": p95, "p99": p95},
+        "throughput_rps": throughput,
+        "errors": errors,
+    }}}
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    regressions = compare(_results(200.0, 5.0), _results(100.0, 10.0), max_regression=0.2, min_delta_ms=5)
+
+    assert any("latency p95" in line for line in regressions)
+    assert any("throughput" in line for line in regressions)
+
+
+def test_compare_ignores_noise_below_thresholds():
+    # +10% is within max_regression and +3 ms is within min_delta_ms
+    assert compare(_results(110.0, 9.5), _results(100.0, 10.0), max_regression=0.2, min_delta_ms=5) == []
+    assert compare(_results(13.0, 10.0), _results(10.0, 10.0), max_regression=0.2, min_delta_ms=5) == []
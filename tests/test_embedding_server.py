@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.embedding_server import EmbeddingClient, EmbeddingServer
+from benchmarks.synthetic import HashingEmbedder
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~100 bytes, too short for pytest's tmp_path
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "embed.sock")
+
+
+def test_embedding_server_batches_concurrent_requests(socket_path):
+    """
+    Tests that concurrent clients get the same vectors as the in-process
+    model, with their requests merged into fewer forward passes.
+    """
+    model = HashingEmbedder(encode_latency=0.02)
+    server = EmbeddingServer(socket_path, model, max_batch_size=64, max_wait=0.01)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = EmbeddingClient(socket_path)
+    questions = [f"What does occupation number {i} do?" for i in range(32)]
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            vectors = list(pool.map(lambda question: client.encode([question])[0], questions))
+        stats = client.stats()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    np.testing.assert_allclose(np.stack(vectors), model.encode(questions), atol=1e-6)
+    assert stats["requests"] == 32
+    assert stats["batches"] < 32
+    assert not os.path.exists(socket_path)
+
+
+def test_embedding_client_falls_back_in_process(socket_path):
+    """
+    Tests that the client encodes with the fallback model when no server
+    is listening, and raises when it has no fallback.
+    """
+    model = HashingEmbedder()
+    client = EmbeddingClient(socket_path, fallback=lambda: model)
+
+    vector = client.encode("What does a nurse do?")
+
+    np.testing.assert_allclose(vector, model.encode(["What does a nurse do?"])[0])
+    with pytest.raises(OSError):
+        EmbeddingClient(socket_path).encode(["What does a nurse do?"])
+
+
+def test_embedding_server_answers_malformed_frames(socket_path):
+    """
+    Tests that malformed request frames get an error reply and leave the
+    connection usable instead of killing its handler.
+    """
+    import json
+    import socket
+    from app.embedding_server import _recv_frame, _send_frame
+
+    server = EmbeddingServer(socket_path, HashingEmbedder())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(socket_path)
+            payloads = (
+                b"{not json",
+                b"\xff\xfe",
+                b"[1, 2]",
+                b'{"op": "encode"}',
+                b'{"op": "encode", "texts": "What does a nurse do?"}',
+                b'{"op": "encode", "texts": ["What does a nurse do?", 7]}',
+            )
+            for payload in payloads:
+                _send_frame(sock, payload)
+                assert "error" in json.loads(_recv_frame(sock))
+            _send_frame(sock, json.dumps({"op": "stats"}).encode())
+            assert json.loads(_recv_frame(sock))["requests"] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_embedding_client_retries_only_stale_connections(socket_path):
+    """
+    Tests that a request on a connection the server has closed is resent on
+    a new one, while a request the server does not answer in time is not
+    resent and the fallback model is used.
+    """
+    import socket
+    from app.embedding_server import _recv_frame
+
+    model = HashingEmbedder()
+    server = EmbeddingServer(socket_path, model)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = EmbeddingClient(socket_path)
+        stale, peer = socket.socketpair()
+        peer.close()
+        client._local.sock = stale
+        np.testing.assert_allclose(client.encode(["What does a nurse do?"]), model.encode(["What does a nurse do?"]))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    received = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen()
+
+        def never_answer():
+            while True:
+                try:
+                    connection, _ = listener.accept()
+                    received.append(_recv_frame(connection))
+                except OSError:
+                    return
+
+        threading.Thread(target=never_answer, daemon=True).start()
+        client = EmbeddingClient(socket_path, timeout=0.2, fallback=lambda: model)
+        vector = client.encode("What does a nurse do?")
+    np.testing.assert_allclose(vector, model.encode(["What does a nurse do?"])[0])
+    assert len(received) == 1
+    assert client._local.sock is None
+
+
+def test_embedding_client_falls_back_on_server_error(socket_path):
+    """
+    Tests that an error reply from the server is served by the fallback
+    model and leaves the connection open for the next request.
+    """
+
+    class FailingEmbedder:
+        def encode(self, sentences, **kwargs):
+            raise MemoryError("out of memory")
+
+    model = HashingEmbedder()
+    server = EmbeddingServer(socket_path, FailingEmbedder())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = EmbeddingClient(socket_path, fallback=lambda: model)
+        vectors = client.encode(["What does a nurse do?"])
+        sock = client._local.sock
+        assert client.stats()["requests"] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    np.testing.assert_allclose(vectors, model.encode(["What does a nurse do?"]))
+    assert client._local.sock is sock
@@ -0,0 +1,108 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+import pathlib
+from types import SimpleNamespace
+import numpy as np
+import onnxruntime
+import pytest
+from app.embeddings import ONNX_FILES, OnnxEmbedder, load_embedding_model
+
+MODEL_PATH = pathlib.Path(__file__).parents[1] / "models" / "all-MiniLM-L6-v2"
+
+
+class StubSession:
+    """
+    Stands in for onnxruntime.InferenceSession. Each token's embedding is
+    [token id, position, 1], so pooled vectors can be worked out by hand.
+    """
+
+    def __init__(self, path, options=None, providers=None):
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in ("input_ids", "attention_mask", "token_type_ids")]
+
+    def run(self, output_names, feeds):
+        input_ids = feeds["input_ids"]
+        self.batches.append(input_ids.shape)
+        positions = np.broadcast_to(np.arange(input_ids.shape[1]), input_ids.shape)
+        token_embeddings = np.stack([input_ids, positions, np.ones_like(input_ids)], axis=-1)
+        return [token_embeddings.astype(np.float32)]
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """A model directory with the real tokenizer, a placeholder graph and the stub session."""
+    for name in ("tokenizer.json", "tokenizer_config.json", "sentence_bert_config.json"):
+        shutil.copy(MODEL_PATH / name, tmp_path / name)
+    (tmp_path / "1_Pooling").mkdir()
+    (tmp_path / ONNX_FILES["onnx"]).parent.mkdir()
+    (tmp_path / ONNX_FILES["onnx"]).touch()
+    monkeypatch.setattr(onnxruntime, "InferenceSession", StubSession)
+    return tmp_path
+
+
+def _configure(model_dir, cls_token=False, normalize=False):
+    pooling = {"pooling_mode_cls_token": cls_token, "pooling_mode_mean_tokens": not cls_token}
+    (model_dir / "1_Pooling" / "config.json").write_text(json.dumps(pooling))
+    modules = [{"type": "sentence_transformers.models.Pooling"}]
+    if normalize:
+        modules.append({"type": "sentence_transformers.models.Normalize"})
+    (model_dir / "modules.json").write_text(json.dumps(modules))
+    return OnnxEmbedder(model_dir)
+
+
+@pytest.mark.parametrize("cls_token", [False, True])
+def test_pooling_ignores_padding(model_dir, cls_token):
+    """
+    Tests that mean pooling averages only the unpadded tokens and CLS pooling
+    takes the first token, whatever the sentence is padded to.
+    """
+    embedder = _configure(model_dir, cls_token=cls_token)
+    sentences = ["A much longer sentence that sets the padded length.", "Short one."]
+
+    vectors = embedder.encode(sentences)
+
+    assert embedder.session.batches == [(2, len(embedder.tokenizer.encode(sentences[0]).ids))]
+    for sentence, vector in zip(sentences, vectors):
+        ids = embedder.tokenizer.encode(sentence).ids  # unpadded
+        expected = [ids[0], 0, 1] if cls_token else [np.mean(ids), (len(ids) - 1) / 2, 1]
+        np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+
+def test_encode_restores_input_order_and_normalizes(model_dir):
+    """
+    Tests that batching longest first is undone in the output, that vectors
+    are L2-normalized when modules.json has a Normalize step, and that a
+    single string gives a 1-D vector.
+    """
+    embedder = _configure(model_dir)
+    normalized = _configure(model_dir, normalize=True)
+    sentences = ["Hi.", "A considerably longer sentence than the others.", "Medium length text."]
+
+    vectors = embedder.encode(sentences, batch_size=2)
+    # Sorted longest first: the long and medium sentences share the first batch
+    assert [shape[0] for shape in embedder.session.batches] == [2, 1]
+    for sentence, vector in zip(sentences, vectors):
+        np.testing.assert_allclose(vector, embedder.encode([sentence])[0], rtol=1e-6)
+
+    unit = normalized.encode(sentences, batch_size=2)
+    np.testing.assert_allclose(np.linalg.norm(unit, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(unit, vectors / np.linalg.norm(vectors, axis=1, keepdims=True), rtol=1e-6)
+
+    single = normalized.encode(sentences[1])
+    assert single.shape == (3,)
+    np.testing.assert_allclose(single, unit[1], rtol=1e-6)
+
+
+def test_load_embedding_model_selects_backend(model_dir):
+    (model_dir / "modules.json").write_text("[]")
+
+    assert isinstance(load_embedding_model(str(model_dir), "onnx"), OnnxEmbedder)
+    with pytest.raises(FileNotFoundError):
+        load_embedding_model(str(model_dir), "onnx-int8")
+    with pytest.raises(ValueError, match="Unknown EMBEDDING_BACKEND"):
+        load_embedding_model(str(model_dir), "tensorflow")
@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+from types import SimpleNamespace
+from app.recommender import RIASEC_KEYS
+from app.reload import DataGeneration, Reloader
+
+
+def test_admin_reload_swaps_generation(app, client, monkeypatch):
+    """
+    Tests that POST /admin/reload installs a new generation with a new
+    recommendation engine, keeps the handles it did not rebuild, and that
+    /recommend keeps answering.
+    """
+    monkeypatch.setitem(app.config, "ADMIN_TOKEN", "secret")
+    old_generation = app.generation
+    headers = {"Authorization": "Bearer secret"}
+
+    assert client.post("/admin/reload").status_code == 401
+    response = client.post("/admin/reload?wait=1", headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()["generation"] == old_generation.number + 1
+    assert app.generation.recommender is not old_generation.recommender
+    assert app.generation.retriever is old_generation.retriever
+    assert app.generation.data_version == old_generation.data_version
+    answers = {key: [3] * 8 for key in RIASEC_KEYS}
+    assert client.post("/recommend", json=answers).status_code == 200
+
+
+def test_admin_reload_disabled_without_token(client):
+    assert client.post("/admin/reload").status_code == 404
+
+
+def test_reloader_watch_reloads_changed_files(tmp_path):
+    """
+    Tests that the file watch installs a new generation after an input file
+    changes, and that a failing build keeps the current generation.
+    """
+    (tmp_path / "jobs.parquet").write_bytes(b"v1")
+    app = SimpleNamespace(generation=DataGeneration(data_version="v1"))
+    versions = iter(["v2"])
+
+    def build(timings):
+        return {"data_version": next(versions)}
+
+    reloader = Reloader(app, build, watch_paths=[tmp_path], poll_interval=0.02)
+    reloader.ensure_watching()
+    time.sleep(0.05)
+    (tmp_path / "jobs.parquet").write_bytes(b"v2-longer")
+
+    deadline = time.monotonic() + 5
+    while app.generation.number == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert app.generation.number == 1
+    assert app.generation.data_version == "v2"
+
+    reloader.reload("manual").join()  # build raises StopIteration
+    assert app.generation.number == 1
+    assert reloader.status()["last_error"] is not None
@@ -0,0 +1,218 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import MagicMock
+import chromadb
+import numpy as np
+import pytest
+from app.services import ChromaRetriever, open_collection, publish_collection, read_collection_pointer
+
+
+def _chroma_version(client, name, text):
+    collection = client.create_collection(name)
+    collection.add(
+        ids=["11-1011.00#0"],
+        documents=[text],
+        metadatas=[{"title": "Chief Executives", "soc_code": "11-1011.00"}],
+        embeddings=[[1.0, 0.0, 0.0]],
+    )
+    return collection
+
+
+def test_published_collection_survives_revectorization(tmp_path):
+    """
+    Tests that publishing a new collection version keeps the replaced one
+    for running workers, deletes older ones, and that a retriever holding a
+    deleted version follows the pointer instead of failing.
+    """
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    assert read_collection_pointer(tmp_path, "onet_data")["name"] == "onet_data"
+
+    _chroma_version(client, "onet_data__v1", "first")
+    publish_collection(client, tmp_path, "onet_data", "onet_data__v1")
+    retriever = ChromaRetriever(
+        open_collection(client, tmp_path, "onet_data"),
+        reopen=lambda: open_collection(client, tmp_path, "onet_data"),
+    )
+
+    _chroma_version(client, "onet_data__v2", "second")
+    pointer = publish_collection(client, tmp_path, "onet_data", "onet_data__v2")
+    assert pointer == {**pointer, "name": "onet_data__v2", "version": 2, "previous": ["onet_data__v1"]}
+    assert retriever.query([1.0, 0.0, 0.0], n_results=1)[0]["document"] == "first"
+
+    _chroma_version(client, "onet_data__v3", "third")
+    publish_collection(client, tmp_path, "onet_data", "onet_data__v3")
+    names = {collection.name for collection in client.list_collections()}
+    assert names == {"onet_data__v2", "onet_data__v3"}
+    assert retriever.query([1.0, 0.0, 0.0], n_results=1)[0]["document"] == "third"
+
+
+def _lexical_index(tmp_path):
+    from app.lexical import BM25Index
+
+    records = [
+        {"doc_id": "15-1252.00#1", "title": "Software Developers (Chunk 1)", "content": "Write software and test code."},
+        {"doc_id": "15-1252.00#2", "title": "Software Developers (Chunk 2)", "content": "Review code written by other developers."},
+        {"doc_id": "29-1141.00#1", "title": "Registered Nurses (Chunk 1)", "content": "Care for patients and record patient symptoms."},
+        {"doc_id": "25-2021.00#1", "title": "Elementary School Teachers (Chunk 1)", "content": "Teach students reading and writing."},
+    ]
+    BM25Index.build(tmp_path / "bm25", records)
+    return BM25Index(tmp_path / "bm25")
+
+
+def test_bm25_scores_and_filters_by_soc_code(tmp_path):
+    """
+    Tests BM25 scoring against the Okapi formula, the matched fraction and
+    the soc_codes filter.
+    """
+    index = _lexical_index(tmp_path)
+
+    hits = index.search("Which nurses care for patients?", n_results=5)
+    assert [hit["doc_id"] for hit in hits] == ["29-1141.00#1"]
+    assert hits[0]["matched"] == 1.0
+
+    # "patient" occurs twice in the nurse chunk; one document of four has it
+    idf = np.log1p((4 - 1 + 0.5) / (1 + 0.5))
+    doc_length, avg_doc_length = index.doc_lengths[2], float(np.mean(index.doc_lengths))
+    norm = index.k1 * (1 - index.b + index.b * doc_length / avg_doc_length)
+    expected = idf * 2 * (index.k1 + 1) / (2 + norm)
+    assert index.search("patients", n_results=1)[0]["score"] == pytest.approx(expected, rel=1e-5)
+
+    hits = index.search("code review", n_results=5)
+    assert [hit["doc_id"] for hit in hits] == ["15-1252.00#2", "15-1252.00#1"]
+    assert hits[1]["matched"] == 0.5
+    assert index.search("code review", n_results=5, soc_codes=["29-1141.00"]) == []
+    assert index.search("the and of", n_results=5) == []
+
+
+def test_is_decisive_and_reciprocal_rank_fusion():
+    from app.lexical import is_decisive, reciprocal_rank_fusion
+
+    def hit(doc_id, score, matched=1.0):
+        return {"doc_id": doc_id, "title": doc_id, "document": "", "score": score, "matched": matched}
+
+    assert is_decisive([hit("A#1", 3.0), hit("A#2", 2.9), hit("B#1", 1.5)])
+    assert not is_decisive([hit("A#1", 3.0), hit("B#1", 2.5)])
+    assert not is_decisive([hit("A#1", 3.0, matched=0.5)])
+    assert not is_decisive([])
+
+    fused = reciprocal_rank_fusion(
+        [[hit("A#1", 9.0), hit("B#1", 8.0)], [hit("B#1", 0.9), hit("C#1", 0.8)]], n_results=2, k=60
+    )
+    assert [item["doc_id"] for item in fused] == ["B#1", "A#1"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_retrieve_context_lexical_fast_path_skips_vector_search(tmp_path):
+    """
+    Tests that a decisive BM25 result is used without embedding the question
+    and is counted, while an ambiguous one is fused with the vector search.
+    """
+    from app.services import retrieve_context
+
+    index = _lexical_index(tmp_path)
+    embedding_model, retriever = MagicMock(), MagicMock()
+    retriever.query.return_value = [
+        {"doc_id": "25-2021.00#1", "title": "Elementary School Teachers (Chunk 1)", "document": "Teach.", "score": 0.5},
+    ]
+
+    _, sources = retrieve_context(retriever, "patients symptoms", embedding_model, lexical_index=index)
+    assert sources == ["Registered Nurses (Chunk 1)"]
+    embedding_model.encode.assert_not_called()
+    retriever.query.assert_not_called()
+    assert index.info()["fast_path_hits"] == 1
+
+    embedding_model.encode.return_value = np.ones((1, 3), dtype=np.float32)
+    _, sources = retrieve_context(retriever, "code and reading", embedding_model, lexical_index=index)
+    retriever.query.assert_called_once()
+    assert "Elementary School Teachers (Chunk 1)" in sources
+    assert index.info()["fast_path_hits"] == 1
+
+
+def test_tokenize_folds_accents_and_keeps_other_scripts():
+    from app.lexical import tokenize
+
+    assert tokenize("Résumé writers for C++ and C#") == ["resume", "writer", "c++", "c#"]
+    assert tokenize("Ärzte 医生") == ["arzte", "医生"]
+
+
+def test_numpy_retriever_matches_chroma_on_exported_index(tmp_path, monkeypatch):
+    """
+    Tests that the NumPy index exported from a Chroma collection returns the
+    same chunks as the collection itself, with and without a soc_codes filter.
+    """
+    from app.config import Config
+    from app.services import NumpyRetriever
+
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+    from export_numpy_index import export_numpy_index
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(60, 8)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    codes = [f"{11 + i % 6}-1011.00" for i in range(60)]
+    doc_ids = [f"{code}#{i // 6 + 1}" for i, code in enumerate(codes)]
+
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection("onet_data")
+    collection.add(
+        ids=doc_ids,
+        documents=[f"Chunk text {i}" for i in range(60)],
+        metadatas=[{"title": f"Occupation {code} ({doc_id})", "soc_code": code} for code, doc_id in zip(codes, doc_ids)],
+        embeddings=embeddings.tolist(),
+    )
+    monkeypatch.setattr(Config, "VECTOR_DB_PATH", tmp_path / "chroma")
+    monkeypatch.setattr(Config, "NUMPY_INDEX_PATH", tmp_path / "vector_index")
+    export_numpy_index()
+
+    chroma_retriever = ChromaRetriever(collection)
+    numpy_retriever = NumpyRetriever(tmp_path / "vector_index")
+    assert len(numpy_retriever) == 60
+
+    def ranked(retriever, query, **kwargs):
+        return [(hit["doc_id"], hit["title"], hit["document"]) for hit in retriever.query(query, **kwargs)]
+
+    queries = rng.normal(size=(10, 8)).astype(np.float32)
+    for query in (queries / np.linalg.norm(queries, axis=1, keepdims=True)).tolist():
+        assert ranked(numpy_retriever, query, n_results=5) == ranked(chroma_retriever, query, n_results=5)
+        filtered = ranked(numpy_retriever, query, n_results=5, soc_codes=["12-1011.00", "15-1011.00"])
+        assert filtered == ranked(chroma_retriever, query, n_results=5, soc_codes=["12-1011.00", "15-1011.00"])
+        assert {doc_id.split("#")[0] for doc_id, _, _ in filtered} <= {"12-1011.00", "15-1011.00"}
+        assert len(filtered) == 5
+    # A filter that matches fewer chunks than requested returns all of them
+    short = ranked(numpy_retriever, query, n_results=20, soc_codes=["13-1011.00"])
+    assert short == ranked(chroma_retriever, query, n_results=20, soc_codes=["13-1011.00"])
+    assert len(short) == 10
+
+
+def test_encode_query_caches_normalized_questions(monkeypatch):
+    """
+    Tests that questions differing only in case, whitespace or trailing
+    punctuation are embedded once, and that the cached vector is embedded
+    again after EMBEDDING_CACHE_TTL seconds.
+    """
+    from types import SimpleNamespace
+    from app import cache
+    from app.services import encode_query
+
+    ttl = 600.0  # EMBEDDING_CACHE_TTL; unset, entries never expire
+
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    embedding_model = MagicMock()
+    embedding_model.encode.side_effect = lambda texts: np.ones((len(texts), 3), dtype=np.float32)
+    embedding_cache = cache.LRUCache(maxsize=8, ttl=ttl)
+
+    for question in ("What does a nurse do?", "  what does a NURSE\tdo ", "What does a nurse do!?"):
+        assert encode_query(embedding_model, question, embedding_cache, "model") == [1.0, 1.0, 1.0]
+    embedding_model.encode.assert_called_once_with(["what does a nurse do"])
+    # The model name is part of the key
+    encode_query(embedding_model, "What does a nurse do?", embedding_cache, "other-model")
+    assert embedding_model.encode.call_count == 2
+
+    now[0] += ttl - 1
+    encode_query(embedding_model, "What does a nurse do?", embedding_cache, "model")
+    assert embedding_model.encode.call_count == 2
+    now[0] += 2
+    encode_query(embedding_model, "What does a nurse do?", embedding_cache, "model")
+    assert embedding_model.encode.call_count == 3
@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+from app import data_processing
+from app.config import Config
+from app.snapshot import MANIFEST_NAME, load_snapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot_config(tmp_path):
+    """The default config with the snapshot written to a temporary directory."""
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    config["SNAPSHOT_PATH"] = tmp_path / "snapshot"
+    write_snapshot(config, *data_processing.load_and_prepare_data(config))
+    return config
+
+
+def test_load_snapshot_matches_prepared_data(snapshot_config):
+    df_prepared, knowledge_index, _, _ = data_processing.load_and_prepare_data(snapshot_config)
+
+    df_loaded, knowledge_loaded, _, _ = load_snapshot(snapshot_config)
+
+    assert list(df_loaded.index) == list(df_prepared.index)
+    np.testing.assert_allclose(df_loaded["R_score"], df_prepared["R_score"], rtol=1e-6)
+    assert (df_loaded["cluster_name"] == df_prepared["cluster_name"]).all()
+    assert np.array_equal(knowledge_loaded.offsets, knowledge_index.offsets)
+
+
+@pytest.mark.parametrize("stale", ["format_version", "input_hash"])
+def test_stale_snapshot_falls_back_to_prepared_data(snapshot_config, monkeypatch, stale):
+    """
+    Tests that a snapshot written by another format version, or from other
+    input files, is ignored and the data is prepared from the Parquet files.
+    """
+    from app import _load_job_data
+
+    manifest_path = snapshot_config["SNAPSHOT_PATH"] / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text())
+    if stale == "format_version":
+        manifest["format_version"] -= 1
+        manifest_path.write_text(json.dumps(manifest))
+    else:
+        # The input hash covers the clustering settings as well as the files
+        snapshot_config["N_CLUSTERS"] += 1
+    prepared = []
+
+    def load_and_prepare_data(config):
+        prepared.append(config)
+        return original(config)
+
+    original = data_processing.load_and_prepare_data
+    monkeypatch.setattr(data_processing, "load_and_prepare_data", load_and_prepare_data)
+
+    assert load_snapshot(snapshot_config) is None
+    handles = _load_job_data(snapshot_config, {})
+
+    assert prepared == [snapshot_config]
+    assert handles["recommender"] is not None
+    assert len(handles["df_clustered_jobs"]) == manifest["rows"]
+
+
+def test_load_job_data_hashes_inputs_once(snapshot_config, monkeypatch):
+    """Tests that the snapshot check and the data version share one hash of the input files."""
+    from app import _load_job_data, snapshot
+
+    hashes = []
+
+    def compute_input_hash(config):
+        hashes.append(original(config))
+        return hashes[-1]
+
+    original = snapshot.compute_input_hash
+    monkeypatch.setattr(snapshot, "compute_input_hash", compute_input_hash)
+
+    handles = _load_job_data(snapshot_config, {})
+
+    assert len(hashes) == 1
+    assert handles["data_version"] == hashes[0][:16]
+    assert handles["recommender"] is not None